@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Decoding of CAN FD frames of 64 bytes with 100 signals compared to CAN
+# frames of 8 bytes: the frame is converted once to an integer, the cost of
+# the extraction of a signal barely depends on the frame length.
+#
+# Run from the root of the repository: python -m benchmarks.bench_canfd
+#
+
+import random
+import timeit
+
+import caneton
+
+from tests import legacy
+
+
+def synthetic_dbc(message_length, signal_count):
+    """DBC of one message with signal_count signals of 5 bits, alternatively Intel and Motorola."""
+    signals = {}
+    for index in range(signal_count):
+        if index % 2:
+            signals['Signal%d' % index] = {'bit_start': index * 5, 'length': 5, 'little_endian': 1}
+        else:
+            # Motorola, the bit start is the most significant bit
+            bit = index * 5 + 4
+            signals['Signal%d' % index] = {
+                'bit_start': (bit // 8) * 8 + 7 - bit % 8, 'length': 5, 'little_endian': 0, 'factor': 0.5}
+    return {'messages': {'1': {'name': 'SYNTHETIC', 'length': message_length, 'signals': signals}}}
+
+
+def main(number=2000):
+    rand = random.Random(42)
+    for message_length, signal_count in [(8, 12), (64, 100)]:
+        dbc_json = synthetic_dbc(message_length, signal_count)
+        db = caneton.compile_dbc(dbc_json)
+        frames = [bytes(bytearray(rand.getrandbits(8) for _ in range(message_length))) for _ in range(10)]
+
+        def decode_strings():
+            for message_data in frames:
+                legacy.message_decode(1, message_length, message_data, dbc_json)
+
+        def decode_compiled():
+            for message_data in frames:
+                db.decode(1, message_data)
+
+        for name, func in [('binary strings', decode_strings), ('compiled', decode_compiled)]:
+            duration = min(timeit.repeat(func, number=number // 10, repeat=3)) / (number // 10 * len(frames))
+            print("%2d bytes, %3d signals  %-15s %9.0f frames/s %7.0f ns/signal" % (
+                message_length, signal_count, name, 1 / duration, duration / signal_count * 1e9))
+
+
+if __name__ == '__main__':
+    main()
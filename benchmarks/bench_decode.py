@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Compare the decoding of frames by extracting the signals from binary
+# strings (as done before the DBC compilation) and by shift and mask of
+# the frame read as an integer, with dict or compact results, and with the
+# decoding functions generated by message (codegen).
+#
+# Run from the root of the repository: python -m benchmarks.bench_decode
+#
+
+import binascii
+import json
+import timeit
+
+import caneton
+
+from tests import legacy
+
+
+FRAMES = [
+    (0x701, binascii.unhexlify('01780178010000')),
+    (0x63f, binascii.unhexlify('00CDCCA042030000')),
+    (0x63e, binascii.unhexlify('0000284200000000')),
+    (0x195, binascii.unhexlify('1100F9FB00000000')),
+    (1942, b'\xff\xff\xff\xff\xff\xff\xff\xff'),
+]
+
+
+def main(number=20000):
+    with open('./tests/dbc.json', 'r') as f:
+        dbc_json = json.loads(f.read())
+    db = caneton.compile_dbc(dbc_json)
+    codegen_db = caneton.compile_dbc(dbc_json).compile(codegen=True)
+
+    def decode_strings():
+        for message_id, message_data in FRAMES:
+            legacy.message_decode(message_id, len(message_data), message_data, dbc_json)
+
+    def decode_integers():
+        for message_id, message_data in FRAMES:
+            db.decode(message_id, message_data)
+
+    def decode_compact():
+        for message_id, message_data in FRAMES:
+            db.decode(message_id, message_data, compact=True)
+
+    def decode_codegen():
+        for message_id, message_data in FRAMES:
+            codegen_db.decode(message_id, message_data)
+
+    results = {}
+    for name, func in [
+            ('binary strings', decode_strings), ('shift and mask', decode_integers),
+            ('compact', decode_compact), ('codegen', decode_codegen)]:
+        duration = min(timeit.repeat(func, number=number, repeat=3))
+        results[name] = number * len(FRAMES) / duration
+        print("%-16s %10.0f frames/s" % (name, results[name]))
+    print("speedup          %10.2fx" % (results['shift and mask'] / results['binary strings']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Encoding of frames with the precompiled packer of the messages compared to
+# their decoding, on the synthetic DBCs of the benchmark suite.
+#
+# Run from the root of the repository: python -m benchmarks.bench_encode
+#
+
+import timeit
+
+import caneton
+
+from . import synthetic
+
+
+def main(number=2000):
+    for kind in synthetic.KINDS:
+        dbc_json = synthetic.synthetic_dbc(messages=10, kind=kind)
+        db = caneton.compile_dbc(dbc_json)
+        frames = synthetic.random_frames(dbc_json, 100)
+        messages = []
+        for message_id, message_data in frames:
+            message = db.decode(message_id, message_data)
+            values = {signal['name']: signal['value'] for signal in message['signals']}
+            multiplexor = db.get_message(message_id).multiplexor
+            if multiplexor is not None:
+                values[multiplexor.name] = message['multiplexing_mode']
+            messages.append((message_id, values))
+
+        def decode():
+            for message_id, message_data in frames:
+                db.decode(message_id, message_data)
+
+        def encode():
+            for message_id, values in messages:
+                db.encode(message_id, values)
+
+        results = []
+        for func in (decode, encode):
+            duration = min(timeit.repeat(func, number=number // len(frames), repeat=3))
+            results.append(number // len(frames) * len(frames) / duration)
+        print("%-12s decode %9.0f frames/s   encode %9.0f frames/s" % (kind, results[0], results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Decoding of float and double signals: binary strings (legacy), read directly
+# from the frame when aligned on bytes, or extracted by shift and mask and
+# reinterpreted when unaligned.
+#
+# Run from the root of the repository: python -m benchmarks.bench_float
+#
+
+import random
+import timeit
+
+import caneton
+
+from tests import legacy
+from tests.test_database import FLOAT_DBC_JSON
+
+
+def main(number=20000):
+    db = caneton.compile_dbc(FLOAT_DBC_JSON)
+    rand = random.Random(42)
+    frames = [bytes(bytearray(rand.getrandbits(8) for _ in range(8))) for _ in range(16)]
+
+    for message_id, name in [(512, 'aligned floats'), (513, 'unaligned floats'), (514, 'aligned double')]:
+        def decode_strings():
+            for message_data in frames:
+                legacy.message_decode(message_id, 8, message_data, FLOAT_DBC_JSON)
+
+        def decode_compiled():
+            for message_data in frames:
+                db.decode(message_id, message_data)
+
+        results = []
+        for func in (decode_strings, decode_compiled):
+            duration = min(timeit.repeat(func, number=number // len(frames), repeat=3))
+            results.append(number // len(frames) * len(frames) / duration)
+        print("%-18s binary strings %9.0f frames/s   compiled %9.0f frames/s   speedup %5.2fx" % (
+            name, results[0], results[1], results[1] / results[0]))
+
+
+if __name__ == '__main__':
+    main()
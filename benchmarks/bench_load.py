@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Startup time with a large DBC: load of the JSON and compilation versus load
+# of the compiled DBC from the cache, as a library and with caneton-decode.
+#
+# Run from the root of the repository: python -m benchmarks.bench_load
+#
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from caneton import cache
+
+
+def write_dbc(path, messages=2000, signals=20):
+    dbc_json = {'messages': {}}
+    for message_id in range(messages):
+        dbc_json['messages'][str(message_id)] = {
+            'name': 'MESSAGE_%d' % message_id,
+            'length': 8,
+            'signals': {
+                'Signal_%d_%d' % (message_id, index): {
+                    'bit_start': index * 3, 'length': 3, 'little_endian': 1,
+                    'factor': 0.5, 'offset': 0, 'min': 0, 'max': 3, 'unit': 'V',
+                }
+                for index in range(signals)
+            },
+        }
+    with open(path, 'w') as f:
+        json.dump(dbc_json, f, indent=2)
+
+
+def best_of(func, repeat=5):
+    durations = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        durations.append(time.time() - start)
+    return min(durations)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'dbc.json')
+        cache_dir = os.path.join(directory, 'cache')
+        write_dbc(path)
+        print("DBC of %.1f MB" % (os.path.getsize(path) / 1e6))
+
+        def load_json():
+            cache.load_database(path, cache_dir, use_cache=False).decode(1000, b'\x01' * 8)
+
+        def load_cache():
+            cache.load_database(path, cache_dir).decode(1000, b'\x01' * 8)
+
+        load_cache()
+        print("%-24s %8.1f ms" % ("JSON load and compile", 1000 * best_of(load_json)))
+        print("%-24s %8.1f ms" % ("cache load", 1000 * best_of(load_cache)))
+
+        environment = dict(os.environ, CANETON_CACHE_DIR=cache_dir)
+        for name, options in [("caneton-decode", ['--no-cache']), ("caneton-decode (cache)", [])]:
+            command = [sys.executable, '-m', 'caneton.cli', path, '1000', '0x0101010101010101'] + options
+            duration = best_of(lambda: subprocess.check_call(command, env=environment, stdout=subprocess.PIPE))
+            print("%-24s %8.1f ms" % (name, 1000 * duration))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Throughput of the decoding of a candump log file by a single process and
+# by parallel processes, serialized in JSON as caneton-decode --jobs does (the
+# scaling is bounded by the number of CPUs).
+#
+# Run from the root of the repository: python -m benchmarks.bench_parallel
+#
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import caneton
+from caneton import cli
+from caneton import parallel
+
+
+LINES = [
+    '(%d.000000) can0 701#01780178010000\n',
+    '(%d.010000) can0 63F#00CDCCA042030000\n',
+    '(%d.020000) can0 63E#0000284200000000\n',
+    '(%d.030000) can0 195#1100F9FB00000000\n',
+    '(%d.040000) can0 796#FFFFFFFFFFFFFFFF\n',
+]
+
+
+def main(seconds=40000):
+    with open('./tests/dbc.json', 'r') as f:
+        db = caneton.compile_dbc(json.loads(f.read()))
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'candump.log')
+        with open(path, 'w') as f:
+            for second in range(seconds):
+                for line in LINES:
+                    f.write(line % second)
+        frames = seconds * len(LINES)
+
+        start = time.time()
+        with open(path) as f:
+            for message in caneton.iter_decode(f, db):
+                cli.message_json(message)
+        duration = time.time() - start
+        print("%-12s %10.0f frames/s" % ("serial", frames / duration))
+
+        cpu_count = multiprocessing.cpu_count()
+        for workers in sorted(set([1, 2, 4, cpu_count])):
+            start = time.time()
+            for _ in parallel.parallel_decode(
+                    path, db, workers=workers, chunk_size=1024 * 1024, formatter=cli.message_json):
+                pass
+            duration = time.time() - start
+            print("%-12s %10.0f frames/s" % ("%d worker(s)" % workers, frames / duration))
+        print("(%d CPUs)" % cpu_count)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
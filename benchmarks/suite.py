@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Benchmark suite: decoding throughput and latency on synthetic DBCs (kinds
+# of signals, CAN and CAN FD frames), DBC load time and caneton-decode
+# startup time. The results can be saved in JSON and compared with the
+# results of a previous run to spot the regressions.
+#
+# Run from the root of the repository:
+#     python -m benchmarks.suite --output results.json [--compare previous.json]
+#
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import caneton
+from caneton import cache
+from caneton.version import VERSION
+
+from . import synthetic
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+FRAME_COUNT = 2000
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def measure_decode(decode, frames, repeat=3):
+    """Decode the frames one by one, repeat times.
+
+    Returns:
+        result: dict, frames_per_second of the best run and latency percentiles of
+            the decoding of a frame in microseconds.
+    """
+    best = None
+    latencies = []
+    for _ in range(repeat):
+        start = timer()
+        for message_id, message_data in frames:
+            decode(message_id, message_data)
+        duration = timer() - start
+        best = duration if best is None else min(best, duration)
+
+    for message_id, message_data in frames:
+        start = timer()
+        decode(message_id, message_data)
+        latencies.append((timer() - start) * 1e6)
+    latencies.sort()
+    return {
+        'frames_per_second': len(frames) / best,
+        'latency_us': {
+            'p50': _percentile(latencies, 0.5),
+            'p99': _percentile(latencies, 0.99),
+            'max': latencies[-1],
+        },
+    }
+
+
+def decoders(dbc_json):
+    """Decoding functions to benchmark by name, with the same arguments."""
+    db = caneton.compile_dbc(dbc_json)
+    codegen_db = caneton.compile_dbc(dbc_json).compile(codegen=True)
+    return [
+        ('message_decode', lambda message_id, message_data: caneton.message_decode(
+            message_id, len(message_data), message_data, dbc_json)),
+        ('database', db.decode),
+        ('compact', lambda message_id, message_data: db.decode(message_id, message_data, compact=True)),
+        ('codegen', codegen_db.decode),
+    ]
+
+
+def bench_decode():
+    for message_length in (caneton.CAN_MAX_LENGTH, caneton.CANFD_MAX_LENGTH):
+        for kind in synthetic.KINDS:
+            dbc_json = synthetic.synthetic_dbc(messages=10, kind=kind, message_length=message_length)
+            frames = synthetic.random_frames(dbc_json, FRAME_COUNT)
+            for name, decode in decoders(dbc_json):
+                result = measure_decode(decode, frames)
+                result.update({
+                    'name': 'decode.%s' % name,
+                    'params': {'kind': kind, 'message_length': message_length},
+                })
+                yield result
+
+
+def _best_of(func, repeat=5):
+    durations = []
+    for _ in range(repeat):
+        start = timer()
+        func()
+        durations.append(timer() - start)
+    return min(durations)
+
+
+def bench_load(directory):
+    for messages in (100, 2000):
+        path = os.path.join(directory, 'dbc_%d.json' % messages)
+        cache_dir = os.path.join(directory, 'cache')
+        with open(path, 'w') as f:
+            json.dump(synthetic.synthetic_dbc(messages=messages), f)
+        params = {'messages': messages, 'size': os.path.getsize(path)}
+
+        cache.load_database(path, cache_dir)
+        for name, use_cache in [('load.json', False), ('load.cache', True)]:
+            duration = _best_of(lambda: cache.load_database(path, cache_dir, use_cache=use_cache).decode(
+                1, b'\x01' * 8))
+            yield {'name': name, 'params': params, 'duration_ms': duration * 1000}
+
+        environment = dict(os.environ, CANETON_CACHE_DIR=cache_dir)
+        for name, options in [('cli.startup', ['--no-cache']), ('cli.startup.cache', [])]:
+            command = [sys.executable, '-m', 'caneton.cli', path, '1', '0x0101010101010101'] + options
+            duration = _best_of(
+                lambda: subprocess.check_call(command, env=environment, stdout=subprocess.PIPE), repeat=3)
+            yield {'name': name, 'params': params, 'duration_ms': duration * 1000}
+
+
+def _key(result):
+    return result['name'], tuple(sorted(result['params'].items()))
+
+
+def _format(result, previous=None):
+    params = ' '.join('%s=%s' % item for item in sorted(result['params'].items()))
+    if 'frames_per_second' in result:
+        line = "%-24s %-36s %10.0f frames/s  p50 %6.1f us  p99 %6.1f us" % (
+            result['name'], params, result['frames_per_second'],
+            result['latency_us']['p50'], result['latency_us']['p99'])
+        if previous is not None:
+            line += "  %+6.1f%%" % (100 * (result['frames_per_second'] / previous['frames_per_second'] - 1))
+    else:
+        line = "%-24s %-36s %10.1f ms" % (result['name'], params, result['duration_ms'])
+        if previous is not None:
+            line += "  %+6.1f%%" % (100 * (result['duration_ms'] / previous['duration_ms'] - 1))
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of caneton.")
+    parser.add_argument('--output', help="JSON file to write the results to")
+    parser.add_argument('--compare', help="JSON results of a previous run to compare with")
+    parser.add_argument('--only', choices=['decode', 'load'], help="run only a part of the suite")
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {_key(result): result for result in json.load(f)['results']}
+
+    results = []
+    directory = tempfile.mkdtemp()
+    try:
+        benchmarks = []
+        if args.only in (None, 'decode'):
+            benchmarks.append(bench_decode())
+        if args.only in (None, 'load'):
+            benchmarks.append(bench_load(directory))
+        for benchmark in benchmarks:
+            for result in benchmark:
+                print(_format(result, previous.get(_key(result))))
+                results.append(result)
+    finally:
+        shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'version': VERSION,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Synthetic DBC (in the JSON format of libcanardbc) and random frames for the
+# benchmarks.
+#
+
+import random
+
+
+# Kinds of signals of the synthetic messages
+KINDS = ('intel', 'motorola', 'signed', 'float', 'multiplexed', 'mixed')
+
+
+def _signal(kind, bit, length):
+    """Signal of the given kind whose least significant bit is at bit of the frame."""
+    if kind == 'motorola':
+        # The bit start of Motorola signals is their most significant bit
+        msb = bit + length - 1
+        return {'bit_start': (msb // 8) * 8 + 7 - msb % 8, 'length': length, 'little_endian': 0,
+                'factor': 0.5, 'offset': -10}
+    if kind == 'signed':
+        return {'bit_start': bit, 'length': length, 'little_endian': 1, 'signed': 1, 'factor': 0.1}
+    if kind == 'float':
+        return {'bit_start': bit, 'length': 32, 'little_endian': 1, 'value_type': 'float'}
+    return {'bit_start': bit, 'length': length, 'little_endian': 1, 'factor': 1, 'offset': 0}
+
+
+def synthetic_message(name, kind, message_length=8):
+    """Message filling the frame with signals of the given kind (see KINDS)."""
+    signals = {}
+    if kind == 'float':
+        for index in range(message_length // 4):
+            signals['%s_%d' % (name, index)] = _signal('float', index * 32, 32)
+    elif kind == 'multiplexed':
+        signals['%s_mux' % name] = {'bit_start': 0, 'length': 4, 'little_endian': 1, 'multiplexor': True}
+        for index in range(1, message_length * 8 // 6):
+            signal = _signal('intel', index * 6 - 2, 6)
+            signal['multiplexing'] = index % 4
+            signals['%s_%d' % (name, index)] = signal
+    else:
+        for index in range(message_length * 8 // 6):
+            signal_kind = KINDS[index % 3] if kind == 'mixed' else kind
+            signals['%s_%d' % (name, index)] = _signal(signal_kind, index * 6, 6)
+    return {
+        'name': name,
+        'length': message_length,
+        'has_multiplexor': kind == 'multiplexed',
+        'signals': signals,
+    }
+
+
+def synthetic_dbc(messages=1, kind='mixed', message_length=8):
+    """DBC of messages of IDs 1 to messages (see synthetic_message())."""
+    return {'messages': {
+        str(message_id): synthetic_message('MESSAGE_%d' % message_id, kind, message_length)
+        for message_id in range(1, messages + 1)
+    }}
+
+
+def random_frames(dbc_json, count, seed=42):
+    """Return count (message_id, message_data) of random data for the messages of the DBC."""
+    rand = random.Random(seed)
+    message_ids = sorted(int(message_id) for message_id in dbc_json['messages'])
+    frames = []
+    for _ in range(count):
+        message_id = rand.choice(message_ids)
+        length = dbc_json['messages'][str(message_id)]['length']
+        frames.append((message_id, bytes(bytearray(rand.getrandbits(8) for _ in range(length)))))
+    return frames
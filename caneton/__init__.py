@@ -3,16 +3,23 @@
 # SPDX-License-Identifier: BSD-3-Clause
 #
 
+from .database import Database, compile_dbc
 from .decode import (
-    MESSAGE_MAX_LENGTH, message_decode,
+    CAN_MAX_LENGTH, CANFD_LENGTHS, CANFD_MAX_LENGTH, MESSAGE_MAX_LENGTH,
+    dlc_to_length, length_to_dlc, message_decode,
     message_get_multiplexor, message_get_signal, signal_decode)
+from .encode import message_encode
 from .exceptions import (
-    CanetonError, DecodingError, InvalidBitStart, InvalidDBC,
+    CanetonError, DecodingError, EncodingError, InvalidBitStart, InvalidDBC,
     MessageNotFound)
+from .logs import Frame, iter_decode, iter_frames
 
 __all__ = [
-    'MESSAGE_MAX_LENGTH',
+    'Database', 'compile_dbc',
+    'Frame', 'iter_decode', 'iter_frames',
+    'CAN_MAX_LENGTH', 'CANFD_LENGTHS', 'CANFD_MAX_LENGTH', 'MESSAGE_MAX_LENGTH',
+    'dlc_to_length', 'length_to_dlc',
     'message_decode', 'message_get_multiplexor',
-    'message_get_signal', 'signal_decode',
-    'CanetonError', 'DecodingError', 'InvalidBitStart', 'InvalidDBC', 'MessageNotFound'
+    'message_get_signal', 'signal_decode', 'message_encode',
+    'CanetonError', 'DecodingError', 'EncodingError', 'InvalidBitStart', 'InvalidDBC', 'MessageNotFound'
 ]
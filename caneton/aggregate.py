@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Aggregation of the decoded signals by time windows: minimum, maximum, mean
+# and last value of each signal by message ID and multiplexing mode. Only the
+# summaries of the windows are emitted, the frames aren't kept.
+#
+# The time is cut in panes of the length of the step of the windows. The
+# statistics of the frames of a pane are updated with each frame in arrays (one
+# item by signal), so the memory doesn't depend on the number of frames. A
+# tumbling window is a single pane, a sliding window merges the panes it covers
+# when it's emitted.
+#
+
+import array
+import math
+
+from . import exceptions
+
+
+def _window_panes(window, step):
+    panes = int(round(window / float(step)))
+    if panes < 1 or abs(panes * step - window) > 1e-9 * window:
+        raise ValueError("The window (%r) must be a multiple of the step (%r)." % (window, step))
+    return panes
+
+
+class _Pane(object):
+    """Statistics of the frames of a group in a pane, arrays indexed as the signals of the group."""
+
+    __slots__ = ('count', 'counts', 'minimum', 'maximum', 'total', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.counts = array.array('l')
+        self.minimum = array.array('d')
+        self.maximum = array.array('d')
+        self.total = array.array('d')
+        self.last = []
+
+    def extend(self, size):
+        """Add the columns of the signals met since the pane was created."""
+        added = size - len(self.counts)
+        self.counts.extend([0] * added)
+        self.minimum.extend([0.0] * added)
+        self.maximum.extend([0.0] * added)
+        self.total.extend([0.0] * added)
+        self.last.extend([None] * added)
+
+    def update(self, columns, values):
+        """Add the values of a frame, columns are their indexes in the arrays."""
+        counts, minimum, maximum, total, last = self.counts, self.minimum, self.maximum, self.total, self.last
+        for column, value in zip(columns, values):
+            if counts[column]:
+                if value < minimum[column]:
+                    minimum[column] = value
+                if value > maximum[column]:
+                    maximum[column] = value
+                total[column] += value
+            else:
+                minimum[column] = maximum[column] = total[column] = value
+            counts[column] += 1
+            last[column] = value
+        self.count += 1
+
+
+class _Group(object):
+    """Panes of the frames of a message and multiplexing mode."""
+
+    __slots__ = ('message', 'multiplexing_mode', 'signal_names', 'panes', '_columns')
+
+    def __init__(self, message, multiplexing_mode):
+        self.message = message
+        self.multiplexing_mode = multiplexing_mode
+        # Names of the signals met, in the order of the columns of the panes
+        self.signal_names = []
+        # Pane index -> _Pane
+        self.panes = {}
+        # id() of the entries of a layout -> (entries, indexes of their columns), the
+        # layouts of the frame lengths met may not have the same signals
+        self._columns = {}
+
+    def sort_key(self):
+        mode = self.multiplexing_mode
+        return self.message.id, mode is not None, mode if mode is not None else 0
+
+    def add(self, pane_index, entries, values):
+        try:
+            columns = self._columns[id(entries)][1]
+        except KeyError:
+            names = self.signal_names
+            for entry in entries:
+                if entry[0].name not in names:
+                    names.append(entry[0].name)
+            columns = tuple(names.index(entry[0].name) for entry in entries)
+            self._columns[id(entries)] = entries, columns
+        pane = self.panes.get(pane_index)
+        if pane is None:
+            pane = self.panes[pane_index] = _Pane()
+        if len(pane.counts) < len(self.signal_names):
+            pane.extend(len(self.signal_names))
+        pane.update(columns, values)
+
+    def summary(self, first_pane, last_pane, start, end):
+        """Return the summary of the panes first_pane to last_pane (None when they're empty)."""
+        panes = [self.panes[index] for index in range(first_pane, last_pane + 1) if index in self.panes]
+        if not panes:
+            return None
+        signals = {}
+        for index, name in enumerate(self.signal_names):
+            with_values = [pane for pane in panes if index < len(pane.counts) and pane.counts[index]]
+            if not with_values:
+                continue
+            total = math.fsum(pane.total[index] for pane in with_values)
+            signals[name] = {
+                'min': min(pane.minimum[index] for pane in with_values),
+                'max': max(pane.maximum[index] for pane in with_values),
+                'mean': total / sum(pane.counts[index] for pane in with_values),
+                'last': with_values[-1].last[index],
+            }
+        return {
+            'id': self.message.id,
+            'name': self.message.name,
+            'multiplexing_mode': self.multiplexing_mode,
+            'start': start,
+            'end': end,
+            'count': sum(pane.count for pane in panes),
+            'signals': signals,
+        }
+
+
+class WindowAggregator(object):
+    """Aggregate the signals of timestamped frames by time windows.
+
+    The windows are aligned on multiples of step from the time origin: with
+    step equal to window (by default), the windows are tumbling, each frame
+    belongs to one window; with a smaller step, the windows are sliding, a
+    window is emitted every step and covers the last window / step steps.
+
+    A window is emitted once a frame of a later step is added (or on flush()),
+    the frames are expected in the order of their timestamps: the frames of an
+    already emitted window are counted in late and ignored, as the frames
+    without timestamp (counted in untimed).
+
+    Args:
+        db: Database, the compiled DBC (see compile_dbc())
+        window: float, length of the windows in seconds
+        step: float, interval between the windows (a divisor of window), window by default
+        signals: iterable of str, names of the signals to aggregate (defaults to all)
+
+    Each summary is a dict with the 'id', 'name' and 'multiplexing_mode' of the
+    message, the 'start' and 'end' times of the window, the 'count' of frames
+    and the 'signals' statistics by name ('min', 'max', 'mean' and 'last') of
+    the signals in these frames (the frames too short for a signal don't count
+    in its statistics). The frames without any of the aggregated signals have
+    no summary.
+    """
+
+    def __init__(self, db, window=1.0, step=None, signals=None):
+        if window <= 0:
+            raise ValueError("The window must be positive.")
+        self.window = window
+        self.step = step if step is not None else window
+        self.panes = _window_panes(window, self.step)
+        self._decoder = db.decoder(signals=signals)
+        # (message ID, multiplexing mode) -> _Group
+        self._groups = {}
+        # Index of the pane of the last frame, of the last pane of the last emitted window
+        self._current = None
+        self._emitted = None
+        self.frames = 0
+        self.untimed = 0
+        self.late = 0
+        self.unknown = 0
+        self.errors = 0
+
+    def add(self, message_id, message_data, timestamp, message_length=None):
+        """Decode a frame and add its values to its pane.
+
+        Returns:
+            summaries: list of dict, the windows completed before the frame.
+        """
+        if timestamp is None:
+            self.untimed += 1
+            return []
+        pane_index = int(math.floor(timestamp / self.step))
+        summaries = []
+        if self._current is None:
+            self._current = pane_index
+            self._emitted = pane_index - 1
+        elif pane_index > self._current:
+            summaries = self._emit(pane_index - 1)
+            self._current = pane_index
+        elif pane_index <= self._emitted:
+            self.late += 1
+            return summaries
+
+        if message_length is None:
+            message_length = len(message_data)
+        try:
+            message, layout = self._decoder.layout(message_id, message_length)
+            # The values without building a decoded message
+            multiplexing_mode, entries, values = message._decode_values(message_data[:message_length], layout)
+        except exceptions.MessageNotFound:
+            self.unknown += 1
+            return summaries
+        except exceptions.DecodingError:
+            self.errors += 1
+            return summaries
+        self.frames += 1
+        if not entries:
+            # None of the aggregated signals is in the frame
+            return summaries
+
+        key = message_id, multiplexing_mode
+        try:
+            group = self._groups[key]
+        except KeyError:
+            group = self._groups[key] = _Group(message, multiplexing_mode)
+        group.add(pane_index, entries, values)
+        return summaries
+
+    def add_frames(self, frames):
+        """Add frames (logs.Frame) and yield the summaries of the completed windows."""
+        for frame in frames:
+            for summary in self.add(frame.message_id, frame.data, frame.timestamp):
+                yield summary
+
+    def flush(self):
+        """Return the summaries of the windows up to the last frame added."""
+        if self._current is None:
+            return []
+        return self._emit(self._current)
+
+    def _emit(self, last_window):
+        """Return the summaries of the windows ending with the panes up to last_window."""
+        panes = self.panes
+        # Only the windows covering a pane with frames are emitted
+        ends = set()
+        for group in self._groups.values():
+            for index in group.panes:
+                ends.update(range(max(index, self._emitted + 1), min(index + panes - 1, last_window) + 1))
+
+        groups = sorted(self._groups.values(), key=_Group.sort_key)
+        summaries = []
+        for end_pane in sorted(ends):
+            first_pane = end_pane - panes + 1
+            start = first_pane * self.step
+            end = (end_pane + 1) * self.step
+            for group in groups:
+                summary = group.summary(first_pane, end_pane, start, end)
+                if summary is not None:
+                    summaries.append(summary)
+
+        # The panes of the windows not emitted yet are kept
+        self._emitted = max(self._emitted, last_window)
+        first_kept = self._emitted - panes + 2
+        for key, group in list(self._groups.items()):
+            for index in [index for index in group.panes if index < first_kept]:
+                del group.panes[index]
+            if not group.panes:
+                del self._groups[key]
+        return summaries
+
+
+def aggregate(frames, db, window=1.0, step=None, signals=None):
+    """Aggregate frames by time windows (see WindowAggregator).
+
+    Args:
+        frames: iterable of logs.Frame with timestamps, in order (eg. logs.iter_frames())
+        db: Database, the compiled DBC (see compile_dbc())
+
+    Yields:
+        summary: dict, summary of a window for a message and multiplexing mode.
+    """
+    aggregator = WindowAggregator(db, window, step, signals)
+    for summary in aggregator.add_frames(frames):
+        yield summary
+    for summary in aggregator.flush():
+        yield summary
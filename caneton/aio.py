@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Live decoding of CAN buses with asyncio (Python 3.7 and later, not imported
+# by the caneton package). The frames are read in the SocketCAN binary format from a
+# raw CAN socket or any stream (pipe, socket, StreamReader...), decoded by
+# batches in an executor so the event loop isn't blocked and delivered through
+# a bounded queue.
+#
+# SocketCAN frames (native byte order):
+#     struct can_frame     can_id (uint32), len (uint8), 3 bytes, data (8 bytes)
+#     struct canfd_frame   can_id (uint32), len (uint8), flags (uint8), 2 bytes, data (64 bytes)
+#
+
+import asyncio
+import socket
+import struct
+import time
+
+from . import exceptions
+
+
+CAN_FRAME = struct.Struct('=IB3x8s')
+CANFD_FRAME = struct.Struct('=IBB2x64s')
+CAN_MTU = CAN_FRAME.size
+CANFD_MTU = CANFD_FRAME.size
+
+CAN_EFF_FLAG = 0x80000000
+CAN_RTR_FLAG = 0x40000000
+CAN_ERR_FLAG = 0x20000000
+CAN_EFF_MASK = 0x1FFFFFFF
+
+# Socket option of SOL_CAN_RAW to receive CAN FD frames
+CAN_RAW_FD_FRAMES = 5
+
+# Maximum number of frames returned by a read of SocketCANReader without size
+READ_FRAMES = 64
+
+
+class StreamStats(object):
+    """Counters of a decoded stream.
+
+    Attributes:
+        frames: int, frames read
+        decoded: int, messages decoded
+        unknown: int, frames whose ID is not in the DBC
+        skipped: int, remote and error frames
+        errors: int, frames which can't be decoded (DecodingError)
+        dropped: int, messages dropped because the queue was full
+        max_latency: float, maximum time in seconds between the reception of a
+            frame and the delivery of its message
+        total_latency: float, sum of the latencies of the delivered messages
+    """
+
+    __slots__ = (
+        'frames', 'decoded', 'unknown', 'skipped', 'errors', 'dropped', 'max_latency', 'total_latency')
+
+    def __init__(self):
+        self.frames = self.decoded = self.unknown = self.skipped = self.errors = self.dropped = 0
+        self.max_latency = self.total_latency = 0.0
+
+    @property
+    def mean_latency(self):
+        delivered = self.decoded - self.dropped
+        return self.total_latency / delivered if delivered > 0 else 0.0
+
+    def as_dict(self):
+        stats = dict((name, getattr(self, name)) for name in self.__slots__)
+        stats['mean_latency'] = self.mean_latency
+        return stats
+
+
+class SocketCANReader(object):
+    """Read the frames of a raw CAN socket (Linux only).
+
+    A read waits for a frame, then returns it with the frames already received
+    by the socket, so the frames arriving together are decoded in a single batch.
+    With fd, the classic frames are padded to the size of the CAN FD frames so
+    the stream has a fixed frame size.
+
+    Args:
+        channel: str, CAN interface (e.g. 'can0')
+        fd: bool, receive the CAN FD frames too
+    """
+
+    def __init__(self, channel, fd=False):
+        self.fd = fd
+        self._socket = socket.socket(socket.AF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+        if fd:
+            self._socket.setsockopt(socket.SOL_CAN_RAW, CAN_RAW_FD_FRAMES, 1)
+        self._socket.bind((channel,))
+        self._socket.setblocking(False)
+
+    async def read(self, n=-1):
+        """Return the frames received, at least one and at most n bytes (READ_FRAMES frames by default)."""
+        frame_size = CANFD_MTU if self.fd else CAN_MTU
+        count = max(n // frame_size, 1) if n >= 0 else READ_FRAMES
+        padding = bytes(CANFD_MTU - CAN_MTU) if self.fd else None
+        recv = self._socket.recv
+        frame = await asyncio.get_running_loop().sock_recv(self._socket, frame_size)
+        frames = []
+        while True:
+            if padding is not None and len(frame) == CAN_MTU:
+                frame += padding
+            frames.append(frame)
+            if len(frames) >= count:
+                break
+            # The frames already received, without waiting
+            try:
+                frame = recv(frame_size)
+            except BlockingIOError:
+                break
+        return b''.join(frames)
+
+    def close(self):
+        self._socket.close()
+
+
+def decode_frames(db, data, frame_size=CAN_MTU, stats=None):
+    """Decode a buffer of SocketCAN frames.
+
+    Args:
+        db: Database or Decoder, the compiled DBC (see compile_dbc())
+        data: bytes, the frames
+        frame_size: int, CAN_MTU or CANFD_MTU
+        stats: StreamStats, counters updated with the frames
+
+    Returns:
+        messages: list of decoded messages (see message_decode()), the unknown,
+            remote, error and invalid frames are skipped.
+    """
+    frame_struct = CANFD_FRAME if frame_size == CANFD_MTU else CAN_FRAME
+    messages = []
+    unknown = skipped = errors = 0
+    for fields in frame_struct.iter_unpack(data):
+        can_id, length, payload = fields[0], fields[1], fields[-1]
+        if can_id & (CAN_RTR_FLAG | CAN_ERR_FLAG):
+            skipped += 1
+            continue
+        message_id = can_id & CAN_EFF_MASK
+        try:
+            messages.append(db.decode(message_id, payload[:length], length))
+        except exceptions.MessageNotFound:
+            unknown += 1
+        except exceptions.DecodingError:
+            errors += 1
+
+    if stats is not None:
+        stats.frames += len(data) // frame_size
+        stats.decoded += len(messages)
+        stats.unknown += unknown
+        stats.skipped += skipped
+        stats.errors += errors
+    return messages
+
+
+async def _read_batches(reader, db, queue, frame_size, batch_size, executor, drop, stats):
+    loop = asyncio.get_running_loop()
+    buffer = b''
+    try:
+        while True:
+            data = await reader.read(batch_size * frame_size - len(buffer))
+            if not data:
+                break
+            buffer += data
+            if len(buffer) < frame_size:
+                continue
+            received = loop.time()
+            timestamp = time.time()
+            end = len(buffer) - len(buffer) % frame_size
+            batch, buffer = buffer[:end], buffer[end:]
+
+            messages = await loop.run_in_executor(executor, decode_frames, db, batch, frame_size, stats)
+            for message in messages:
+                message['timestamp'] = timestamp
+            if drop and queue.full():
+                stats.dropped += len(messages)
+            else:
+                # Waits while the queue is full, so the source isn't read any more
+                await queue.put((received, messages))
+    finally:
+        await queue.put(None)
+
+
+async def decode_stream(reader, db, fd=False, batch_size=64, queue_size=16, executor=None, drop=False,
+                        stats=None):
+    """Decode the SocketCAN frames of an asynchronous stream.
+
+    The frames are read by batches of at most batch_size frames (what is
+    available without waiting), decoded in the executor and queued. When the
+    queue is full, the stream isn't read any more until the messages are
+    consumed, or the new messages are dropped with drop.
+
+    Args:
+        reader: object with a coroutine read(n) returning at most n bytes and b''
+            at the end of the stream (asyncio.StreamReader, SocketCANReader...)
+        db: Database or Decoder, the compiled DBC (see compile_dbc())
+        fd: bool, the stream contains CAN FD frames (CANFD_MTU bytes each)
+        batch_size: int, maximum number of frames decoded together
+        queue_size: int, maximum number of batches decoded in advance
+        executor: concurrent.futures.Executor, executor of the decoding (defaults
+            to the default executor of the event loop)
+        drop: bool, drop the messages when the queue is full instead of waiting
+        stats: StreamStats, counters updated while the stream is decoded
+
+    Yields:
+        message: decoded message (see message_decode()) with its 'timestamp' of
+            reception.
+    """
+    if stats is None:
+        stats = StreamStats()
+    frame_size = CANFD_MTU if fd else CAN_MTU
+    queue = asyncio.Queue(queue_size)
+    loop = asyncio.get_running_loop()
+    task = loop.create_task(
+        _read_batches(reader, db, queue, frame_size, batch_size, executor, drop, stats))
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            received, messages = batch
+            if messages:
+                latency = loop.time() - received
+                stats.total_latency += latency * len(messages)
+                stats.max_latency = max(stats.max_latency, latency)
+            for message in messages:
+                yield message
+        # Raise the exception of the reader if any
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
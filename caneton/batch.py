@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Vectorized decoding of many frames of the same message with NumPy (optional
+# dependency). The frames are decoded by columns: one pass of shift and mask
+# over all the frames for each signal.
+#
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from . import exceptions
+
+
+# Default stride of frames provided as a bytes buffer
+FRAME_LENGTH = 8
+
+
+def _as_frames(frames, message_length):
+    if not isinstance(frames, numpy.ndarray):
+        frames = numpy.frombuffer(frames, dtype=numpy.uint8)
+        frames = frames.reshape(-1, message_length or FRAME_LENGTH)
+    if frames.ndim != 2:
+        raise ValueError("The frames must be a 2-D array (frames x bytes), not %d-D." % frames.ndim)
+    if frames.dtype != numpy.uint8:
+        frames = frames.astype(numpy.uint8)
+    if message_length is not None:
+        frames = frames[:, :message_length]
+    return frames
+
+
+def _frames_as_integers(frames):
+    """Read each frame as a big and little endian integer of 64 bits (frames up to 8 bytes)."""
+    message_length = frames.shape[1]
+    padded = numpy.zeros((frames.shape[0], 8), dtype=numpy.uint8)
+    padded[:, :message_length] = frames
+    # The padding bytes are appended so the big endian integer is shifted
+    msb = padded.view('>u8')[:, 0].astype(numpy.uint64) >> (8 * (8 - message_length))
+    lsb = padded.view('<u8')[:, 0].astype(numpy.uint64)
+    return msb, lsb
+
+
+def _window(frames, is_little_endian, shift, nbits):
+    """Read the bytes of frames covering bits [shift, shift + nbits) of the frame integer.
+
+    Returns the covered bytes as integer and the shift of the signal inside it.
+    """
+    message_length = frames.shape[1]
+    first, last = shift // 8, (shift + nbits - 1) // 8
+    # More than 8 bytes (unaligned 64 bits signal), fallback to Python integers
+    dtype = numpy.uint64 if last - first < 8 else object
+    window = numpy.zeros(frames.shape[0], dtype=dtype)
+    for index in range(first, last + 1):
+        # Index of the byte in the frame integer, from the least significant
+        column = index if is_little_endian else message_length - 1 - index
+        window |= frames[:, column].astype(dtype) << (8 * (index - first))
+    return window, shift - 8 * first
+
+
+def _extract(entry, frames, msb, lsb):
+    signal, shift, mask, nbits, template, _unpacker = entry
+    if not nbits:
+        raise exceptions.DecodingError(
+            "The string value extracted for signal '%s' is empty [%d:%d]." %
+            (signal.name, template['bit_start'], template['bit_end']))
+
+    if msb is not None:
+        raw = ((lsb if signal.is_little_endian else msb) >> shift) & mask
+    else:
+        raw, shift = _window(frames, signal.is_little_endian, shift, nbits)
+        raw = ((raw >> shift) & mask).astype(numpy.uint64)
+
+    if signal.is_signed:
+        if nbits > 1:
+            # Two's complement by arithmetic shift of the sign bit
+            raw = (raw << (64 - nbits)).view(numpy.int64) >> (64 - nbits)
+        else:
+            raw = raw.astype(numpy.int64)
+    elif signal.value_type == 'float':
+        with numpy.errstate(invalid='ignore'):
+            # Signaling NaN are converted to quiet NaN as struct does
+            raw = raw.astype(numpy.uint32).view(numpy.float32).astype(numpy.float64)
+    elif signal.value_type == 'double':
+        raw = raw.view(numpy.float64)
+    elif nbits < 64:
+        raw = raw.astype(numpy.int64)
+
+    if signal.is_raw:
+        return raw
+    return raw * signal.factor + signal.offset
+
+
+def decode_batch(message, frames, message_length=None):
+    """Decode many frames of the same message at once.
+
+    Args:
+        message: database.Message, the compiled message of the frames
+        frames: numpy.ndarray of shape (N, length) and dtype uint8 or a bytes buffer
+            of frames of fixed stride (the message length, 8 by default).
+        message_length: int, length of the useful data of the frames (defaults to
+            the frames length).
+
+    Returns:
+        columns: dict, a NumPy array of the N physical values by signal name, sorted by
+            bit start as message_decode() signals, preceded by the 'multiplexing_mode'
+            column for multiplexed messages. The multiplexed signals are masked arrays,
+            masked for the frames of other multiplexing modes (or where their
+            sub-multiplexor doesn't select them with extended multiplexing).
+
+    Raises:
+        exceptions.InvalidBitStart: when the multiplexor doesn't fit in the frames
+        exceptions.DecodingError: when a signal to decode doesn't fit in the frames
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required to decode frames by batch.")
+
+    frames = _as_frames(frames, message_length)
+    layout = message.layout(frames.shape[1])
+    if frames.shape[1] <= 8:
+        msb, lsb = _frames_as_integers(frames)
+    else:
+        msb = lsb = None
+
+    columns = {}
+    if layout.multiplexor is None:
+        for entry in layout.entries:
+            columns[entry[0].name] = _extract(entry, frames, msb, lsb)
+        return columns
+
+    multiplexing_mode = columns['multiplexing_mode'] = _extract(layout.multiplexor, frames, msb, lsb)
+    # Values and presence of the multiplexors by name (None for the multiplexor of the message)
+    multiplexors = {None: (multiplexing_mode, numpy.ones(frames.shape[0], dtype=bool))}
+
+    def present(signal):
+        if signal.multiplexor_signal not in multiplexors:
+            return numpy.zeros(frames.shape[0], dtype=bool)
+        values, is_present = multiplexors[signal.multiplexor_signal]
+        return is_present & (values == signal.multiplexing)
+
+    for entry in layout.submultiplexors:
+        is_present = present(entry[0])
+        if is_present.any():
+            multiplexors[entry[0].name] = _extract(entry, frames, msb, lsb), is_present
+
+    for entry in layout.entries:
+        signal = entry[0]
+        if signal.multiplexing is None:
+            columns[signal.name] = _extract(entry, frames, msb, lsb)
+            continue
+
+        # Only the frames of the multiplexing mode of the signal are decoded
+        masked = ~present(signal)
+        if masked.all():
+            values = numpy.zeros(frames.shape[0])
+        else:
+            values = _extract(entry, frames, msb, lsb)
+        columns[signal.name] = numpy.ma.masked_array(values, mask=masked)
+
+    return columns
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Statistics of the bus computed in the decoding loop: frame rate, jitter and
+# histogram of the inter-arrival times by message ID, missing cycles of the
+# periodic messages (GenMsgCycleTime attribute of the DBC) and bus load. The
+# counters are updated in constant time by frame and use a fixed memory by
+# message ID, snapshots can be taken at any time without stopping the ingestion
+# (from another thread with threadsafe=True).
+#
+
+import bisect
+import math
+import threading
+
+from . import exceptions
+from . import logs
+
+
+# Upper bounds of the buckets of the histograms of the inter-arrival times (seconds),
+# the last bucket counts the longer intervals
+HISTOGRAM_BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+# Default nominal bit rate of the bus (bit/s)
+BITRATE = 500000
+
+
+def frame_bits(message_id, message_length, extended=None, fd=None):
+    """Return the number of bits of a data frame on the bus, without the stuff bits.
+
+    Args:
+        message_id: int, message identifier.
+        message_length: int, length of the frame data in bytes.
+        extended: bool, extended frame (29-bit ID), by default when the ID doesn't
+            fit in 11 bits (the extended frames of small IDs must be given).
+        fd: bool, CAN FD frame, by default when the data is longer than 8 bytes.
+
+    Returns:
+        (nominal_bits, data_bits): the bits of the arbitration phase and the end of
+            the frame, sent at the nominal bit rate, and the bits of the data phase
+            of a CAN FD frame, sent at the data bit rate (0 for a classic frame).
+    """
+    if extended is None:
+        extended = message_id > 0x7ff
+    if fd is None:
+        fd = message_length > 8
+    if not fd:
+        # Start of frame, arbitration, control, data, CRC, acknowledgement, end of frame
+        # and interframe space
+        return (67 if extended else 47) + 8 * message_length, 0
+    # Arbitration up to the bit rate switch, then from the CRC delimiter to the interframe space
+    nominal_bits = (36 if extended else 17) + 13
+    # ESI, DLC, data, stuff count and CRC
+    data_bits = 5 + 8 * message_length + 4 + (17 if message_length <= 16 else 21)
+    return nominal_bits, data_bits
+
+
+class _IdStats(object):
+    """Streaming counters of the frames of a message ID."""
+
+    __slots__ = (
+        'name', 'cycle_time', 'frames', 'bits', 'first', 'last',
+        'intervals', 'interval_mean', 'interval_m2', 'interval_min', 'interval_max',
+        'missing', 'out_of_order', 'histogram')
+
+    def __init__(self, name, cycle_time, bucket_count):
+        self.name = name
+        self.cycle_time = cycle_time
+        self.frames = 0
+        self.bits = 0
+        self.first = None
+        self.last = None
+        self.intervals = 0
+        # Mean and sum of the squared deviations of the intervals (Welford)
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+        self.interval_min = None
+        self.interval_max = None
+        self.missing = 0
+        self.out_of_order = 0
+        self.histogram = [0] * bucket_count
+
+    def copy(self):
+        stats = _IdStats.__new__(_IdStats)
+        for name in _IdStats.__slots__:
+            setattr(stats, name, getattr(self, name))
+        stats.histogram = list(self.histogram)
+        return stats
+
+    def as_dict(self):
+        frame_rate = None
+        if self.frames > 1 and self.last > self.first:
+            frame_rate = (self.frames - 1) / (self.last - self.first)
+        jitter = math.sqrt(self.interval_m2 / self.intervals) if self.intervals else None
+        return {
+            'name': self.name,
+            'cycle_time': self.cycle_time,
+            'frames': self.frames,
+            'bits': self.bits,
+            'first': self.first,
+            'last': self.last,
+            'frame_rate': frame_rate,
+            'interval_mean': self.interval_mean if self.intervals else None,
+            'interval_min': self.interval_min,
+            'interval_max': self.interval_max,
+            'jitter': jitter,
+            'missing': self.missing,
+            'out_of_order': self.out_of_order,
+            'histogram': self.histogram,
+        }
+
+
+class BusStatistics(object):
+    """Statistics of the frames of a bus by message ID.
+
+    The frames are given with their reception time (add() or add_frames()), or
+    counted while they are decoded (iter_decode()). The frames without timestamp
+    are only counted.
+
+    A frame of a periodic message received more than (1 + tolerance) cycles after
+    the previous one counts the cycles missed in between. The bus load is the
+    time of the frames on the bus (see frame_bits(), the stuff bits are ignored)
+    over the elapsed time, on average and by interval of load_interval seconds.
+    The frames of the logs are counted as extended frames when their ID doesn't
+    fit in 11 bits and as CAN FD frames when they're longer than 8 bytes.
+
+    snapshot() can be called at any time between two frames. To take snapshots
+    from another thread than the one adding the frames, use threadsafe (the
+    counters are then updated under a lock).
+
+    Args:
+        db: Database, the compiled DBC (see compile_dbc()), for the names and cycle times
+        bitrate: int, nominal bit rate of the bus in bit/s
+        data_bitrate: int, bit rate of the data phase of the CAN FD frames (defaults to bitrate)
+        histogram_bounds: sorted list of float, upper bounds of the buckets of the
+            histograms of the inter-arrival times in seconds
+        tolerance: float, part of the cycle time tolerated as delay before a cycle is missing
+        load_interval: float, length of the intervals of the bus load in seconds
+        threadsafe: bool, lock the counters for the snapshots of other threads
+    """
+
+    def __init__(self, db=None, bitrate=BITRATE, data_bitrate=None, histogram_bounds=HISTOGRAM_BOUNDS,
+                 tolerance=0.5, load_interval=1.0, threadsafe=False):
+        self.db = db
+        self.bitrate = bitrate
+        self.data_bitrate = data_bitrate or bitrate
+        self.histogram_bounds = tuple(histogram_bounds)
+        self.tolerance = tolerance
+        self.load_interval = load_interval
+        self._lock = threading.Lock() if threadsafe else None
+        if threadsafe:
+            self.add = self._add_locked
+        # (message ID, length, extended, fd) -> (bits, seconds on the bus)
+        self._frame_costs = {}
+        self.reset()
+
+    def reset(self):
+        """Reset all the counters."""
+        if self._lock is not None:
+            with self._lock:
+                self._reset()
+        else:
+            self._reset()
+
+    def _reset(self):
+        # message ID -> _IdStats
+        self._ids = {}
+        self.frames = 0
+        self.bits = 0
+        # Time of the frames on the bus in seconds
+        self.busy = 0.0
+        self.first = None
+        self.last = None
+        # Index and busy time of the current load interval, of the last complete one and of the busiest
+        self._load_index = None
+        self._load_busy = 0.0
+        self._last_load_busy = None
+        self._peak_load_busy = None
+
+    def _new_stats(self, message_id):
+        name = cycle_time = None
+        if self.db is not None:
+            try:
+                message = self.db.get_message(message_id)
+            except exceptions.MessageNotFound:
+                pass
+            else:
+                name, cycle_time = message.name, message.cycle_time
+        stats = self._ids[message_id] = _IdStats(name, cycle_time, len(self.histogram_bounds) + 1)
+        return stats
+
+    def _frame_cost(self, key):
+        nominal_bits, data_bits = frame_bits(*key)
+        cost = self._frame_costs[key] = (
+            nominal_bits + data_bits, nominal_bits / float(self.bitrate) + data_bits / float(self.data_bitrate))
+        return cost
+
+    def _add_locked(self, message_id, message_length, timestamp=None, extended=None, fd=None):
+        with self._lock:
+            BusStatistics.add(self, message_id, message_length, timestamp, extended, fd)
+
+    def add(self, message_id, message_length, timestamp=None, extended=None, fd=None):
+        """Count a frame.
+
+        Args:
+            message_id: int, message identifier.
+            message_length: int, length of the frame data in bytes.
+            timestamp: float, reception time of the frame in seconds (None when unknown).
+            extended, fd: bool, kind of frame (see frame_bits()).
+        """
+        key = message_id, message_length, extended, fd
+        try:
+            bits, busy = self._frame_costs[key]
+        except KeyError:
+            bits, busy = self._frame_cost(key)
+        stats = self._ids.get(message_id)
+        if stats is None:
+            stats = self._new_stats(message_id)
+        stats.frames += 1
+        stats.bits += bits
+        self.frames += 1
+        self.bits += bits
+        self.busy += busy
+        if timestamp is None:
+            return
+
+        if self.first is None:
+            self.first = timestamp
+        if self.last is None or timestamp > self.last:
+            self.last = timestamp
+        self._add_load(timestamp, busy)
+
+        last = stats.last
+        if last is None:
+            stats.first = stats.last = timestamp
+            return
+        interval = timestamp - last
+        if interval < 0:
+            stats.out_of_order += 1
+            return
+        stats.last = timestamp
+
+        stats.intervals += 1
+        delta = interval - stats.interval_mean
+        stats.interval_mean += delta / stats.intervals
+        stats.interval_m2 += delta * (interval - stats.interval_mean)
+        if stats.interval_min is None or interval < stats.interval_min:
+            stats.interval_min = interval
+        if stats.interval_max is None or interval > stats.interval_max:
+            stats.interval_max = interval
+        stats.histogram[bisect.bisect_left(self.histogram_bounds, interval)] += 1
+
+        cycle_time = stats.cycle_time
+        if cycle_time is not None and interval > cycle_time * (1 + self.tolerance):
+            stats.missing += max(int(round(interval / cycle_time)) - 1, 1)
+
+    def _add_load(self, timestamp, busy):
+        index = int(math.floor(timestamp / self.load_interval))
+        if index == self._load_index:
+            self._load_busy += busy
+            return
+        if self._load_index is not None and index < self._load_index:
+            # Out of order, counted in the current interval
+            self._load_busy += busy
+            return
+        if self._load_index is not None:
+            # An interval skipped without frames had no load
+            self._last_load_busy = self._load_busy if index == self._load_index + 1 else 0.0
+            if self._peak_load_busy is None or self._load_busy > self._peak_load_busy:
+                self._peak_load_busy = self._load_busy
+        self._load_index = index
+        self._load_busy = busy
+
+    def add_frames(self, frames):
+        """Count frames (logs.Frame)."""
+        for frame in frames:
+            self.add(frame.message_id, len(frame.data), frame.timestamp)
+
+    def _counted(self, frames):
+        for frame in frames:
+            self.add(frame.message_id, len(frame.data), frame.timestamp)
+            yield frame
+
+    def iter_decode(self, frames, db=None, ignore_unknown=True):
+        """Decode frames and count them on the way (see logs.decode_frames()).
+
+        Args:
+            frames: iterable of logs.Frame (eg. logs.iter_frames())
+            db: Database or decoder of it, defaults to the database of the statistics
+
+        Yields:
+            message: decoded message with its 'timestamp'.
+        """
+        return logs.decode_frames(self._counted(frames), db if db is not None else self.db, ignore_unknown)
+
+    def snapshot(self):
+        """Return the statistics of the frames counted so far.
+
+        Returns:
+            dict: the bus totals ('frames', 'bits', 'first' and 'last' timestamps,
+            'frame_rate', 'bus_load', 'last_bus_load' and 'peak_bus_load', as
+            fractions of the time), the 'histogram_bounds' and the 'messages'
+            statistics by message ID ('name', 'cycle_time', 'frames', 'frame_rate',
+            'interval_mean', 'interval_min', 'interval_max', 'jitter' (standard
+            deviation of the intervals), 'missing' cycles, 'out_of_order' frames and
+            'histogram' of the intervals).
+        """
+        if self._lock is not None:
+            with self._lock:
+                counters = self._copy()
+        else:
+            counters = self._copy()
+        ids, frames, bits, busy, first, last, last_load_busy, peak_load_busy = counters
+
+        duration = last - first if first is not None else 0
+        return {
+            'frames': frames,
+            'bits': bits,
+            'first': first,
+            'last': last,
+            'frame_rate': (frames - 1) / duration if duration > 0 else None,
+            'bus_load': busy / duration if duration > 0 else None,
+            'last_bus_load': last_load_busy / self.load_interval if last_load_busy is not None else None,
+            'peak_bus_load': peak_load_busy / self.load_interval if peak_load_busy is not None else None,
+            'histogram_bounds': list(self.histogram_bounds),
+            'messages': {message_id: stats.as_dict() for message_id, stats in ids.items()},
+        }
+
+    def _copy(self):
+        return (
+            {message_id: stats.copy() for message_id, stats in self._ids.items()},
+            self.frames, self.bits, self.busy, self.first, self.last,
+            self._last_load_busy, self._peak_load_busy)
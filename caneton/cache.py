@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# On-disk cache of compiled DBC. Loading a large DBC in JSON is slow, the
+# compiled messages are stored once in a cache file which is memory-mapped by
+# the next loads: only a small index is read and each message is unpickled
+# the first time it's decoded.
+#
+# Cache file format:
+#     header_size      8 bytes, little endian
+#     header           pickle of a dict (caneton version, source file path,
+#                      mtime, size and SHA-1, index of the messages)
+#     messages         pickles of the compiled messages, the index gives
+#                      their (offset, size) after the header
+#
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+
+from . import compat
+from . import database
+from .version import VERSION
+
+
+FORMAT = 4
+HEADER_SIZE = struct.Struct('<Q')
+
+
+def default_cache_dir():
+    """Return the cache directory ($CANETON_CACHE_DIR or $XDG_CACHE_HOME/caneton)."""
+    if os.environ.get('CANETON_CACHE_DIR'):
+        return os.environ['CANETON_CACHE_DIR']
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'caneton')
+
+
+def cache_path(path, cache_dir=None):
+    """Return the path of the cache file of the DBC file (keyed by its absolute path)."""
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir or default_cache_dir(), key + '.dbc.cache')
+
+
+def _file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class _CachedMessages(compat.Mapping):
+    """Compiled messages unpickled on demand from the mapped cache file."""
+
+    def __init__(self, cache_mmap, data_offset, index):
+        self._mmap = cache_mmap
+        self._data_offset = data_offset
+        self._index = index
+        self._messages = {}
+        # Set by Database.compile(), applied to the messages as they're unpickled
+        self._codegen = None
+
+    def __getitem__(self, message_id):
+        try:
+            return self._messages[message_id]
+        except KeyError:
+            offset, size = self._index[message_id]
+        offset += self._data_offset
+        message = self._messages[message_id] = pickle.loads(self._mmap[offset:offset + size])
+        if self._codegen is not None:
+            message.set_codegen(self._codegen)
+        return message
+
+    def set_codegen(self, codegen):
+        """Set the decoding of the messages loaded and of the next ones (see Database.compile())."""
+        self._codegen = codegen
+        for message in self._messages.values():
+            message.set_codegen(codegen)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __reduce__(self):
+        # Sent to other processes as a plain dict of all the messages
+        return dict, (dict(self.items()),)
+
+
+def _read_header(cache_file):
+    header_size, = HEADER_SIZE.unpack(cache_file.read(HEADER_SIZE.size))
+    return pickle.loads(cache_file.read(header_size)), HEADER_SIZE.size + header_size
+
+
+def write_cache(db, path, source, cache_dir=None):
+    """Write the compiled DBC in the cache file of the source DBC file.
+
+    Args:
+        db: Database, the compiled DBC
+        path: str, path of the source DBC file (JSON)
+        source: bytes, content of the source DBC file
+        cache_dir: str, cache directory (see default_cache_dir())
+
+    Returns:
+        path: str, path of the cache file
+    """
+    blobs = []
+    index = {}
+    offset = 0
+    for message_id, message in db.messages.items():
+        blob = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        index[message_id] = (offset, len(blob))
+        offset += len(blob)
+        blobs.append(blob)
+
+    stat = os.stat(path)
+    header = {
+        'format': FORMAT,
+        'version': VERSION,
+        'path': os.path.abspath(path),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': hashlib.sha1(source).hexdigest(),
+        'index': index,
+    }
+    destination = cache_path(path, cache_dir)
+    _write_file(destination, header, blobs)
+    return destination
+
+
+def _write_file(destination, header, blobs):
+    header = pickle.dumps(header, pickle.HIGHEST_PROTOCOL)
+    directory = os.path.dirname(destination)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # Written in a temporary file then renamed so a concurrent load never reads a partial file
+    fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER_SIZE.pack(len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        getattr(os, 'replace', os.rename)(temporary_path, destination)
+    except Exception:
+        os.unlink(temporary_path)
+        raise
+
+
+def read_cache(path, cache_dir=None):
+    """Load the compiled DBC from the cache when it's up to date with the DBC file.
+
+    Returns:
+        db: Database or None when there is no valid cache.
+    """
+    try:
+        cache_file = open(cache_path(path, cache_dir), 'rb')
+    except (IOError, OSError):
+        return None
+
+    with cache_file:
+        try:
+            header, data_offset = _read_header(cache_file)
+        except Exception:
+            return None
+        if header.get('format') != FORMAT or header.get('version') != VERSION:
+            return None
+
+        stat = os.stat(path)
+        touched = (stat.st_mtime, stat.st_size) != (header['mtime'], header['size'])
+        if touched and _file_sha1(path) != header['sha1']:
+            # Modified
+            return None
+
+        cache_mmap = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if touched:
+        # Same content, the cache is rewritten with the new modification time so the
+        # next loads don't hash the file again
+        header.update(mtime=stat.st_mtime, size=stat.st_size)
+        try:
+            _write_file(cache_path(path, cache_dir), header, [cache_mmap[data_offset:]])
+        except (IOError, OSError):
+            pass
+    return database.Database(_CachedMessages(cache_mmap, data_offset, header['index']))
+
+
+def load_database(path, cache_dir=None, use_cache=True):
+    """Load a DBC file converted to JSON by libcanardbc and compile it, with a cache.
+
+    The first load compiles the DBC and stores it in the cache, the next loads
+    read the cache while the DBC file is unchanged (same modification time and
+    size, or same content). A cache which can't be written is ignored.
+
+    Args:
+        path: str, path of the DBC file in JSON
+        cache_dir: str, cache directory (see default_cache_dir())
+        use_cache: bool, False to always load and compile the JSON file
+
+    Returns:
+        db: Database, the compiled DBC
+
+    Raises:
+        exceptions.InvalidDBC: when used DBC has not messages entry
+        ValueError: when the DBC file isn't valid JSON
+    """
+    if use_cache:
+        db = read_cache(path, cache_dir)
+        if db is not None:
+            return db
+
+    with open(path, 'rb') as f:
+        source = f.read()
+    try:
+        dbc_json = json.loads(source.decode('utf-8'))
+    except ValueError:
+        raise ValueError("Unable to load the DBC file '%s' as JSON." % path)
+    db = database.compile_dbc(dbc_json)
+
+    if use_cache:
+        try:
+            write_cache(db, path, source, cache_dir)
+        except (IOError, OSError):
+            pass
+    return db
@@ -7,10 +7,24 @@
 #
 
 import binascii
+import io
 import json
 import argparse
+import sys
+import time
 
 import caneton
+from caneton import cache
+from caneton import logs
+
+# The modules of the log options (export loads numpy and pyarrow) are imported
+# when used, so the decoding of a single message starts faster.
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# Number of decoded messages written at once in batch mode
+BATCH_BUFFER_SIZE = 256
 
 
 def create_parser():
@@ -18,19 +32,64 @@ def create_parser():
     parser.add_argument(
         'dbcfile', type=argparse.FileType('r'),
         help="DBC file converted in JSON format to use for decoding.")
-    parser.add_argument('id', type=str, help="ID of the message on the CAN bus (eg. 0x5BB or 1467)")
-    parser.add_argument('data', type=str, help="message data in hexadecimal (eg. 0x1112131415161718)")
+    parser.add_argument('id', type=str, nargs='?',
+        help="ID of the message on the CAN bus (eg. 0x5BB or 1467), or '-' to decode the frames "
+             "of stdin, one by line as 'id#data' (candump, in hexadecimal) or 'id data'")
+    parser.add_argument('data', type=str, nargs='?', help="message data in hexadecimal (eg. 0x1112131415161718)")
+    parser.add_argument('--input', type=argparse.FileType('r'),
+        help="candump or ASC log to decode instead of a single message ('-' for stdin)")
     parser.add_argument('--output', type=str, choices=['json', 'text'], default='text',
-        help="Format of the output (JSON or text)")
+        help="Format of the output (JSON or text, one JSON object by line for a log)")
+    parser.add_argument('--jobs', type=int, default=1,
+        help="number of processes to decode the log file given by --input")
+    parser.add_argument('--export', metavar='DIRECTORY',
+        help="write the messages of the log given by --input by columns in DIRECTORY "
+             "(Parquet files, or NPZ without pyarrow) instead of printing them")
+    parser.add_argument('--from', dest='start', type=float, metavar='TIMESTAMP',
+        help="decode only the frames of the log given by --input from this timestamp")
+    parser.add_argument('--to', dest='end', type=float, metavar='TIMESTAMP',
+        help="decode only the frames of the log given by --input before this timestamp")
+    parser.add_argument('--id', dest='ids', type=parse_id, action='append', metavar='ID',
+        help="decode only the frames of this message ID (can be repeated), the log given by "
+             "--input is indexed once in a sidecar file to seek to the frames")
+    parser.add_argument('--no-cache', action='store_true',
+        help="don't use the cache of compiled DBC (see caneton-dbc-compile)")
     return parser
 
-def args_cleanup(args):
-    # Check and cleanup message ID (minium 0x1)
-    if len(args.id) > 2 and args.id[:2] == '0x':
-        # It's an hexadecimal number
-        message_id = int(args.id, 16)
+
+def parse_id(message_id):
+    """Convert a message ID argument, in hexadecimal with the 0x prefix or decimal."""
+    if len(message_id) > 2 and message_id[:2] == '0x':
+        return int(message_id, 16)
+    return int(message_id)
+
+
+def load_dbc(dbcfile):
+    # Load file as JSON file
+    try:
+        return json.loads(dbcfile.read())
+    except ValueError:
+        raise ValueError("Unable to load the DBC file '%s' as JSON." % dbcfile)
+
+
+def load_database(args):
+    """Return the compiled DBC of the arguments, from the cache when possible."""
+    if args.no_cache or args.dbcfile is sys.stdin:
+        db = caneton.compile_dbc(load_dbc(args.dbcfile))
     else:
-        message_id = int(args.id)
+        db = cache.load_database(args.dbcfile.name)
+    args.dbcfile.close()
+    return db
+
+
+def parse_message(args):
+    """Check and convert the message ID and data arguments.
+
+    Returns:
+        (message_id, data, length)
+    """
+    # Check and cleanup message ID (minium 0x1)
+    message_id = parse_id(args.id)
 
     # Check the message data
     # Check the length of the data before removing the 0x prefix
@@ -53,6 +112,8 @@ def args_cleanup(args):
     if byte_length > caneton.MESSAGE_MAX_LENGTH:
         raise ValueError("The CAN message data length is too large (%d > %d)" % (
             byte_length, caneton.MESSAGE_MAX_LENGTH))
+    # Longer than a CAN frame, it must be a CAN FD frame
+    caneton.length_to_dlc(byte_length)
 
     try:
         # Convert hexadecimal string to bytes
@@ -61,11 +122,85 @@ def args_cleanup(args):
     except ValueError:
         raise ValueError("Invalid data argument '%s'." % args.data)
 
-    # Load file as JSON file
+    return message_id, data, length
+
+
+def parse_frame_line(line):
+    """Parse a frame line of the batch mode, 'id#data' or 'id data'.
+
+    In 'id#data' the ID and the data are in hexadecimal (as candump), in 'id data'
+    they're given as on the command line (the 0x prefix of the data is optional).
+
+    Returns:
+        (message_id, data)
+
+    Raises:
+        ValueError: when the line is invalid
+    """
+    fields = line.split()
+    if len(fields) == 1 and '#' in fields[0]:
+        message_id, data = fields[0].split('#', 1)
+        message_id = int(message_id, 16)
+    elif len(fields) == 2:
+        message_id, data = parse_id(fields[0]), fields[1]
+        if data[:2] == '0x':
+            data = data[2:]
+    else:
+        raise ValueError("Invalid frame line '%s' (expected 'id#data' or 'id data')." % line)
     try:
-        dbc_json = json.loads(args.dbcfile.read())
-    except ValueError:
-        raise ValueError("Unable to load the DBC file '%s' as JSON." % args.dbcfile)
+        data = binascii.unhexlify(data)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid data '%s'." % data)
+    caneton.length_to_dlc(len(data))
+    return message_id, data
+
+
+def batch_output(lines, db, is_json_output, output=None, stats_output=None):
+    """Decode the frame lines (see parse_frame_line()) and write the messages.
+
+    The messages are written by chunks, the invalid lines and the frames which
+    can't be decoded are reported on stats_output and skipped. The number of
+    frames decoded by second is written on stats_output at the end.
+
+    Returns:
+        (frames, errors): number of frames decoded and of lines skipped
+    """
+    output = output or sys.stdout
+    stats_output = stats_output or sys.stderr
+    formatter = message_json if is_json_output else log_message_text
+    decode = db.decode
+    chunk = []
+    frames = errors = 0
+    start = timer()
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            message_id, data = parse_frame_line(line)
+            message = decode(message_id, data)
+        except (ValueError, caneton.CanetonError) as e:
+            errors += 1
+            stats_output.write("Line %d: %s\n" % (line_number, e))
+            continue
+        chunk.append(formatter(message))
+        frames += 1
+        if len(chunk) >= BATCH_BUFFER_SIZE:
+            output.write('\n'.join(chunk) + '\n')
+            del chunk[:]
+    if chunk:
+        output.write('\n'.join(chunk) + '\n')
+    output.flush()
+
+    duration = timer() - start
+    stats_output.write("%d frames decoded in %.3f s (%.0f frames/s), %d lines skipped\n" % (
+        frames, duration, frames / duration if duration else 0, errors))
+    return frames, errors
+
+
+def args_cleanup(args):
+    message_id, data, length = parse_message(args)
+    dbc_json = load_dbc(args.dbcfile)
 
     return {
         'message_id': message_id, 'message_data': data, 'message_length': length,
@@ -73,29 +208,172 @@ def args_cleanup(args):
     }
 
 
+def message_json(message):
+    """Serialize the decoded message in JSON (the raw data in hexadecimal)."""
+    message = dict(message, raw_data=binascii.hexlify(message['raw_data']).decode('ascii'))
+    return json.dumps(message)
+
+
+def message_text(message):
+    """Format the decoded message in text, one line by signal."""
+    lines = ["Message {name} {id:d} (0x{id:x})".format(**message)]
+    if message.get('timestamp') is not None:
+        lines.append("Timestamp: %f" % message['timestamp'])
+    if message['multiplexing_mode']:
+        lines.append("Multiplexing mode: %s" % message['multiplexing_mode'])
+
+    for signal in message['signals']:
+        endianness = 'LSB' if signal['is_little_endian'] else 'MSB'
+        lines.append(
+            "Signal {name} - ({length}@{bit_start} {endianness})x{factor}+{offset} = {value} {unit}".format(
+                endianness=endianness, **signal))
+    return '\n'.join(lines)
+
+
 def message_output(message, is_json_output):
     if is_json_output:
+        print(message_json(message))
         return message
     else:
-        print("Message {name} {id:d} (0x{id:x})".format(**message))
-        if message['multiplexing_mode']:
-            print("Multiplexing mode: %s" % message['multiplexing_mode'])
+        print(message_text(message))
+
+
+def log_message_text(message):
+    # Messages of a log are separated by an empty line
+    return message_text(message) + '\n'
+
+
+def log_output(log_file, db, is_json_output, jobs=1, messages=None, errors=None):
+    """Decode and print the messages of a log, one by one as they are read.
+
+    With several jobs, the log is decoded by chunks in parallel processes (the
+    messages are still printed in the order of the log).
+
+    messages are the decoded messages to print instead of all the messages of
+    the log (see log_messages()). The frames which can't be decoded are skipped
+    and appended to errors when it's given (see logs.iter_decode()).
+    """
+    formatter = message_json if is_json_output else log_message_text
+    if messages is not None:
+        outputs = (formatter(message) for message in messages)
+    elif jobs > 1:
+        from caneton import parallel
+
+        outputs = parallel.parallel_decode(
+            log_file.name, db, workers=jobs, formatter=formatter, errors=errors)
+    else:
+        outputs = (formatter(message) for message in logs.iter_decode(log_file, db, errors=errors))
+    for output in outputs:
+        print(output)
+
+
+def log_messages(log_file, db, args, errors=None):
+    """Decode the messages of a log, only the ones of the range and IDs of the arguments.
+
+    A log file is read through its index (built on the first query), stdin is filtered.
+    The frames which can't be decoded are skipped and appended to errors when it's given.
+    """
+    if args.start is None and args.end is None and args.ids is None:
+        return logs.iter_decode(log_file, db, errors=errors)
+    from caneton import index
+
+    if log_file is sys.stdin:
+        frames = index.filter_frames(logs.iter_frames(log_file), args.start, args.end, args.ids)
+        return logs.decode_frames(frames, db, errors=errors)
+    return index.open_index(log_file.name).iter_decode(db, args.start, args.end, args.ids, errors=errors)
+
+
+def report_errors(errors, stats_output=None):
+    """Write the frames skipped because they can't be decoded (see log_output())."""
+    stats_output = stats_output or sys.stderr
+    for frame, error in errors:
+        stats_output.write("Frame 0x%x at %s: %s\n" % (frame.message_id, frame.timestamp, error))
+    if errors:
+        stats_output.write("%d frames skipped\n" % len(errors))
+
+
+def log_export(messages, db, directory):
+    """Write decoded messages by columns in the directory."""
+    from caneton import export
+
+    with export.ColumnarSink(directory, db) as sink:
+        sink.add_all(messages)
+    for path in sink.paths:
+        print(path)
 
-        for signal in message['signals']:
-            signal['endianness'] = 'LSB' if signal['is_little_endian'] else 'MSB'
-            print("Signal {name} - ({length}@{bit_start} {endianness})x{factor}+{offset} = {value} {unit}".format(
-                **signal))
 
 def main():
     parser = create_parser()
     args = parser.parse_args()
-    cleaned_args = args_cleanup(args)
-    args.dbcfile.close()
+    if args.input is not None:
+        if args.jobs > 1 and args.input is sys.stdin:
+            parser.error("--jobs requires a log file, not stdin")
+        is_query = args.start is not None or args.end is not None or args.ids is not None
+        if args.jobs > 1 and (args.export or is_query):
+            parser.error("--jobs can't be used with --export, --from, --to or --id")
+        db = load_database(args)
+        errors = []
+        with args.input:
+            if args.export:
+                log_export(log_messages(args.input, db.decoder(compact=True), args, errors), db, args.export)
+            elif is_query:
+                messages = log_messages(args.input, db, args, errors)
+                log_output(args.input, db, args.output == 'json', messages=messages)
+            else:
+                log_output(args.input, db, args.output == 'json', args.jobs, errors=errors)
+        report_errors(errors)
+        return
+    if args.export or args.start is not None or args.end is not None or args.ids is not None:
+        parser.error("--export, --from, --to and --id require --input")
+
+    if args.id == '-':
+        if args.data is not None:
+            parser.error("the message data can't be given with '-' (the frames are read from stdin)")
+        db = load_database(args)
+        batch_output(sys.stdin, db, args.output == 'json')
+        return
+
+    if args.id is None or args.data is None:
+        parser.error("the message id and data are required (or --input, or '-' for the frames of stdin)")
+    message_id, data, length = parse_message(args)
+    db = load_database(args)
 
-    message = caneton.message_decode(**cleaned_args)
+    message = db.decode(message_id, data, length)
     message_output(message, args.output == 'json')
 
 
+def compile_main():
+    parser = argparse.ArgumentParser(
+        description="Compile DBC files converted in JSON format and store them in the cache of caneton.")
+    parser.add_argument('dbcfiles', nargs='+', help="DBC files converted in JSON format")
+    parser.add_argument('--cache-dir', help="cache directory (default: %s)" % cache.default_cache_dir())
+    args = parser.parse_args()
+
+    for path in args.dbcfiles:
+        with open(path, 'rb') as f:
+            source = f.read()
+        db = caneton.compile_dbc(load_dbc(io.BytesIO(source)))
+        print("%s: %d messages compiled in %s" % (
+            path, len(db.messages), cache.write_cache(db, path, source, args.cache_dir)))
+
+
+def index_main():
+    from caneton import index
+
+    parser = argparse.ArgumentParser(
+        description="Index candump or ASC logs (or frame stores) to decode time ranges and message IDs "
+                    "with caneton-decode --from, --to and --id.")
+    parser.add_argument('captures', nargs='+', help="logs to index")
+    parser.add_argument('--checkpoint-interval', type=int, default=index.CHECKPOINT_INTERVAL,
+        help="number of frames between two time checkpoints (default: %(default)s)")
+    args = parser.parse_args()
+
+    for path in args.captures:
+        capture = index.CaptureIndex(
+            path, index.build_index(path, checkpoint_interval=args.checkpoint_interval))
+        print("%s: %d frames of %d message IDs indexed in %s" % (
+            path, capture.frame_count, len(capture.message_ids), capture.index))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Generation of a specialized Python function by message layout: the shifts,
+# masks, sign handling, scaling and multiplexing branches are inlined so a
+# frame is decoded by a single call to straight-line code (see
+# Database.compile()).
+#
+
+import collections
+import itertools
+import linecache
+import math
+import struct
+
+from . import compat
+from . import database
+
+
+# Maximum number of compiled sources kept (and registered in linecache)
+CODE_CACHE_SIZE = 4096
+
+# Compiled code by generated source, the same layout is generated once, the oldest
+# sources are evicted first
+_code_cache = collections.OrderedDict()
+_code_numbers = itertools.count()
+
+
+def _literal(value, namespace):
+    """Return the Python expression of a constant (a global name when it has no literal)."""
+    if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+        name = 'CONSTANT_%d' % len(namespace)
+        namespace[name] = value
+        return name
+    return repr(value)
+
+
+def _value_expression(entry, index, namespace):
+    """Return the Python expression of the physical value of an entry of the layout."""
+    signal, shift, mask, nbits, _template, unpacker = entry
+    if unpacker is not None:
+        namespace['unpack_%s' % index] = unpacker[0].unpack_from
+        # The frame data shorter than the layout is decoded by shift and mask
+        namespace['ENTRY_%s' % index] = entry
+        return '(unpack_%s(message_data, %d)[0] * %s + %s if len(message_data) == %d else %s)' % (
+            index, unpacker[1], _literal(signal.factor, namespace), _literal(signal.offset, namespace), unpacker[2],
+            'entry_value(ENTRY_%s, 0, 0, message_data)' % index)
+    if not nbits:
+        # Raises the DecodingError of the empty signal when it's decoded
+        namespace['ENTRY_%s' % index] = entry
+        return 'entry_value(ENTRY_%s, 0, 0, message_data)' % index
+
+    raw = 'lsb' if signal.is_little_endian else 'msb'
+    if shift:
+        raw = '(%s >> %d)' % (raw, shift)
+    raw = '(%s & 0x%x)' % (raw, mask)
+    if compat.IS_PY2:
+        # As Signal.value(), an int when the value fits
+        raw = 'int%s' % raw
+    if signal.is_signed:
+        if nbits > 1:
+            # Two's complement
+            raw = '((%s ^ 0x%x) - 0x%x)' % (raw, 1 << (nbits - 1), 1 << (nbits - 1))
+    elif signal.value_type == 'float':
+        raw = 'unpack_float(pack_uint32(%s))[0]' % raw
+    elif signal.value_type == 'double':
+        raw = 'unpack_double(pack_uint64(%s))[0]' % raw
+
+    if signal.is_raw:
+        return raw
+    return '%s * %s + %s' % (raw, _literal(signal.factor, namespace), _literal(signal.offset, namespace))
+
+
+def generate_source(message, layout, namespace):
+    """Generate the source of the decoding function of a layout of the message.
+
+    The function takes the data of the frame and returns the (multiplexing_mode,
+    entries, values) tuple of Message._decode_values().
+
+    Args:
+        message: database.Message, the message of the layout
+        layout: database.Layout, the resolved signals to decode
+        namespace: dict, filled with the global variables of the function
+
+    Returns:
+        source: str
+    """
+    namespace.update({
+        'int_from_bytes': int.from_bytes if compat.IS_PY3 else compat.int_from_bytes,
+        'entry_value': database.entry_value,
+        'unpack_float': struct.Struct('f').unpack,
+        'pack_uint32': struct.Struct('I').pack,
+        'unpack_double': struct.Struct('d').unpack,
+        'pack_uint64': struct.Struct('Q').pack,
+    })
+    lines = [
+        '# Message %s %d (0x%x)' % (message.name, message.id, message.id),
+        'def decode_values(message_data):',
+    ]
+    if layout.uses_msb:
+        lines.append("    msb = int_from_bytes(message_data, 'big')")
+    if layout.uses_lsb:
+        lines.append("    lsb = int_from_bytes(message_data, 'little')")
+
+    expressions = {
+        id(entry): _value_expression(entry, index, namespace) for index, entry in enumerate(layout.entries)}
+
+    def add_return(indent, multiplexing_mode, entries):
+        # The entries tuples of the layout are returned, shared by the decoded messages
+        name = 'ENTRIES_%d' % len(namespace)
+        namespace[name] = entries
+        values = ''.join('%s, ' % expressions[id(entry)] for entry in entries)
+        lines.append('%sreturn %s, %s, (%s)' % (indent, multiplexing_mode, name, values))
+
+    if layout.multiplexor is None:
+        add_return('    ', 'None', layout.entries)
+        return '\n'.join(lines) + '\n'
+
+    lines.append('    multiplexing_mode = %s' % _value_expression(layout.multiplexor, 'mux', namespace))
+    for mode_index, (mode, entries) in enumerate(layout.modes.items()):
+        namespace['MODE_%d' % mode_index] = mode
+        lines.append('    %s multiplexing_mode == MODE_%d:' % ('elif' if mode_index else 'if', mode_index))
+        add_return('        ', 'multiplexing_mode', entries)
+    # Other modes, only the signals present whatever the mode
+    add_return('    ', 'multiplexing_mode', layout.common)
+    return '\n'.join(lines) + '\n'
+
+
+def compile_layout(message, layout):
+    """Generate and compile the decoding function of the layout (set in layout.decode_values).
+
+    The generated source is registered in linecache so it appears in tracebacks,
+    as long as it's in the cache (CODE_CACHE_SIZE). The layouts with extended multiplexing keep the default decoding.
+    """
+    if layout.submultiplexors:
+        return layout
+    namespace = {}
+    source = generate_source(message, layout, namespace)
+    try:
+        code, filename = _code_cache[source]
+    except KeyError:
+        filename = '<caneton-codegen %d %d>' % (next(_code_numbers), message.id)
+        code = compile(source, filename, 'exec')
+        while len(_code_cache) >= CODE_CACHE_SIZE:
+            _, (_, evicted) = _code_cache.popitem(last=False)
+            linecache.cache.pop(evicted, None)
+        _code_cache[source] = code, filename
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    exec(code, namespace)
+    layout.decode_values = namespace['decode_values']
+    layout.source = source
+    return layout
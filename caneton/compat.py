@@ -35,3 +35,26 @@ def int_from_bytes(data, byteorder, signed=False):
     if signed and (data[-1] & 0x80):
         num = num - (2 ** (len(data) * 8))
     return num
+
+
+def int_to_bytes(num, length, byteorder):
+    """Convert a positive integer to bytes (the inverse of int_from_bytes())
+
+    Args:
+        num: int, the integer to convert, lower than 2 ** (length * 8)
+        length: int, number of bytes
+        byteorder: 'big' or 'little', indicates the endianness
+    """
+    if IS_PY3:
+        return num.to_bytes(length, byteorder)
+
+    data = bytearray((num >> (offset * 8)) & 0xff for offset in range(length))
+    if byteorder == 'big':
+        data.reverse()
+    return bytes(data)
+
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
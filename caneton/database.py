@@ -0,0 +1,1041 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Compiled form of a DBC: the signal layouts are resolved once so decoding
+# a frame doesn't walk the DBC dictionaries anymore.
+#
+
+import copy
+import struct
+
+from . import compat
+from . import exceptions
+
+
+_UINT32 = struct.Struct('I')
+_UINT64 = struct.Struct('Q')
+_FLOAT = struct.Struct('f')
+_DOUBLE = struct.Struct('d')
+
+# Formats of the floating point signals read directly from the frame when they're
+# aligned on bytes, by (value type, is little endian)
+_FLOAT_STRUCTS = {
+    ('float', False): struct.Struct('>f'),
+    ('float', True): struct.Struct('<f'),
+    ('double', False): struct.Struct('>d'),
+    ('double', True): struct.Struct('<d'),
+}
+
+
+def _scaling_cast(option_value):
+    """Return the factor or offset as int when it's an integer value, float otherwise."""
+    cast = int if float(option_value).is_integer() else float
+    return cast(option_value)
+
+
+class Signal(object):
+    """Static description of a signal, extracted from the DBC once for all."""
+
+    __slots__ = (
+        'name', 'length', 'bit_start', 'is_little_endian', 'value_type', 'is_signed',
+        'factor', 'offset', 'is_raw', 'unit', 'is_multiplexor', 'multiplexing', 'multiplexor_signal',
+        'minimum', 'maximum',
+    )
+
+    def __init__(self, name, signal_info):
+        self.name = name
+        self.length = signal_info['length']
+        self.bit_start = signal_info['bit_start']
+        self.is_little_endian = bool(signal_info['little_endian'])
+        self.value_type = signal_info.get('value_type', 'integer')
+        self.is_signed = self.value_type == 'integer' and bool(signal_info.get('signed', 0))
+        self.factor = _scaling_cast(signal_info.get('factor', 1))
+        self.offset = _scaling_cast(signal_info.get('offset', 0))
+        # The physical value is the raw integer (no scaling to apply)
+        self.is_raw = (
+            self.value_type == 'integer' and type(self.factor) is int and self.factor == 1 and
+            type(self.offset) is int and self.offset == 0)
+        self.unit = signal_info.get('unit', '')
+        self.is_multiplexor = bool(signal_info.get('multiplexor', False))
+        # None when the signal is present whatever the multiplexing mode
+        self.multiplexing = signal_info.get('multiplexing')
+        # Extended multiplexing, name of the multiplexor of the signal when it isn't the
+        # multiplexor of the message (a sub-multiplexor, which has a multiplexing too)
+        self.multiplexor_signal = signal_info.get('multiplexor_signal')
+        # Range of the physical value, None when unbounded (min and max equal in the DBC)
+        self.minimum = signal_info.get('min')
+        self.maximum = signal_info.get('max')
+        if self.minimum is None or self.maximum is None or self.minimum == self.maximum:
+            self.minimum = self.maximum = None
+
+    def __repr__(self):
+        return '<Signal %s %d@%d>' % (self.name, self.length, self.bit_start)
+
+    def __getstate__(self):
+        # Python 2 only pickles the classes with __slots__ from protocol 2 without it
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def resolve(self, message_binary_length):
+        """Compute the position of the signal in the binary string of the message.
+
+        The positions are the ones reported in the decoded signal, they index the
+        MSB (Motorola) or LSB (Intel) binary string of the message (see signal_decode()).
+
+        Args:
+            message_binary_length: int, length of CAN message in binary format
+
+        Returns:
+            (bit_start, bit_end): the slice of the signal in the binary string.
+        """
+        if self.is_little_endian:
+            # In Intel format (little-endian), bit_start is the position of the
+            # Least Significant Bit so it needs to be byte swapped
+            bit_end = message_binary_length - self.bit_start
+            return bit_end - self.length, bit_end
+
+        # Motorola. Weird thing of the DBC format
+        bit_start = (self.bit_start // 8) * 8 + (7 - (self.bit_start % 8))
+        return bit_start, bit_start + self.length
+
+    def template(self, bit_start, bit_end):
+        """Build the static part of the decoded signal (same keys order as signal_decode)."""
+        signal = {'name': self.name, 'length': self.length, 'is_little_endian': self.is_little_endian}
+        if self.is_little_endian:
+            signal['bit_end'] = bit_end
+            signal['bit_start'] = bit_start
+        else:
+            signal['bit_start'] = bit_start
+            signal['bit_end'] = bit_end
+        signal['factor'] = self.factor
+        signal['offset'] = self.offset
+        signal['value'] = None
+        signal['unit'] = self.unit
+        return signal
+
+    def value(self, raw, nbits):
+        """Convert the raw value extracted from the frame to the physical value of the signal.
+
+        Args:
+            raw: int, the nbits bits of the signal as an unsigned integer
+            nbits: int, number of bits extracted (may be lower than the signal length
+                when the frame is too short)
+        """
+        if compat.IS_PY2:
+            # The integers of the frames of 8 bytes and more are longs, the values are
+            # ints when they fit as with the decoding of the bits strings
+            raw = int(raw)
+        if self.is_signed:
+            # Two's complement
+            if nbits > 1 and raw >> (nbits - 1):
+                raw -= 1 << nbits
+        elif self.value_type == 'float':
+            raw = _FLOAT.unpack(_UINT32.pack(raw))[0]
+        elif self.value_type == 'double':
+            raw = _DOUBLE.unpack(_UINT64.pack(raw))[0]
+        if self.is_raw:
+            return raw
+        return raw * self.factor + self.offset
+
+
+class Message(object):
+    """Compiled description of a DBC message.
+
+    The signals are sorted once by bit start and, for each frame length met,
+    their positions are resolved and kept in a layout so the decoding of the
+    following frames of the same length only does the extraction.
+    """
+
+    # Generate a decoding function for each layout (see Database.compile())
+    codegen = False
+
+    def __init__(self, message_id, message_info):
+        self.id = message_id
+        self.name = message_info['name']
+        # Length of the frames in bytes (classic CAN frame when not given)
+        self.length = message_info.get('length', 8)
+        # Period of the message in seconds (GenMsgCycleTime attribute, in ms), None when not periodic
+        try:
+            self.cycle_time = float(message_info.get('attributes', {})['GenMsgCycleTime']) / 1000 or None
+        except (KeyError, TypeError, ValueError):
+            self.cycle_time = None
+        self.has_signals = 'signals' in message_info
+        signals_info = message_info.get('signals', {})
+        self.signals = [
+            Signal(signal_name, signal_info)
+            for signal_name, signal_info in sorted(
+                signals_info.items(), key=lambda t: int(t[1]['bit_start']))
+        ]
+
+        self.multiplexor = None
+        if message_info.get('has_multiplexor', False):
+            # Raises KeyError as message_get_multiplexor() when signals are missing
+            multiplexors = [
+                (signal_name, signal_info) for signal_name, signal_info in message_info['signals'].items()
+                if signal_info.get('multiplexor', False)]
+            # With extended multiplexing, the sub-multiplexors are multiplexed themselves
+            multiplexors.sort(key=lambda t: t[1].get('multiplexing') is not None)
+            if multiplexors:
+                self.multiplexor = Signal(*multiplexors[0])
+                for signal in self.signals:
+                    if signal.multiplexor_signal == self.multiplexor.name:
+                        signal.multiplexor_signal = None
+
+        # Layouts and packers (see encode.Packer) by frame length (in bytes)
+        self._layouts = {}
+        self._packers = {}
+
+    def __repr__(self):
+        return '<Message %s %d (0x%x)>' % (self.name, self.id, self.id)
+
+    def __getstate__(self):
+        # The layouts (and their generated functions) are rebuilt on demand
+        state = self.__dict__.copy()
+        state['_layouts'] = {}
+        state['_packers'] = {}
+        return state
+
+    def set_codegen(self, codegen):
+        """Decode with generated functions or not (see Database.compile()), the layouts are rebuilt."""
+        self.codegen = codegen
+        self._layouts = {}
+
+    def layout(self, message_length):
+        """Return the signals resolved for a frame of the given length.
+
+        Args:
+            message_length: int, length of the useful data of the frame
+
+        Returns:
+            layout: Layout, the multiplexor and the signals which fit in the frame.
+
+        Raises:
+            exceptions.InvalidBitStart: when the multiplexor doesn't fit in the frame
+        """
+        try:
+            return self._layouts[message_length]
+        except KeyError:
+            pass
+
+        message_binary_length = message_length * 8
+
+        multiplexor = None
+        if self.multiplexor is not None:
+            if self.multiplexor.bit_start >= message_binary_length:
+                raise exceptions.InvalidBitStart(
+                    "Bit start %d of signal %s is too high" % (
+                        self.multiplexor.bit_start, self.multiplexor.name))
+            multiplexor = _entry(self.multiplexor, message_binary_length)
+
+        entries = []
+        skipped = []
+        for signal in self.signals:
+            # If the signal contains the multiplexor, we don't want to add it to the list of signals.
+            # The sub-multiplexors are decoded as the other multiplexed signals.
+            if signal.is_multiplexor and (signal.multiplexing is None or (
+                    self.multiplexor is not None and signal.name == self.multiplexor.name)):
+                continue
+            if signal.bit_start >= message_binary_length:
+                # The signal is invalid as the CAN frame is too small to contain it.
+                # However, new signals may be added to an already existing CAN frame,
+                # meaning the same DBC must support old versions with small frames
+                # and newer versions with extended data. To keep retro-compatibility
+                # we don't throw an error.
+                skipped.append(signal)
+                continue
+            entries.append(_entry(signal, message_binary_length))
+
+        layout = Layout(multiplexor, entries, skipped)
+        if self.codegen:
+            from . import codegen
+
+            codegen.compile_layout(self, layout)
+        self._layouts[message_length] = layout
+        return layout
+
+    def packer(self, message_length=None):
+        """Return the encoder of the frames of the given length (see encode.Packer).
+
+        Args:
+            message_length: int, length of the frames (defaults to the length of the message).
+        """
+        if message_length is None:
+            message_length = self.length
+        try:
+            return self._packers[message_length]
+        except KeyError:
+            from . import encode
+
+            packer = self._packers[message_length] = encode.Packer(self, message_length)
+            return packer
+
+    def encode(self, values, message_length=None):
+        """Encode the physical values of signals in a frame of this message.
+
+        Args:
+            values: dict, physical values by signal name (see encode.Packer.encode()).
+            message_length: int, length of the frame (defaults to the length of the message).
+
+        Returns:
+            message_data: bytes, the frame data.
+        """
+        return self.packer(message_length).encode(values)
+
+    def _decode_values(self, message_data, layout):
+        """Extract the values of the signals of the layout from the frame.
+
+        Returns:
+            (multiplexing_mode, entries, values): the entries of the decoded signals
+                and their physical values.
+        """
+        if layout.decode_values is not None:
+            return layout.decode_values(message_data)
+
+        # The whole frame as integers, the signals are extracted with a shift and a mask
+        msb = compat.int_from_bytes(message_data, 'big') if layout.uses_msb else 0
+        lsb = compat.int_from_bytes(message_data, 'little') if layout.uses_lsb else 0
+
+        if layout.multiplexor is None:
+            multiplexing_mode = None
+            entries = layout.entries
+        else:
+            multiplexing_mode = entry_value(layout.multiplexor, msb, lsb, message_data)
+            # Only the signals of the multiplexing mode (and the ones present whatever the mode)
+            if layout.submultiplexors:
+                entries = layout.nested_entries(multiplexing_mode, msb, lsb, message_data)[1]
+            else:
+                entries = layout.modes.get(multiplexing_mode, layout.common)
+        return multiplexing_mode, entries, [entry_value(entry, msb, lsb, message_data) for entry in entries]
+
+    def decode(self, message_data, message_length=None, layout=None):
+        """Decode a frame of this message.
+
+        Args:
+            message_data: bytes, binary data of the message.
+            message_length: int, length of the useful data in message data (defaults
+                to the length of message data).
+            layout: Layout, the signals to decode for this length (defaults to all the
+                signals, see Layout.select()).
+
+        Returns:
+            message: MessageDict, decoded message with list of signals (see message_decode()).
+        """
+        if message_length is None:
+            message_length = len(message_data)
+
+        # The CAN message data is always 8 bytes so it's required to truncate it to keep only
+        # the useful bytes (nop when already truncated)
+        message_data = message_data[:message_length]
+        if layout is None:
+            layout = self.layout(message_length)
+
+        multiplexing_mode, entries, values = self._decode_values(message_data, layout)
+        return MessageDict(
+            signals=[signal_dict(entry, value) for entry, value in zip(entries, values)],
+            name=self.name, id=self.id, multiplexing_mode=multiplexing_mode, raw_data=message_data)
+
+    def decode_compact(self, message_data, message_length=None, layout=None):
+        """Decode a frame of this message in a CompactMessage.
+
+        Same arguments as decode().
+        """
+        if message_length is None:
+            message_length = len(message_data)
+        message_data = message_data[:message_length]
+        if layout is None:
+            layout = self.layout(message_length)
+
+        multiplexing_mode, entries, values = self._decode_values(message_data, layout)
+        return CompactMessage(self, entries, tuple(values), multiplexing_mode, message_data)
+
+    def decode_lazy(self, message_data, message_length=None, layout=None):
+        """Return a DecodedMessage of a frame, its signals are decoded when accessed.
+
+        Same arguments as decode().
+        """
+        if message_length is None:
+            message_length = len(message_data)
+        message_data = message_data[:message_length]
+        if layout is None:
+            layout = self.layout(message_length)
+        return DecodedMessage(self, layout, message_data)
+
+
+class Layout(object):
+    """Signals of a message resolved for a given frame length.
+
+    Each entry is a tuple (signal, shift, mask, nbits, template, unpacker) where
+    the raw value of the signal is ((msb or lsb) >> shift) & mask, msb and lsb
+    being the frame data read as a big or little endian integer, nbits the number
+    of bits of mask and template the static part of the decoded signal. unpacker
+    is (struct, byte offset, frame length) for the float and double signals aligned
+    on bytes, which are read directly from the frame data when it has the length of
+    the layout (shorter data is left padded as the frame integers), None otherwise.
+
+    decode_values is the function generated for the layout when the message is
+    compiled with codegen (see codegen.compile_layout()), source its source.
+    skipped are the signals ignored because they start after the end of the frame.
+
+    The entries to decode by multiplexing mode are computed once: modes is a
+    dict of the entries by mode and common the entries present whatever the
+    mode. With extended multiplexing, submultiplexors are the entries of the
+    sub-multiplexors (parents first) and the entries are computed by
+    nested_entries() for each combination of the multiplexors values.
+    """
+
+    __slots__ = (
+        'multiplexor', 'entries', 'skipped', 'uses_msb', 'uses_lsb', 'decode_values', 'source',
+        'modes', 'common', 'submultiplexors', '_nested_entries', '_child_values', '_indexes',
+    )
+
+    def __init__(self, multiplexor, entries, skipped=(), submultiplexors=None):
+        self.multiplexor = multiplexor
+        self.entries = tuple(entries)
+        self.skipped = tuple(skipped)
+        self.decode_values = self.source = None
+
+        if submultiplexors is None:
+            submultiplexors = [entry for entry in self.entries if entry[0].is_multiplexor]
+        self.submultiplexors = tuple(_sort_parents_first(submultiplexors))
+        self._nested_entries = {}
+        # id() of an entries tuple of the layout -> its entries by signal name
+        self._indexes = {}
+        # Values of the multiplexors which select a signal, by multiplexor name (None for the
+        # multiplexor of the message)
+        self._child_values = {}
+        for entry in self.entries:
+            if entry[0].multiplexing is not None:
+                self._child_values.setdefault(entry[0].multiplexor_signal, set()).add(entry[0].multiplexing)
+
+        self.common = tuple(entry for entry in self.entries if entry[0].multiplexing is None)
+        self.modes = {
+            mode: tuple(
+                entry for entry in self.entries
+                if entry[0].multiplexing is None or (
+                    entry[0].multiplexor_signal is None and entry[0].multiplexing == mode))
+            for mode in self._child_values.get(None, ())
+        }
+
+        # The frame integers aren't needed by the signals read directly from the frame
+        signals = [entry[0] for entry in self.entries + self.submultiplexors if entry[5] is None]
+        if multiplexor is not None and multiplexor[5] is None:
+            signals.append(multiplexor[0])
+        self.uses_msb = any(not signal.is_little_endian for signal in signals)
+        self.uses_lsb = any(signal.is_little_endian for signal in signals)
+
+    def nested_entries(self, multiplexing_mode, msb, lsb, message_data):
+        """Return the entries to decode with extended multiplexing.
+
+        The sub-multiplexors present in the frame are decoded to select the signals,
+        the entries are computed once for each combination of their values.
+
+        Returns:
+            (key, entries): key identifies the combination of the multiplexors values.
+        """
+        values = {None: multiplexing_mode}
+        key = [multiplexing_mode]
+        for entry in self.submultiplexors:
+            signal = entry[0]
+            parent = signal.multiplexor_signal
+            if parent in values and values[parent] == signal.multiplexing:
+                value = values[signal.name] = entry_value(entry, msb, lsb, message_data)
+                # The values which don't select any signal are equivalent
+                key.append(value if value in self._child_values.get(signal.name, ()) else _OTHER_VALUE)
+            else:
+                key.append(None)
+        key = tuple(key)
+        try:
+            return key, self._nested_entries[key]
+        except KeyError:
+            pass
+
+        entries = self._nested_entries[key] = tuple(
+            entry for entry in self.entries
+            if entry[0].multiplexing is None or (
+                entry[0].multiplexor_signal in values and
+                values[entry[0].multiplexor_signal] == entry[0].multiplexing))
+        return key, entries
+
+    def mode_entries(self, msb, lsb, message_data):
+        """Return the multiplexing mode of the frame and the entries to decode.
+
+        Returns:
+            (multiplexing_mode, key, entries): key identifies the entries of the mode
+                (the mode without extended multiplexing).
+        """
+        if self.multiplexor is None:
+            return None, None, self.entries
+        multiplexing_mode = entry_value(self.multiplexor, msb, lsb, message_data)
+        if self.submultiplexors:
+            key, entries = self.nested_entries(multiplexing_mode, msb, lsb, message_data)
+            return multiplexing_mode, key, entries
+        return multiplexing_mode, multiplexing_mode, self.modes.get(multiplexing_mode, self.common)
+
+    def mode_skipped(self, multiplexing_mode, entries, values):
+        """Return the skipped signals of the multiplexing mode of a decoded frame.
+
+        Only the signals which would have been decoded with the mode (and the values
+        of the sub-multiplexors) if the frame was long enough.
+
+        Args:
+            multiplexing_mode, entries, values: as returned by Message._decode_values()
+        """
+        skipped = []
+        for signal in self.skipped:
+            if signal.multiplexing is None or self.multiplexor is None:
+                skipped.append(signal)
+            elif signal.multiplexor_signal is None:
+                if signal.multiplexing == multiplexing_mode:
+                    skipped.append(signal)
+            else:
+                # Selected by a sub-multiplexor decoded with the frame
+                for entry, value in zip(entries, values):
+                    if entry[0].name == signal.multiplexor_signal:
+                        if value == signal.multiplexing:
+                            skipped.append(signal)
+                        break
+        return skipped
+
+    def entries_by_name(self, entries):
+        """Return the entries (a tuple returned by mode_entries()) by signal name."""
+        # The entries tuples are kept by the layout, so their id() can't be reused
+        try:
+            return self._indexes[id(entries)]
+        except KeyError:
+            index = self._indexes[id(entries)] = {entry[0].name: entry for entry in entries}
+            return index
+
+    def select(self, signal_names):
+        """Return a layout restricted to the given signals.
+
+        The multiplexor is kept only when it's selected or a selected signal is multiplexed,
+        the sub-multiplexors only when a selected signal depends on them.
+        """
+        entries = [entry for entry in self.entries if entry[0].name in signal_names]
+        multiplexor = self.multiplexor
+        if multiplexor is not None and multiplexor[0].name not in signal_names and all(
+                entry[0].multiplexing is None for entry in entries):
+            multiplexor = None
+
+        submultiplexors = {entry[0].name: entry for entry in self.submultiplexors}
+        needed = set()
+        for entry in entries:
+            parent = entry[0].multiplexor_signal if entry[0].multiplexing is not None else None
+            while parent in submultiplexors and parent not in needed:
+                needed.add(parent)
+                parent = submultiplexors[parent][0].multiplexor_signal
+        skipped = [signal for signal in self.skipped if signal.name in signal_names]
+        return Layout(multiplexor, entries, skipped, [submultiplexors[name] for name in needed])
+
+
+# Value of a sub-multiplexor which doesn't select any signal
+_OTHER_VALUE = object()
+
+
+def _sort_parents_first(submultiplexors):
+    """Sort the entries of the sub-multiplexors so each one follows its multiplexor."""
+    by_name = {entry[0].name: entry for entry in submultiplexors}
+
+    def depth(entry):
+        parents = set()
+        parent = entry[0].multiplexor_signal
+        while parent in by_name and parent not in parents:
+            parents.add(parent)
+            parent = by_name[parent][0].multiplexor_signal
+        return len(parents)
+
+    return sorted(submultiplexors, key=depth)
+
+
+class MessageDict(dict):
+    """Decoded message, a dict as returned by message_decode() with an index of its signals."""
+
+    __slots__ = ('_signals_by_name',)
+
+    def get_signal(self, signal_name):
+        """Return the decoded signal of the given name (None when not decoded)."""
+        try:
+            signals_by_name = self._signals_by_name
+        except AttributeError:
+            signals_by_name = self._signals_by_name = {
+                signal['name']: signal for signal in self['signals']}
+        return signals_by_name.get(signal_name)
+
+
+class CompactMessage(compat.Mapping):
+    """Decoded message holding only the values of the signals.
+
+    The static description of the signals is shared by all the frames of the
+    message, the signals dicts are built only when they're requested so the
+    compact message is a read-only mapping equal to the MessageDict returned
+    by Message.decode() (see to_dict()).
+    """
+
+    __slots__ = ('message', 'entries', 'values', 'multiplexing_mode', 'raw_data', 'timestamp', '_dict')
+
+    _KEYS = ('signals', 'name', 'id', 'multiplexing_mode', 'raw_data')
+
+    def __init__(self, message, entries, values, multiplexing_mode, raw_data):
+        self.message = message
+        self.entries = entries
+        self.values = values
+        self.multiplexing_mode = multiplexing_mode
+        self.raw_data = raw_data
+        self.timestamp = None
+        self._dict = None
+
+    def __repr__(self):
+        return '<CompactMessage %s %r>' % (self.message.name, self.values)
+
+    @property
+    def name(self):
+        return self.message.name
+
+    @property
+    def id(self):
+        return self.message.id
+
+    @property
+    def signal_names(self):
+        return tuple(entry[0].name for entry in self.entries)
+
+    def to_dict(self):
+        """Return the decoded message as Message.decode() does (built once)."""
+        if self._dict is None:
+            self._dict = MessageDict(
+                signals=[signal_dict(entry, value) for entry, value in zip(self.entries, self.values)],
+                name=self.message.name, id=self.message.id, multiplexing_mode=self.multiplexing_mode,
+                raw_data=self.raw_data)
+            if self.timestamp is not None:
+                self._dict['timestamp'] = self.timestamp
+        return self._dict
+
+    def get_signal(self, signal_name):
+        """Return the decoded signal of the given name (None when not decoded)."""
+        return self.to_dict().get_signal(signal_name)
+
+    def get_value(self, signal_name, default=None):
+        """Return the value of the signal of the given name without building its dict."""
+        for entry, value in zip(self.entries, self.values):
+            if entry[0].name == signal_name:
+                return value
+        return default
+
+    def __getitem__(self, key):
+        if key == 'signals':
+            return self.to_dict()['signals']
+        if key == 'timestamp' and self.timestamp is None:
+            raise KeyError(key)
+        if key in self._KEYS or key == 'timestamp':
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        # Only the timestamp of the frame can be set (by the log readers)
+        if key != 'timestamp':
+            raise TypeError("CompactMessage is read-only except its timestamp")
+        self.timestamp = value
+        if self._dict is not None:
+            self._dict['timestamp'] = value
+
+    def __iter__(self):
+        for key in self._KEYS:
+            yield key
+        if self.timestamp is not None:
+            yield 'timestamp'
+
+    def __len__(self):
+        return len(self._KEYS) + (self.timestamp is not None)
+
+
+class DecodedMessage(compat.Mapping):
+    """Lazy view of a frame, a read-only mapping of the values by signal name.
+
+    Only the raw data of the frame and the layout of the message are kept, the
+    multiplexing mode and the values of the signals are decoded the first time
+    they're accessed (msg['Bar2'], msg.values()...) and memoized. The keys are
+    the signals of the multiplexing mode of the frame, as in Message.decode().
+    A signal which can't be decoded raises DecodingError when it's accessed.
+    The timestamp set as msg['timestamp'] (by the log readers) is read the same
+    way, but it isn't one of the keys.
+    """
+
+    __slots__ = ('message', 'layout', 'raw_data', 'timestamp', '_msb', '_lsb', '_mode', '_entries', '_values')
+
+    def __init__(self, message, layout, raw_data):
+        self.message = message
+        self.layout = layout
+        self.raw_data = raw_data
+        self.timestamp = None
+        self._msb = self._lsb = self._mode = self._entries = None
+        self._values = {}
+
+    def __repr__(self):
+        return '<DecodedMessage %s %r>' % (self.message.name, self.raw_data)
+
+    @property
+    def name(self):
+        return self.message.name
+
+    @property
+    def id(self):
+        return self.message.id
+
+    def _integers(self):
+        if self._msb is None:
+            layout = self.layout
+            self._msb = compat.int_from_bytes(self.raw_data, 'big') if layout.uses_msb else 0
+            self._lsb = compat.int_from_bytes(self.raw_data, 'little') if layout.uses_lsb else 0
+        return self._msb, self._lsb
+
+    def _mode_entries(self):
+        if self._entries is None:
+            msb, lsb = self._integers()
+            self._mode, _key, self._entries = self.layout.mode_entries(msb, lsb, self.raw_data)
+        return self._entries
+
+    @property
+    def multiplexing_mode(self):
+        self._mode_entries()
+        return self._mode
+
+    @property
+    def signal_names(self):
+        return tuple(entry[0].name for entry in self._mode_entries())
+
+    def _value(self, entry):
+        name = entry[0].name
+        try:
+            return self._values[name]
+        except KeyError:
+            msb, lsb = self._integers()
+            value = self._values[name] = entry_value(entry, msb, lsb, self.raw_data)
+            return value
+
+    def __getitem__(self, signal_name):
+        try:
+            entry = self.layout.entries_by_name(self._mode_entries())[signal_name]
+        except KeyError:
+            # The timestamp set by the log readers, it isn't one of the keys (the signals)
+            if signal_name == 'timestamp' and self.timestamp is not None:
+                return self.timestamp
+            raise
+        return self._value(entry)
+
+    def __setitem__(self, key, value):
+        # Only the timestamp of the frame can be set (by the log readers)
+        if key != 'timestamp':
+            raise TypeError("DecodedMessage is read-only except its timestamp")
+        self.timestamp = value
+
+    def __iter__(self):
+        for entry in self._mode_entries():
+            yield entry[0].name
+
+    def __len__(self):
+        return len(self._mode_entries())
+
+    def __contains__(self, signal_name):
+        return signal_name in self.layout.entries_by_name(self._mode_entries())
+
+    def get_signal(self, signal_name):
+        """Return the decoded signal dict of the given name (None when not in the frame)."""
+        entry = self.layout.entries_by_name(self._mode_entries()).get(signal_name)
+        if entry is None:
+            return None
+        return signal_dict(entry, self._value(entry))
+
+    def to_dict(self):
+        """Decode all the signals and return the message as Message.decode() does."""
+        entries = self._mode_entries()
+        message = MessageDict(
+            signals=[signal_dict(entry, self._value(entry)) for entry in entries],
+            name=self.message.name, id=self.message.id, multiplexing_mode=self._mode,
+            raw_data=self.raw_data)
+        if self.timestamp is not None:
+            message['timestamp'] = self.timestamp
+        return message
+
+
+def _entry(signal, message_binary_length):
+    bit_start, bit_end = signal.resolve(message_binary_length)
+    # Same bounds as slicing a binary string of the message, the signal is
+    # truncated when it overflows the frame
+    start, end, _ = slice(bit_start, bit_end).indices(message_binary_length)
+    nbits = max(end - start, 0)
+    shift = message_binary_length - start - nbits
+
+    unpacker = None
+    if (signal.value_type, nbits) in (('float', 32), ('double', 64)) and not shift % 8:
+        # Aligned on bytes, the bytes of the value are at the same offset in the frame
+        offset = shift // 8 if signal.is_little_endian else start // 8
+        unpacker = (_FLOAT_STRUCTS[signal.value_type, signal.is_little_endian], offset, message_binary_length // 8)
+    return signal, shift, (1 << nbits) - 1, nbits, signal.template(bit_start, bit_end), unpacker
+
+
+def entry_value(entry, msb, lsb, message_data):
+    """Decode the value of a signal of a frame.
+
+    Args:
+        entry: tuple, an entry of the Layout of the frame
+        msb: int, the data of the frame read as a big-endian integer
+        lsb: int, the data of the frame read as a little-endian integer
+        message_data: bytes, the data of the frame
+
+    Returns:
+        The physical value of the signal.
+
+    Raises:
+        DecodingError: the signal is out of the frame.
+    """
+    signal, shift, mask, nbits, template, unpacker = entry
+    if unpacker is not None:
+        if len(message_data) == unpacker[2]:
+            return unpacker[0].unpack_from(message_data, unpacker[1])[0] * signal.factor + signal.offset
+        # The frame data is shorter than the layout, the frame integers aren't computed for this signal
+        msb = lsb = compat.int_from_bytes(message_data, 'little' if signal.is_little_endian else 'big')
+    if not nbits:
+        raise exceptions.DecodingError(
+            "The string value extracted for signal '%s' is empty [%d:%d]." %
+            (signal.name, template['bit_start'], template['bit_end']))
+    return signal.value(((lsb if signal.is_little_endian else msb) >> shift) & mask, nbits)
+
+
+def signal_dict(entry, value):
+    """Return the signal of a decoded message (as in MessageDict['signals']) from its entry and value."""
+    signal = dict(entry[4])
+    signal['value'] = value
+    return signal
+
+
+class Database(object):
+    """DBC compiled for decoding, see compile_dbc()."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def __repr__(self):
+        return '<Database %d messages>' % len(self.messages)
+
+    def get_message(self, message_id):
+        """Return the compiled message of the given identifier.
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+        """
+        try:
+            return self.messages[message_id]
+        except KeyError:
+            raise exceptions.MessageNotFound(
+                "Message ID {id:d} (0x{id:x}) not found in DBC".format(id=message_id))
+
+    def decode(self, message_id, message_data, message_length=None, compact=False):
+        """Decode a CAN message (also called a frame).
+
+        Args:
+            message_id: int, message identifier.
+            message_data: bytes, binary data of the message.
+            message_length: int, length of the useful data in message data received
+                (defaults to the length of message data).
+            compact: bool, return a CompactMessage instead of a MessageDict.
+
+        Returns:
+            message: decoded message with list of signals, as message_decode().
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+        """
+        if compact:
+            return self.get_message(message_id).decode_compact(message_data, message_length)
+        return self.get_message(message_id).decode(message_data, message_length)
+
+    def decode_lazy(self, message_id, message_data, message_length=None):
+        """Return a lazy view of a CAN message, decoded signal by signal when accessed.
+
+        Same arguments as decode().
+
+        Returns:
+            message: DecodedMessage, mapping of the values by signal name.
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+        """
+        return self.get_message(message_id).decode_lazy(message_data, message_length)
+
+    def encode(self, message_id, values, message_length=None):
+        """Encode a CAN message, the inverse of decode().
+
+        Args:
+            message_id: int, message identifier.
+            values: dict, physical values by signal name, the signals not given are zero.
+            message_length: int, length of the frame (defaults to the length of the message).
+
+        Returns:
+            message_data: bytes, the frame data.
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+            exceptions.EncodingError: when the values can't be encoded in the frame
+        """
+        return self.get_message(message_id).encode(values, message_length)
+
+    def decoder(self, signals=None, compact=False, lazy=False):
+        """Return a decoder with options applied to all the messages.
+
+        When signals are given, only the selected signals are extracted from the
+        frames (and the multiplexor when a selected signal is multiplexed), whatever
+        the message.
+
+        Args:
+            signals: iterable of str, names of the signals to decode (defaults to all).
+            compact: bool, decode the messages in CompactMessage instead of MessageDict.
+            lazy: bool, return DecodedMessage views instead of decoding the messages.
+
+        Returns:
+            decoder: Decoder
+        """
+        return Decoder(self, signals, compact, lazy)
+
+    def compile(self, codegen=True):
+        """Generate a specialized decoding function for each message.
+
+        With codegen, a straight-line Python function is generated and compiled for
+        each layout of the messages (each frame length) the first time it's used: the
+        shifts, masks, scaling and multiplexing branches are inlined. The results are
+        identical to the default decoding.
+
+        Args:
+            codegen: bool, False to go back to the default decoding.
+
+        Returns:
+            database: Database, self.
+        """
+        if hasattr(self.messages, 'set_codegen'):
+            # Messages loaded on demand (see cache.read_cache()), set as they're loaded
+            self.messages.set_codegen(codegen)
+        else:
+            for message in self.messages.values():
+                message.set_codegen(codegen)
+        return self
+
+    def decode_batch(self, message_id, frames, message_length=None):
+        """Decode many frames of the same message at once with NumPy.
+
+        Args:
+            message_id: int, message identifier.
+            frames: numpy.ndarray of shape (N, length) and dtype uint8 or a bytes buffer
+                of frames of fixed stride (the message length, 8 by default).
+            message_length: int, length of the useful data of the frames (defaults to
+                the frames length).
+
+        Returns:
+            columns: dict, a NumPy array of values by signal name (see batch.decode_batch()).
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+        """
+        from . import batch
+
+        return batch.decode_batch(self.get_message(message_id), frames, message_length)
+
+
+class Decoder(object):
+    """Decoder of a database with options (see Database.decoder())."""
+
+    def __init__(self, database, signals=None, compact=False, lazy=False):
+        self.database = database
+        self.signals = frozenset(signals) if signals is not None else None
+        self.compact = compact
+        self.lazy = lazy
+        # Selected layouts by (message ID, frame length)
+        self._layouts = {}
+
+    def layout(self, message_id, message_length):
+        """Return the message and the layout of its selected signals for the frame length.
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+        """
+        try:
+            return self._layouts[message_id, message_length]
+        except KeyError:
+            pass
+        message = self.database.get_message(message_id)
+        layout = message.layout(message_length)
+        if self.signals is not None:
+            layout = layout.select(self.signals)
+            if message.codegen:
+                from . import codegen
+
+                codegen.compile_layout(message, layout)
+        self._layouts[message_id, message_length] = message, layout
+        return message, layout
+
+    def decode(self, message_id, message_data, message_length=None):
+        """Decode the selected signals of a CAN message (see Database.decode()).
+
+        The 'multiplexing_mode' of the message is None when the multiplexor isn't needed
+        by the selected signals.
+        """
+        if message_length is None:
+            message_length = len(message_data)
+        try:
+            message, layout = self._layouts[message_id, message_length]
+        except KeyError:
+            message, layout = self.layout(message_id, message_length)
+        if self.lazy:
+            return message.decode_lazy(message_data, message_length, layout)
+        if self.compact:
+            return message.decode_compact(message_data, message_length, layout)
+        return message.decode(message_data, message_length, layout)
+
+
+def compile_dbc(dbc_json):
+    """Compile a DBC to decode efficiently many messages with it.
+
+    Args:
+        dbc_json: dict, deserialized version of a DBC file converted to JSON with libcanardbc.
+
+    Returns:
+        database: Database, the compiled DBC.
+
+    Raises:
+        exceptions.InvalidDBC: when used DBC has not messages entry
+    """
+    if 'messages' not in dbc_json:
+        raise exceptions.InvalidDBC("Invalid DBC file (no messages entry)")
+
+    return Database({
+        int(message_id): Message(int(message_id), message_info)
+        for message_id, message_info in dbc_json['messages'].items()
+    })
+
+
+# Number of messages compiled by message_info_message() kept, the cache is emptied when it's full
+MESSAGE_INFO_CACHE_SIZE = 1024
+
+# (id of the message description, message ID) -> (copy of the message description, Message)
+_message_info_cache = {}
+
+
+def message_info_message(message_id, message_info):
+    """Return the compiled Message of a message description of a DBC, compiled once.
+
+    For the functions decoding or encoding a single message with the DBC as JSON
+    (message_decode() and message_encode()). The Message is reused as long as the
+    description is equal to the one it was compiled from, it's compiled again when
+    the description is modified (or when its id is reused by another description).
+    """
+    key = id(message_info), message_id
+    cached = _message_info_cache.get(key)
+    if cached is not None and cached[0] == message_info:
+        return cached[1]
+    if len(_message_info_cache) >= MESSAGE_INFO_CACHE_SIZE:
+        _message_info_cache.clear()
+    message = Message(message_id, message_info)
+    _message_info_cache[key] = copy.deepcopy(message_info), message
+    return message
@@ -5,11 +5,41 @@
 
 import struct
 
-from . import compat
+from . import database
 from . import exceptions
 
 
-MESSAGE_MAX_LENGTH = 8
+CAN_MAX_LENGTH = 8
+CANFD_MAX_LENGTH = 64
+MESSAGE_MAX_LENGTH = CANFD_MAX_LENGTH
+
+# Data length of the frames by DLC (Data Length Code), CAN FD frames longer
+# than 8 bytes have one of the lengths of the DLC 9 to 15
+CANFD_LENGTHS = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
+
+
+def dlc_to_length(dlc):
+    """Return the data length of a frame from its DLC (0 to 15).
+
+    Raises:
+        ValueError: when the DLC is invalid
+    """
+    if not 0 <= dlc < len(CANFD_LENGTHS):
+        raise ValueError("Invalid DLC %d." % dlc)
+    return CANFD_LENGTHS[dlc]
+
+
+def length_to_dlc(length):
+    """Return the DLC of a frame of the given data length.
+
+    Raises:
+        ValueError: when no CAN or CAN FD frame has this length
+    """
+    try:
+        return CANFD_LENGTHS.index(length)
+    except ValueError:
+        raise ValueError("Invalid CAN FD data length %d (valid lengths: %s)." % (
+            length, ', '.join(str(valid_length) for valid_length in CANFD_LENGTHS)))
 
 
 def signal_decode(signal_name, signal_info, message_binary_msb, message_binary_lsb, message_binary_length):
@@ -109,7 +139,7 @@ def message_get_multiplexor(message_info, message_binary_msb, message_binary_lsb
 
 
 def message_get_signal(message, signal_name):
-    """Loop over signals to find the requested signal.
+    """Find the requested signal in a decoded message.
 
     Arguments:
         message: dict, the message provided by message_decode()
@@ -118,6 +148,11 @@ def message_get_signal(message, signal_name):
     Return:
         signal: dict, information about the decoded signal
     """
+    get_signal = getattr(message, 'get_signal', None)
+    if get_signal is not None:
+        # Indexed by name
+        return get_signal(signal_name)
+
     for signal in message.get('signals', []):
         if signal.get('name') == signal_name:
             return signal
@@ -143,69 +178,10 @@ def message_decode(message_id, message_length, message_data, dbc_json):
     if 'messages' not in dbc_json:
         raise exceptions.InvalidDBC("Invalid DBC file (no messages entry)")
 
-    # Initialize the returns
-    message = {'signals': []}
-
     try:
         message_info = dbc_json['messages'][str(message_id)]
-        message['name'] = message_info['name']
-        message['id'] = message_id
     except KeyError:
         raise exceptions.MessageNotFound(
             "Message ID {id:d} (0x{id:x}) not found in DBC".format(id=message_id))
 
-    # The CAN message data is always 8 bytes so it's required to truncate it to keep only
-    # the useful bytes (nop when already truncated)
-    message_data = message_data[:message_length]
-
-    # Convert length from bytes to bits
-    message_binary_length = message_length * 8
-
-    # Motorola
-    # 0n to fit in n characters width with 0 padding (can't use bin())
-    # [2:] to remove '0b' prefix and zfill constant length with 0 padding
-    message_binary_msb = bin(compat.int_from_bytes(message_data, 'big'))[2:].zfill(
-        message_binary_length)
-
-    # For Intel, identical but swapped
-    message_binary_lsb = bin(compat.int_from_bytes(message_data, 'little'))[2:].zfill(
-        message_binary_length)
-
-    if message_info.get('has_multiplexor', False):
-        multiplexor = message_get_multiplexor(
-            message_info, message_binary_msb, message_binary_lsb,
-            message_binary_length)
-    else:
-        multiplexor = None
-
-    multiplexing_mode = multiplexor['value'] if multiplexor else None
-    message['multiplexing_mode'] = multiplexing_mode
-    message['raw_data'] = message_data
-
-    if 'signals' not in message_info:
-        return message
-
-    signals = sorted(message_info['signals'].items(), key=lambda t: int(t[1]['bit_start']))
-    for signal_name, signal_info in signals:
-        # If the signal contains the multiplexor, we don't want to add it to the list of signals.
-        if signal_info.get('multiplexor', False):
-            continue
-
-        # Decode signal only when :
-        # - no multiplexing mode
-        # - or the signal is associated to the current multiplexing mode
-        if (multiplexing_mode is None or
-                multiplexing_mode == signal_info.get('multiplexing', multiplexing_mode)):
-            if signal_info['bit_start'] >= message_binary_length:
-                # The signal is invalid as the CAN frame is too small to contain it.
-                # However, new signals may be added to an already existing CAN frame,
-                # meaning the same DBC must support old versions with small frames
-                # and newer versions with extended data. To keep retro-compatibility
-                # we don't throw an error.
-                continue
-            signal = signal_decode(
-                signal_name, signal_info, message_binary_msb, message_binary_lsb,
-                message_binary_length)
-            message['signals'].append(signal)
-
-    return message
+    return database.message_info_message(message_id, message_info).decode(message_data, message_length)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Encoding of CAN messages, the inverse of the decoding. The physical values
+# are converted to raw values (inverse scaling, clamped to the range of the
+# signal), placed in the frame read as big and little endian integers with the
+# shifts and masks of the decoding layout, then converted to bytes.
+#
+
+import numbers
+
+from . import compat
+from . import database
+from . import exceptions
+from .database import _DOUBLE, _FLOAT, _UINT32, _UINT64
+
+
+def _integer(value):
+    return value if isinstance(value, numbers.Integral) else int(round(value))
+
+
+def _converter(signal, mask, nbits):
+    """Return the function converting the physical value of a signal to the bits to place in the frame.
+
+    The value is clamped to the range of the signal in the DBC, then to the range of
+    the raw value.
+    """
+    minimum, maximum = signal.minimum, signal.maximum
+    factor, offset = signal.factor, signal.offset
+    scale = float(factor)
+
+    if signal.value_type != 'integer':
+        if signal.value_type == 'float':
+            pack, unpack = _FLOAT.pack, _UINT32.unpack
+        else:
+            pack, unpack = _DOUBLE.pack, _UINT64.unpack
+
+        def convert(value):
+            if minimum is not None:
+                value = minimum if value < minimum else maximum if value > maximum else value
+            return unpack(pack((value - offset) / scale))[0] & mask
+        return convert
+
+    if signal.is_signed and nbits > 1:
+        # Two's complement (see Signal.value())
+        low, high = -(1 << (nbits - 1)), (1 << (nbits - 1)) - 1
+    else:
+        low, high = 0, mask
+
+    if signal.is_raw and minimum is None:
+        def convert(value):
+            if value.__class__ is not int:
+                value = _integer(value)
+            return (low if value < low else high if value > high else value) & mask
+        return convert
+
+    exact = type(factor) is int and type(offset) is int
+
+    def convert(value):
+        if minimum is not None:
+            value = minimum if value < minimum else maximum if value > maximum else value
+        if exact and isinstance(value, numbers.Integral) and not (value - offset) % factor:
+            # Exact, even for the 64-bit signals
+            raw = (value - offset) // factor
+        else:
+            raw = int(round((value - offset) / scale))
+        return (low if raw < low else high if raw > high else raw) & mask
+    return convert
+
+
+def _field(entry):
+    """Return (signal, shift, convert) of a layout entry, None when it's out of the frame."""
+    signal, shift, mask, nbits = entry[:4]
+    if not nbits:
+        return None
+    return signal, shift, _converter(signal, mask, nbits)
+
+
+class Packer(object):
+    """Precompiled encoding of the frames of a message of a given length.
+
+    The positions of the signals are the ones of the decoding layout of the
+    message for this length (see Message.layout()), the signals which don't
+    fit in the frame can't be encoded. The conversion of the values of each
+    signal is specialized once (scaling, range and type).
+    """
+
+    def __init__(self, message, message_length):
+        self.message = message
+        self.message_length = message_length
+        layout = message.layout(message_length)
+        self.multiplexor = _field(layout.multiplexor) if layout.multiplexor is not None else None
+        # Signal name -> (signal, shift, convert), the multiplexor of the message included
+        self.fields = {}
+        for entry in layout.entries:
+            field = _field(entry)
+            if field is not None:
+                self.fields[entry[0].name] = field
+        if self.multiplexor is not None:
+            self.fields[self.multiplexor[0].name] = self.multiplexor
+        self.skipped = frozenset(signal.name for signal in layout.skipped)
+
+    def __repr__(self):
+        return '<Packer %s %d bytes>' % (self.message.name, self.message_length)
+
+    def _field_of(self, signal_name):
+        field = self.fields.get(signal_name)
+        if field is not None:
+            return field
+        if signal_name in self.skipped:
+            raise exceptions.EncodingError("Signal %s doesn't fit in a frame of %d bytes." % (
+                signal_name, self.message_length))
+        if any(signal.name == signal_name for signal in self.message.signals):
+            raise exceptions.EncodingError("Signal %s is out of a frame of %d bytes." % (
+                signal_name, self.message_length))
+        raise exceptions.EncodingError("Unknown signal %s in message %s." % (signal_name, self.message.name))
+
+    def _select(self, values):
+        """Return the (field, value) to encode, with the multiplexors implied by the signals."""
+        multiplexor = self.multiplexor[0]
+        selected = []
+        # Multiplexor name (None for the multiplexor of the message) -> physical value
+        multiplexors = {}
+        for signal_name, value in values.items():
+            field = self._field_of(signal_name)
+            selected.append((field, value))
+            if field[0] is multiplexor:
+                multiplexors[None] = value
+            elif field[0].is_multiplexor:
+                multiplexors[signal_name] = value
+
+        # The multiplexors selected by the multiplexed signals (and their own multiplexor)
+        pending = [field[0] for field, _value in selected]
+        while pending:
+            signal = pending.pop()
+            if signal.multiplexing is None or signal is multiplexor:
+                continue
+            parent = signal.multiplexor_signal
+            if parent in multiplexors:
+                if multiplexors[parent] != signal.multiplexing:
+                    raise exceptions.EncodingError(
+                        "Signal %s requires the value %r of multiplexor %s, not %r." % (
+                            signal.name, signal.multiplexing, parent or multiplexor.name, multiplexors[parent]))
+                continue
+            multiplexors[parent] = signal.multiplexing
+            if parent is None:
+                selected.append((self.multiplexor, signal.multiplexing))
+            else:
+                parent_field = self._field_of(parent)
+                selected.append((parent_field, signal.multiplexing))
+                pending.append(parent_field[0])
+        return selected
+
+    def encode(self, values):
+        """Encode the physical values of signals in a frame.
+
+        The signals not given are zero. The multiplexing mode is the value of the
+        multiplexor when it's given, otherwise it's selected by the multiplexed
+        signals given (the same way for the sub-multiplexors of extended multiplexing).
+
+        Args:
+            values: dict, physical values by signal name, clamped to the range of the
+                signals (min and max in the DBC, then the range of the raw value).
+
+        Returns:
+            message_data: bytes, the frame data.
+
+        Raises:
+            exceptions.EncodingError: when a signal is unknown or doesn't fit in the frame,
+                a value is invalid or the signals belong to different multiplexing modes
+        """
+        if self.multiplexor is None:
+            fields = self.fields
+            selected = [(fields.get(signal_name) or self._field_of(signal_name), value)
+                        for signal_name, value in values.items()]
+        else:
+            selected = self._select(values)
+
+        msb = lsb = 0
+        try:
+            for (signal, shift, convert), value in selected:
+                if signal.is_little_endian:
+                    lsb |= convert(value) << shift
+                else:
+                    msb |= convert(value) << shift
+        except (TypeError, ValueError, OverflowError) as e:
+            raise exceptions.EncodingError("Invalid value %r for signal %s: %s" % (value, signal.name, e))
+
+        length = self.message_length
+        if lsb:
+            # The little endian integer of the frame read in big endian
+            msb |= compat.int_from_bytes(compat.int_to_bytes(lsb, length, 'little'), 'big')
+        return compat.int_to_bytes(msb, length, 'big')
+
+
+def message_encode(message_id, values, dbc_json, message_length=None):
+    """Encode a CAN message (also called a frame), the inverse of message_decode().
+
+    Args:
+        message_id: int, message identifier.
+        values: dict, physical values by signal name (the signals not given are zero).
+        dbc_json: dict, deserialized version of a DBC file converted to JSON with libcanardbc.
+        message_length: int, length of the frame (defaults to the length of the message in the DBC).
+
+    Returns:
+        message_data: bytes, the frame data.
+
+    Raises:
+        exceptions.InvalidDBC: when used DBC has not messages entry
+        exceptions.MessageNotFound: when message's ID is not found in the DBC
+        exceptions.EncodingError: when the values can't be encoded in the frame
+    """
+    if 'messages' not in dbc_json:
+        raise exceptions.InvalidDBC("Invalid DBC file (no messages entry)")
+
+    try:
+        message_info = dbc_json['messages'][str(message_id)]
+    except KeyError:
+        raise exceptions.MessageNotFound(
+            "Message ID {id:d} (0x{id:x}) not found in DBC".format(id=message_id))
+
+    return database.message_info_message(message_id, message_info).encode(values, message_length)
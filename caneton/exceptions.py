@@ -12,6 +12,10 @@ class DecodingError(CanetonError):
     """Raised when there is a CAN message decoding error."""
 
 
+class EncodingError(CanetonError):
+    """Raised when the values of signals can't be encoded in a CAN message."""
+
+
 class InvalidBitStart(DecodingError):
     """Raised during decoding of a CAN signal, when the bit start value is invalid (e.g. too high)."""
 
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Columnar export of decoded messages. The values are accumulated by message
+# ID in typed column buffers (timestamp, multiplexing mode when the message is
+# multiplexed and one column by signal) and flushed by row groups to a file
+# by message, so the memory used is bounded by the size of the row groups.
+#
+# With pyarrow, each message is written to a Parquet file (one row group by
+# flush, the units of the signals in the metadata of the fields). Without
+# pyarrow, each row group is written to a NPZ file of NumPy (optional
+# dependencies, pip install caneton[export]).
+#
+
+import array
+import json
+import os
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+FORMATS = ('parquet', 'npz')
+
+# Default number of rows of a row group
+ROW_GROUP_SIZE = 65536
+
+
+def _int64_typecode(typecodes):
+    # The typecodes 'q' and 'Q' don't exist on Python 2, where the longs are of
+    # 64 bits on most platforms (as a last resort, the values are stored as floats)
+    for typecode in typecodes:
+        try:
+            if array.array(typecode).itemsize == 8:
+                return typecode
+        except ValueError:
+            pass
+    return 'd'
+
+
+# Typecodes of the arrays of the signed and unsigned 64-bit integers
+INT64_TYPECODE = _int64_typecode('ql')
+UINT64_TYPECODE = _int64_typecode('QL')
+
+
+def default_format():
+    """Return 'parquet' when pyarrow is available, 'npz' otherwise."""
+    return 'parquet' if pyarrow is not None else 'npz'
+
+
+def _typecode(signal):
+    """Typecode of the array of the values of the signal."""
+    if signal.value_type == 'integer' and type(signal.factor) is int and type(signal.offset) is int:
+        if not signal.is_signed and signal.length >= 64:
+            return UINT64_TYPECODE
+        return INT64_TYPECODE
+    return 'd'
+
+
+class Column(object):
+    """Values of a signal and their validity (the signal is absent of the frames
+    of the other multiplexing modes)."""
+
+    __slots__ = ('name', 'unit', 'values', 'valid')
+
+    def __init__(self, name, typecode, unit=''):
+        self.name = name
+        self.unit = unit
+        self.values = array.array(typecode)
+        self.valid = array.array('B')
+
+    def clear(self):
+        del self.values[:]
+        del self.valid[:]
+
+    def numpy_values(self):
+        return numpy.frombuffer(self.values, dtype=self.values.typecode) if self.values else \
+            numpy.zeros(0, dtype=self.values.typecode)
+
+    def numpy_mask(self):
+        """Return the mask of the missing values (True when missing)."""
+        return numpy.frombuffer(self.valid, dtype=numpy.uint8) == 0 if self.valid else \
+            numpy.zeros(0, dtype=bool)
+
+
+class MessageColumns(object):
+    """Column buffers of the frames of a message."""
+
+    def __init__(self, message):
+        self.message = message
+        self.timestamp = Column('timestamp', 'd', 's')
+        self.multiplexing_mode = None
+        multiplexor_name = None
+        if message.multiplexor is not None:
+            multiplexor_name = message.multiplexor.name
+            self.multiplexing_mode = Column(
+                'multiplexing_mode', _typecode(message.multiplexor), message.multiplexor.unit)
+        self.columns = [
+            Column(signal.name, _typecode(signal), signal.unit)
+            for signal in message.signals if signal.name != multiplexor_name]
+        self.rows = 0
+
+    def all_columns(self):
+        columns = [self.timestamp]
+        if self.multiplexing_mode is not None:
+            columns.append(self.multiplexing_mode)
+        return columns + self.columns
+
+    def append(self, decoded):
+        timestamp = decoded.get('timestamp')
+        self.timestamp.values.append(timestamp if timestamp is not None else float('nan'))
+        self.timestamp.valid.append(timestamp is not None)
+        if self.multiplexing_mode is not None:
+            mode = decoded['multiplexing_mode']
+            self.multiplexing_mode.values.append(mode if mode is not None else 0)
+            self.multiplexing_mode.valid.append(mode is not None)
+
+        entries = getattr(decoded, 'entries', None)
+        if entries is not None:
+            # CompactMessage, the values are read without building the signals dicts
+            values = {entry[0].name: value for entry, value in zip(entries, decoded.values)}
+        else:
+            values = {signal['name']: signal['value'] for signal in decoded['signals']}
+        for column in self.columns:
+            value = values.get(column.name)
+            if value is None:
+                column.values.append(0)
+                column.valid.append(0)
+            else:
+                column.values.append(value)
+                column.valid.append(1)
+        self.rows += 1
+
+    def clear(self):
+        for column in self.all_columns():
+            column.clear()
+        self.rows = 0
+
+    def metadata(self):
+        return {
+            'message_id': self.message.id,
+            'message_name': self.message.name,
+            # Pairs of column name and unit, in the order of the columns
+            'columns': [[column.name, column.unit] for column in self.all_columns()],
+        }
+
+
+class ColumnarSink(object):
+    """Write the decoded messages by columns in a file by message ID.
+
+    The files are named '<message name>_<message ID in hex>' in the directory,
+    with the '.parquet' extension or, in NPZ format, '.<row group number>.npz'.
+    A NPZ file holds an array by column, the '<column>.mask' arrays of the
+    missing values (True when the signal isn't in the frame) and the JSON
+    '__metadata__' (message ID and name, names and units of the columns).
+
+    Args:
+        directory: str, directory of the files (created if needed)
+        db: Database, the compiled DBC of the decoded messages (the columns are
+            the signals of the message, whatever the multiplexing mode)
+        row_group_size: int, number of rows of the message buffered before they are written
+        format: str, one of FORMATS, default_format() by default
+
+    Use it as a context manager, or call close() to write the last rows.
+    """
+
+    def __init__(self, directory, db, row_group_size=ROW_GROUP_SIZE, format=None):
+        if format is None:
+            format = default_format()
+        if format not in FORMATS:
+            raise ValueError("Unknown format %r (expected one of %s)." % (format, ', '.join(FORMATS)))
+        if format == 'parquet' and pyarrow is None:
+            raise ImportError("The Parquet format requires pyarrow.")
+        if numpy is None:
+            raise ImportError("The columnar export requires numpy.")
+        if row_group_size < 1:
+            raise ValueError("The row group size must be positive.")
+        self.directory = directory
+        self.db = db
+        self.row_group_size = row_group_size
+        self.format = format
+        # Files written
+        self.paths = []
+        # message ID -> MessageColumns
+        self._buffers = {}
+        # message ID -> number of row groups written (NPZ)
+        self._row_groups = {}
+        # message ID -> ParquetWriter
+        self._writers = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, decoded):
+        """Add a decoded message (dict or CompactMessage, with its timestamp if any)."""
+        message_id = decoded['id']
+        try:
+            buffer = self._buffers[message_id]
+        except KeyError:
+            buffer = self._buffers[message_id] = MessageColumns(self.db.get_message(message_id))
+        buffer.append(decoded)
+        if buffer.rows >= self.row_group_size:
+            self._flush_buffer(buffer)
+
+    def add_all(self, messages):
+        """Add the decoded messages of an iterable (eg. iter_decode())."""
+        for decoded in messages:
+            self.add(decoded)
+
+    def flush(self):
+        """Write the buffered rows of all the messages."""
+        for buffer in self._buffers.values():
+            if buffer.rows:
+                self._flush_buffer(buffer)
+
+    def close(self):
+        """Write the buffered rows and close the files."""
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def _base_path(self, message):
+        return os.path.join(self.directory, '%s_%x' % (message.name, message.id))
+
+    def _flush_buffer(self, buffer):
+        if self.format == 'parquet':
+            self._write_parquet(buffer)
+        else:
+            self._write_npz(buffer)
+        buffer.clear()
+
+    def _write_npz(self, buffer):
+        message = buffer.message
+        row_group = self._row_groups.get(message.id, 0)
+        self._row_groups[message.id] = row_group + 1
+        path = '%s.%d.npz' % (self._base_path(message), row_group)
+        arrays = {'__metadata__': numpy.array(json.dumps(buffer.metadata()))}
+        for column in buffer.all_columns():
+            arrays[column.name] = column.numpy_values()
+            arrays[column.name + '.mask'] = column.numpy_mask()
+        with open(path, 'wb') as f:
+            numpy.savez(f, **arrays)
+        self.paths.append(path)
+
+    def _write_parquet(self, buffer):
+        columns = buffer.all_columns()
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(column.numpy_values(), mask=column.numpy_mask()) for column in columns],
+            schema=self._schema(buffer))
+        writer = self._writers.get(buffer.message.id)
+        if writer is None:
+            path = self._base_path(buffer.message) + '.parquet'
+            writer = self._writers[buffer.message.id] = pyarrow.parquet.ParquetWriter(path, table.schema)
+            self.paths.append(path)
+        writer.write_table(table)
+
+    def _schema(self, buffer):
+        fields = [
+            pyarrow.field(
+                column.name, pyarrow.from_numpy_dtype(numpy.dtype(column.values.typecode)),
+                metadata={'unit': column.unit} if column.unit else None)
+            for column in buffer.all_columns()]
+        metadata = buffer.metadata()
+        return pyarrow.schema(fields, metadata={
+            'caneton.message_id': str(metadata['message_id']),
+            'caneton.message_name': metadata['message_name'],
+        })
+
+
+def load_npz(paths):
+    """Concatenate the row groups of a message written in NPZ format.
+
+    Args:
+        paths: list of str, NPZ files of the row groups of a message, in order
+
+    Returns:
+        (columns, metadata): dict of masked arrays of NumPy by column name (the missing
+            values are masked) and the metadata (message ID and name, names and units of the columns)
+    """
+    parts = {}
+    metadata = None
+    for path in paths:
+        with numpy.load(path) as npz:
+            metadata = json.loads(str(npz['__metadata__']))
+            for name, _unit in metadata['columns']:
+                parts.setdefault(name, []).append(
+                    numpy.ma.masked_array(npz[name], mask=npz[name + '.mask']))
+    columns = {name: numpy.ma.concatenate(arrays) for name, arrays in parts.items()}
+    return columns, metadata
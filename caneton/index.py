@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Sidecar index of a capture (candump or ASC log, or frame store) to read only
+# the frames of a time range and of some message IDs: the capture is scanned
+# once, the index keeps time checkpoints and, for each message ID, the
+# timestamps and positions of its frames. The frames of a query are read by
+# seeking directly to them. The timestamps of the capture are expected in
+# increasing order.
+#
+# Index file format (little endian):
+#
+#   header, 56 bytes:
+#     magic               8 bytes  b'CANINDEX'
+#     version             uint16   1
+#     source_kind         uint8    0 for a log, 1 for a frame store
+#     reserved            1 byte
+#     checkpoint_interval uint32   frames between two checkpoints
+#     source_size         uint64   size of the capture when indexed
+#     source_mtime        float64  modification time of the capture when indexed
+#     frame_count         uint64
+#     checkpoint_count    uint64
+#     id_count            uint32
+#     reserved            4 bytes
+#
+#   checkpoints, 24 bytes each:
+#     timestamp           float64  timestamp of the frame (NaN when not logged)
+#     position            uint64   byte offset of the line in a log, index of the record in a store
+#     base                uint8    base of the numbers of an ASC log at this position
+#     reserved            7 bytes
+#
+#   message IDs, 24 bytes each:
+#     message_id          uint32
+#     reserved            4 bytes
+#     count               uint64   number of frames of the message
+#     offset              uint64   offset of the arrays of the message in the index file
+#
+#   arrays of each message ID: count float64 timestamps, then count uint64 positions
+#
+
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from . import logs
+from . import store
+
+
+MAGIC = b'CANINDEX'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHBxIQdQQI4x')
+CHECKPOINT = struct.Struct('<dQB7x')
+MESSAGE_ID = struct.Struct('<I4xQQ')
+
+SOURCE_LOG = 0
+SOURCE_STORE = 1
+
+# Default number of frames between two checkpoints
+CHECKPOINT_INTERVAL = 1024
+
+# Number of frames whose positions are kept in memory while a capture is indexed,
+# they are then written by runs in a temporary file (16 bytes by frame)
+SPILL_FRAMES = 1 << 20
+
+TIMESTAMP = struct.Struct('<d')
+
+try:
+    POSITION_TYPECODE = 'Q'
+    array.array(POSITION_TYPECODE)
+except ValueError:  # Python 2, unsigned long of 64 bits
+    POSITION_TYPECODE = 'L'
+
+NAN = float('nan')
+
+
+def index_path(path):
+    """Return the path of the sidecar index of a capture."""
+    return path + '.idx'
+
+
+def _is_store(path):
+    with open(path, 'rb') as f:
+        return f.read(len(store.MAGIC)) == store.MAGIC
+
+
+def _write_array(f, values):
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+
+def _read_array(f, typecode, count):
+    values = array.array(typecode)
+    values.fromfile(f, count)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _iter_log_positions(path):
+    """Yield (position, base, frame) of the frames of a log (base before the line)."""
+    base = 16
+    position = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            frame, next_base = logs.parse_line(line.decode('latin-1'), base)
+            if frame is not None:
+                yield position, base, frame
+            base = next_base
+            position += len(line)
+
+
+def _iter_store_positions(path):
+    with store.FrameStore(path) as frames:
+        for position, frame in enumerate(frames):
+            yield position, 16, logs.Frame(frame.timestamp, frame.message_id, None)
+
+
+def _spill(spill, by_id, runs):
+    """Write the positions kept in memory at the end of the spill file, by message ID."""
+    for message_id, (timestamps, id_positions) in by_id.items():
+        runs.setdefault(message_id, []).append((spill.tell(), len(timestamps)))
+        _write_array(spill, timestamps)
+        _write_array(spill, id_positions)
+    by_id.clear()
+
+
+def build_index(path, output=None, checkpoint_interval=CHECKPOINT_INTERVAL, spill_frames=SPILL_FRAMES):
+    """Scan a capture and write its index.
+
+    The positions of the frames are written by runs of spill_frames frames in a
+    temporary file while the capture is scanned, then gathered by message ID in
+    the index, so the memory used doesn't depend on the size of the capture.
+
+    Args:
+        path: str, path of the candump or ASC log, or of the frame store
+        output: str, path of the index (defaults to index_path(path))
+        checkpoint_interval: int, number of frames between two time checkpoints
+        spill_frames: int, number of frames whose positions are kept in memory
+
+    Returns:
+        output: str, path of the index written
+
+    Raises:
+        IOError: when the capture can't be read or the index can't be written
+    """
+    if output is None:
+        output = index_path(path)
+    stat = os.stat(path)
+    source_kind = SOURCE_STORE if _is_store(path) else SOURCE_LOG
+    positions = _iter_store_positions(path) if source_kind == SOURCE_STORE else _iter_log_positions(path)
+
+    checkpoint_times = array.array('d')
+    checkpoint_positions = array.array(POSITION_TYPECODE)
+    checkpoint_bases = array.array('B')
+    # message ID -> (timestamps, positions) of the frames not spilled yet
+    by_id = {}
+    # message ID -> [(offset, count)] of the runs of positions in the spill file
+    runs = {}
+    buffered = frame_count = 0
+    with tempfile.TemporaryFile() as spill:
+        for position, base, frame in positions:
+            timestamp = frame.timestamp if frame.timestamp is not None else NAN
+            if not frame_count % checkpoint_interval:
+                checkpoint_times.append(timestamp)
+                checkpoint_positions.append(position)
+                checkpoint_bases.append(base)
+            try:
+                timestamps, id_positions = by_id[frame.message_id]
+            except KeyError:
+                timestamps, id_positions = by_id[frame.message_id] = (
+                    array.array('d'), array.array(POSITION_TYPECODE))
+            timestamps.append(timestamp)
+            id_positions.append(position)
+            frame_count += 1
+            buffered += 1
+            if buffered >= spill_frames:
+                _spill(spill, by_id, runs)
+                buffered = 0
+        _spill(spill, by_id, runs)
+
+        message_ids = sorted(runs)
+        offset = HEADER.size + len(checkpoint_times) * CHECKPOINT.size + len(message_ids) * MESSAGE_ID.size
+        # Written in a temporary file then renamed so a concurrent query never reads a partial index
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(
+                    MAGIC, VERSION, source_kind, checkpoint_interval, stat.st_size, stat.st_mtime,
+                    frame_count, len(checkpoint_times), len(message_ids)))
+                for checkpoint in zip(checkpoint_times, checkpoint_positions, checkpoint_bases):
+                    f.write(CHECKPOINT.pack(*checkpoint))
+                for message_id in message_ids:
+                    count = sum(run_count for _run_offset, run_count in runs[message_id])
+                    f.write(MESSAGE_ID.pack(message_id, count, offset))
+                    offset += count * 16
+                for message_id in message_ids:
+                    # The timestamps of the runs, then their positions
+                    for array_index in range(2):
+                        for run_offset, run_count in runs[message_id]:
+                            spill.seek(run_offset + array_index * run_count * 8)
+                            f.write(spill.read(run_count * 8))
+            getattr(os, 'replace', os.rename)(temporary, output)
+        except Exception:
+            os.unlink(temporary)
+            raise
+    return output
+
+
+class _Timestamps(object):
+    """The timestamps of a message ID in the mapped index, read one by one by bisect."""
+
+    def __init__(self, buffer, offset, count):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        return TIMESTAMP.unpack_from(self._buffer, self._offset + index * 8)[0]
+
+
+class CaptureIndex(object):
+    """Query a capture through its index (see build_index()).
+
+    Args:
+        path: str, path of the capture
+        index: str, path of its index (defaults to index_path(path))
+
+    Raises:
+        ValueError: when the index is invalid or older than the capture
+    """
+
+    def __init__(self, path, index=None):
+        self.path = path
+        self.index = index or index_path(path)
+        with open(self.index, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError("'%s' isn't a capture index." % self.index)
+            (magic, version, self.source_kind, self.checkpoint_interval, source_size, source_mtime,
+             self.frame_count, checkpoint_count, id_count) = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("'%s' isn't a capture index of version %d." % (self.index, VERSION))
+            stat = os.stat(path)
+            if stat.st_size != source_size or stat.st_mtime != source_mtime:
+                raise ValueError("The index '%s' is outdated, '%s' changed." % (self.index, path))
+
+            checkpoints = [
+                CHECKPOINT.unpack(f.read(CHECKPOINT.size)) for _ in range(checkpoint_count)]
+            self._checkpoint_times = [checkpoint[0] for checkpoint in checkpoints]
+            self._checkpoint_positions = [checkpoint[1] for checkpoint in checkpoints]
+            self._checkpoint_bases = [checkpoint[2] for checkpoint in checkpoints]
+            # message ID -> (count, offset of the arrays)
+            self._message_ids = {}
+            for _ in range(id_count):
+                message_id, count, offset = MESSAGE_ID.unpack(f.read(MESSAGE_ID.size))
+                self._message_ids[message_id] = count, offset
+
+    @property
+    def message_ids(self):
+        return sorted(self._message_ids)
+
+    def count(self, message_id):
+        """Return the number of frames of the message ID in the capture."""
+        return self._message_ids.get(message_id, (0, 0))[0]
+
+    def _positions(self, message_ids, start, end):
+        """Return the sorted positions of the frames of the message IDs in [start, end)."""
+        positions = []
+        with open(self.index, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for message_id in message_ids:
+                    if message_id not in self._message_ids:
+                        continue
+                    count, offset = self._message_ids[message_id]
+                    timestamps = _Timestamps(mapped, offset, count)
+                    first = bisect.bisect_left(timestamps, start) if start is not None else 0
+                    last = bisect.bisect_left(timestamps, end) if end is not None else count
+                    if first >= last:
+                        continue
+                    f.seek(offset + count * 8 + first * 8)
+                    positions.extend(_read_array(f, POSITION_TYPECODE, last - first))
+            finally:
+                mapped.close()
+        positions.sort()
+        return positions
+
+    def _first_checkpoint(self, start):
+        """Return the index of the last checkpoint before the time start."""
+        if start is None or not self._checkpoint_times:
+            return 0
+        return max(bisect.bisect_left(self._checkpoint_times, start) - 1, 0)
+
+    def iter_frames(self, start=None, end=None, message_ids=None):
+        """Read the frames of the capture in [start, end) and of the given message IDs.
+
+        Args:
+            start: float, first timestamp of the frames (defaults to the beginning)
+            end: float, timestamp of the end of the range, excluded (defaults to the end)
+            message_ids: iterable of int, IDs of the frames (defaults to all)
+
+        Yields:
+            frame: logs.Frame, in the order of the capture.
+        """
+        if self.source_kind == SOURCE_STORE:
+            return self._iter_store_frames(start, end, message_ids)
+        return self._iter_log_frames(start, end, message_ids)
+
+    def _iter_log_frames(self, start, end, message_ids):
+        with open(self.path, 'rb') as f:
+            if message_ids is not None:
+                for position in self._positions(message_ids, start, end):
+                    checkpoint = bisect.bisect_right(self._checkpoint_positions, position) - 1
+                    f.seek(position)
+                    frame, _base = logs.parse_line(
+                        f.readline().decode('latin-1'), self._checkpoint_bases[checkpoint])
+                    yield frame
+                return
+
+            checkpoint = self._first_checkpoint(start)
+            base = 16
+            if self._checkpoint_positions:
+                f.seek(self._checkpoint_positions[checkpoint])
+                base = self._checkpoint_bases[checkpoint]
+            for line in f:
+                frame, base = logs.parse_line(line.decode('latin-1'), base)
+                if frame is None:
+                    continue
+                if end is not None and frame.timestamp is not None and frame.timestamp >= end:
+                    break
+                if _in_range(frame.timestamp, start, end):
+                    yield frame
+
+    def _iter_store_frames(self, start, end, message_ids):
+        with store.FrameStore(self.path) as frames:
+            if message_ids is not None:
+                for position in self._positions(message_ids, start, end):
+                    yield frames[position]
+                return
+
+            for position in range(self._first_checkpoint(start) * self.checkpoint_interval, len(frames)):
+                frame = frames[position]
+                if end is not None and frame.timestamp >= end:
+                    break
+                if _in_range(frame.timestamp, start, end):
+                    yield frame
+
+    def iter_decode(self, db, start=None, end=None, message_ids=None, ignore_unknown=True, errors=None):
+        """Decode the frames of the capture in [start, end) and of the given message IDs.
+
+        Args:
+            db: Database, the compiled DBC (see compile_dbc()), or a Decoder of it
+            ignore_unknown, errors: see logs.decode_frames()
+
+        Yields:
+            message: decoded message (see message_decode()) with its 'timestamp'.
+        """
+        return logs.decode_frames(self.iter_frames(start, end, message_ids), db, ignore_unknown, errors)
+
+
+def _in_range(timestamp, start, end):
+    if start is None and end is None:
+        return True
+    if timestamp is None:
+        return False
+    return (start is None or timestamp >= start) and (end is None or timestamp < end)
+
+
+def filter_frames(frames, start=None, end=None, message_ids=None):
+    """Filter frames by time range and message IDs without index (see CaptureIndex.iter_frames())."""
+    message_ids = frozenset(message_ids) if message_ids is not None else None
+    for frame in frames:
+        if (message_ids is None or frame.message_id in message_ids) and _in_range(frame.timestamp, start, end):
+            yield frame
+
+
+class CaptureScan(object):
+    """Query a capture without index, all its frames are read (see CaptureIndex)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _iter_all_frames(self):
+        if _is_store(self.path):
+            with store.FrameStore(self.path) as frames:
+                for frame in frames:
+                    yield frame
+            return
+        base = 16
+        with open(self.path, 'rb') as f:
+            for line in f:
+                frame, base = logs.parse_line(line.decode('latin-1'), base)
+                if frame is not None:
+                    yield frame
+
+    def iter_frames(self, start=None, end=None, message_ids=None):
+        """Read the frames of the capture in [start, end) and of the given message IDs."""
+        return filter_frames(self._iter_all_frames(), start, end, message_ids)
+
+    def iter_decode(self, db, start=None, end=None, message_ids=None, ignore_unknown=True, errors=None):
+        """Decode the frames of the capture in [start, end) and of the given message IDs."""
+        return logs.decode_frames(self.iter_frames(start, end, message_ids), db, ignore_unknown, errors)
+
+
+def open_index(path, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """Return the CaptureIndex of a capture, (re)building its index when needed.
+
+    When the index can't be written next to the capture (read-only directory),
+    a CaptureScan reading the whole capture is returned.
+    """
+    try:
+        return CaptureIndex(path)
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        build_index(path, checkpoint_interval=checkpoint_interval)
+    except (IOError, OSError):
+        if not os.path.isfile(path):
+            raise
+        return CaptureScan(path)
+    return CaptureIndex(path)
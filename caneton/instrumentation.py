@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Optional instrumentation of the decoding: counters and cumulative time by
+# message and by signal, unknown message IDs, signals skipped because the
+# frame is too short and decoding errors, exported as a dict or in the text
+# format of Prometheus. Only the frames decoded through an instrumented
+# decoder are measured, the decoding of the database itself is unchanged.
+#
+
+import copy
+import time
+
+from . import compat
+from . import exceptions
+from .database import entry_value
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class Instrumentation(object):
+    """Counters of the frames decoded by instrumented decoders (see decoder()).
+
+    Args:
+        signal_timing: bool, measure the time of the extraction of each signal too
+            (slower, each signal is timed).
+        enabled: bool, False to decode without measuring anything
+    """
+
+    def __init__(self, signal_timing=False, enabled=True):
+        self.signal_timing = signal_timing
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """Reset all the counters."""
+        # message ID -> [name, frames, seconds]
+        self.messages = {}
+        # (message ID, signal name) -> [count, seconds]
+        self.signals = {}
+        # message ID -> frames
+        self.unknown_ids = {}
+        # (message ID, signal name) -> count
+        self.skipped_signals = {}
+        # (message ID, exception name) -> count
+        self.errors = {}
+
+    def decoder(self, db):
+        """Return a decoder of the database which updates the counters.
+
+        Args:
+            db: Database, the compiled DBC (see compile_dbc())
+
+        Returns:
+            decoder: InstrumentedDecoder
+        """
+        return InstrumentedDecoder(db, self)
+
+    def as_dict(self):
+        """Return the counters as a dict of dicts by message ID."""
+        signals = {}
+        for (message_id, signal_name), (count, seconds) in self.signals.items():
+            signals.setdefault(message_id, {})[signal_name] = {'count': count, 'seconds': seconds}
+        skipped_signals = {}
+        for (message_id, signal_name), count in self.skipped_signals.items():
+            skipped_signals.setdefault(message_id, {})[signal_name] = count
+        errors = {}
+        for (message_id, error), count in self.errors.items():
+            errors.setdefault(message_id, {})[error] = count
+        return {
+            'messages': {
+                message_id: {'name': name, 'frames': frames, 'seconds': seconds}
+                for message_id, (name, frames, seconds) in self.messages.items()
+            },
+            'signals': signals,
+            'unknown_ids': dict(self.unknown_ids),
+            'skipped_signals': skipped_signals,
+            'errors': errors,
+        }
+
+    def prometheus(self, prefix='caneton'):
+        """Return the counters in the text exposition format of Prometheus."""
+        names = {message_id: stats[0] for message_id, stats in self.messages.items()}
+
+        def message_labels(message_id):
+            labels = [('message_id', '0x%x' % message_id)]
+            if message_id in names:
+                labels.append(('message', names[message_id]))
+            return labels
+
+        lines = []
+
+        def add_metric(name, help_text, samples):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s counter' % (prefix, name))
+            for labels, value in sorted(samples):
+                lines.append('%s_%s{%s} %r' % (prefix, name, ','.join(
+                    '%s="%s"' % (label, _escape(label_value)) for label, label_value in labels), value))
+
+        add_metric('frames_total', "Frames decoded by message.", [
+            (message_labels(message_id), stats[1]) for message_id, stats in self.messages.items()])
+        add_metric('decode_seconds_total', "Time spent decoding the frames by message.", [
+            (message_labels(message_id), stats[2]) for message_id, stats in self.messages.items()])
+        add_metric('signals_total', "Signals decoded.", [
+            (message_labels(message_id) + [('signal', signal_name)], stats[0])
+            for (message_id, signal_name), stats in self.signals.items()])
+        if self.signal_timing:
+            add_metric('signal_seconds_total', "Time spent extracting the signals.", [
+                (message_labels(message_id) + [('signal', signal_name)], stats[1])
+                for (message_id, signal_name), stats in self.signals.items()])
+        add_metric('unknown_frames_total', "Frames whose message ID is not in the DBC.", [
+            (message_labels(message_id), count) for message_id, count in self.unknown_ids.items()])
+        add_metric('skipped_signals_total', "Signals ignored because the frame is too short.", [
+            (message_labels(message_id) + [('signal', signal_name)], count)
+            for (message_id, signal_name), count in self.skipped_signals.items()])
+        add_metric('decoding_errors_total', "Frames which can't be decoded.", [
+            (message_labels(message_id) + [('error', error)], count)
+            for (message_id, error), count in self.errors.items()])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(label_value):
+    return label_value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class InstrumentedDecoder(object):
+    """Decoder of a database updating the counters of an Instrumentation.
+
+    The decode() method has the arguments of Database.decode() so the decoder
+    can be given to logs.iter_decode() or FrameStore.iter_decode(). The frames
+    are decoded by Message.decode() with a copy of the layout whose
+    decode_values() function (see codegen) counts the decoded signals.
+    """
+
+    def __init__(self, database, instrumentation):
+        self.database = database
+        self.instrumentation = instrumentation
+        # Layout of the message -> its instrumented copy
+        self._layouts = {}
+
+    def get_message(self, message_id):
+        return self.database.get_message(message_id)
+
+    def decode(self, message_id, message_data, message_length=None, compact=False):
+        """Decode a CAN message and count it (see Database.decode())."""
+        instrumentation = self.instrumentation
+        if not instrumentation.enabled:
+            return self.database.decode(message_id, message_data, message_length, compact)
+
+        start = timer()
+        try:
+            message = self.database.get_message(message_id)
+        except exceptions.MessageNotFound:
+            instrumentation.unknown_ids[message_id] = instrumentation.unknown_ids.get(message_id, 0) + 1
+            raise
+
+        if message_length is None:
+            message_length = len(message_data)
+        try:
+            layout = self._instrumented_layout(message, message_length)
+            if compact:
+                decoded = message.decode_compact(message_data, message_length, layout)
+            else:
+                decoded = message.decode(message_data, message_length, layout)
+        except exceptions.DecodingError as e:
+            key = message_id, type(e).__name__
+            instrumentation.errors[key] = instrumentation.errors.get(key, 0) + 1
+            raise
+        duration = timer() - start
+
+        try:
+            stats = instrumentation.messages[message_id]
+        except KeyError:
+            stats = instrumentation.messages[message_id] = [message.name, 0, 0.0]
+        stats[1] += 1
+        stats[2] += duration
+        return decoded
+
+    def _instrumented_layout(self, message, message_length):
+        layout = message.layout(message_length)
+        try:
+            return self._layouts[layout]
+        except KeyError:
+            pass
+
+        def decode_values(message_data):
+            return self._decode_values(message, layout, message_data)
+
+        instrumented = copy.copy(layout)
+        instrumented.decode_values = decode_values
+        self._layouts[layout] = instrumented
+        return instrumented
+
+    def _decode_values(self, message, layout, message_data):
+        instrumentation = self.instrumentation
+        if instrumentation.signal_timing:
+            multiplexing_mode, entries, values = self._decode_values_timed(message, message_data, layout)
+        else:
+            multiplexing_mode, entries, values = message._decode_values(message_data, layout)
+            signals = instrumentation.signals
+            for entry in entries:
+                try:
+                    signals[message.id, entry[0].name][0] += 1
+                except KeyError:
+                    signals[message.id, entry[0].name] = [1, 0.0]
+
+        if layout.skipped:
+            # Only the signals of the multiplexing mode of the frame
+            for signal in layout.mode_skipped(multiplexing_mode, entries, values):
+                key = message.id, signal.name
+                instrumentation.skipped_signals[key] = instrumentation.skipped_signals.get(key, 0) + 1
+        return multiplexing_mode, entries, values
+
+    def _decode_values_timed(self, message, message_data, layout):
+        # Same as Message._decode_values() with each signal timed
+        signals = self.instrumentation.signals
+        msb = compat.int_from_bytes(message_data, 'big')
+        lsb = compat.int_from_bytes(message_data, 'little')
+        multiplexing_mode, _key, entries = layout.mode_entries(msb, lsb, message_data)
+
+        values = []
+        for entry in entries:
+            signal = entry[0]
+            start = timer()
+            value = entry_value(entry, msb, lsb, message_data)
+            duration = timer() - start
+            try:
+                stats = signals[message.id, signal.name]
+            except KeyError:
+                stats = signals[message.id, signal.name] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += duration
+            values.append(value)
+
+        return multiplexing_mode, entries, values
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Lazy parsing of CAN logs (candump of can-utils and Vector ASC) and decoding
+# of their frames. Everything is a generator so a log is decoded with
+# constant memory whatever its size.
+#
+
+import binascii
+import collections
+
+from . import exceptions
+
+
+class Frame(collections.namedtuple('Frame', ['timestamp', 'message_id', 'data'])):
+    """A CAN frame read from a log (timestamp is None when not logged)."""
+
+    __slots__ = ()
+
+
+def parse_candump_line(line):
+    """Parse a line of candump output.
+
+    The formats of candump -l (log file) and of the default output (with or
+    without timestamp) are supported:
+        (1436509052.249713) can0 701#01780178010000
+        (1436509052.249713) can0 123##1112233
+        can0  701   [7]  01 78 01 78 01 00 00
+
+    Returns:
+        frame: Frame or None when the line isn't a data frame (remote or error frame).
+
+    Raises:
+        ValueError: when the line isn't in candump format
+    """
+    fields = line.split()
+    if not fields:
+        raise ValueError("Empty candump line.")
+
+    timestamp = None
+    if fields[0][0] == '(' and fields[0][-1] == ')':
+        timestamp = float(fields[0][1:-1])
+        fields = fields[1:]
+
+    if len(fields) == 2 and '#' in fields[1]:
+        message_id, data = fields[1].split('#', 1)
+        if data.startswith('#'):
+            # CAN FD, the first character is the flags
+            data = data[2:]
+        elif data.startswith('R'):
+            return None
+    elif len(fields) >= 3 and fields[2][0] == '[' and fields[2][-1] == ']':
+        message_id = fields[1]
+        data = ''.join(fields[3:])
+        if data.startswith('remote'):
+            return None
+    else:
+        raise ValueError("Invalid candump line '%s'." % line.rstrip())
+
+    message_id = int(message_id, 16)
+    if message_id & 0x20000000:
+        # Error frame (CAN_ERR_FLAG)
+        return None
+    return Frame(timestamp, message_id, binascii.unhexlify(data))
+
+
+def parse_asc_line(line, base=16):
+    """Parse a line of Vector ASC log.
+
+    Only the CAN and CAN FD data frames are returned, for example:
+        0.012345 1  701             Rx   d 7 01 78 01 78 01 00 00
+        0.012345 CANFD 1 Rx 701 MSG_NAME 0 0 8 8 01 78 01 78 01 00 00 00
+
+    Args:
+        line: str, the line to parse
+        base: int, base of the numbers (header 'base hex' or 'base dec')
+
+    Returns:
+        frame: Frame or None when the line isn't a data frame (header, comment,
+            remote or error frame, event...).
+    """
+    fields = line.split()
+    if len(fields) < 3:
+        return None
+    try:
+        timestamp = float(fields[0])
+    except ValueError:
+        return None
+
+    if fields[1] == 'CANFD':
+        # Time CANFD Channel Dir ID [SymbolicName] BRS ESI DLC DataLength D1...
+        brs = 6 if len(fields) > 5 and not fields[5].isdigit() else 5
+        if len(fields) < brs + 4:
+            return None
+        message_id, data_length = fields[4], int(fields[brs + 3])
+        data = fields[brs + 4:brs + 4 + data_length]
+    else:
+        # Time Channel ID Dir d DLC D1...
+        if len(fields) < 6 or fields[4] != 'd':
+            return None
+        message_id, data_length = fields[2], int(fields[5], base)
+        data = fields[6:6 + data_length]
+
+    if message_id.endswith('x'):
+        message_id = message_id[:-1]
+    try:
+        message_id = int(message_id, base)
+    except ValueError:
+        return None
+    return Frame(timestamp, message_id, bytes(bytearray(int(byte, base) for byte in data)))
+
+
+def parse_line(line, base=16):
+    """Parse a line of a candump or ASC log, the format is detected.
+
+    Args:
+        line: str, the line to parse
+        base: int, base of the numbers of ASC logs
+
+    Returns:
+        (frame, base): frame is None when the line isn't a frame, base is the base
+            of the numbers of the next lines (changed by the 'base' header line of ASC logs).
+    """
+    line = line.strip()
+    if not line:
+        return None, base
+    try:
+        return parse_candump_line(line), base
+    except ValueError:
+        if line.startswith('base '):
+            return None, 10 if line.split()[1] == 'dec' else 16
+        return parse_asc_line(line, base), base
+
+
+def iter_frames(lines, base=16):
+    """Parse lazily the lines of a candump or ASC log.
+
+    The format is detected on each line, the lines which aren't frames are skipped.
+
+    Args:
+        lines: iterable of str, the lines of the log (e.g. an opened file)
+        base: int, base of the numbers of ASC logs until a 'base' header line
+
+    Yields:
+        frame: Frame
+    """
+    for line in lines:
+        frame, base = parse_line(line, base)
+        if frame is not None:
+            yield frame
+
+
+def iter_decode(lines, db, ignore_unknown=True, base=16, errors=None):
+    """Decode lazily the frames of a candump or ASC log.
+
+    Args:
+        lines: iterable of str, the lines of the log (e.g. an opened file)
+        db: Database, the compiled DBC (see compile_dbc()), or a Decoder of it
+        ignore_unknown: bool, skip the frames whose ID is not in the DBC instead of
+            raising MessageNotFound.
+        base: int, base of the numbers of ASC logs until a 'base' header line
+        errors: list, skip the frames which can't be decoded instead of raising
+            DecodingError, they're appended to the list as (frame, exception).
+
+    Yields:
+        message: decoded message (see message_decode()) with its 'timestamp'.
+    """
+    return decode_frames(iter_frames(lines, base), db, ignore_unknown, errors)
+
+
+def decode_frames(frames, db, ignore_unknown=True, errors=None):
+    """Decode lazily frames (see iter_decode()).
+
+    Args:
+        frames: iterable of Frame
+        db: Database, the compiled DBC (see compile_dbc()), or a Decoder of it
+        ignore_unknown: bool, skip the frames whose ID is not in the DBC instead of
+            raising MessageNotFound.
+        errors: list, skip the frames which can't be decoded instead of raising
+            DecodingError, they're appended to the list as (frame, exception).
+
+    Yields:
+        message: decoded message (see message_decode()) with its 'timestamp'.
+    """
+    for frame in frames:
+        try:
+            message = db.decode(frame.message_id, frame.data)
+        except exceptions.MessageNotFound:
+            if ignore_unknown:
+                continue
+            raise
+        except exceptions.DecodingError as e:
+            if errors is None:
+                raise
+            errors.append((frame, e))
+            continue
+        message['timestamp'] = frame.timestamp
+        yield message
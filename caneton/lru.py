@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Bounded cache of the decoded values by (message ID, frame data) in front of
+# a database, for the buses where the same frames (heartbeats, status) are
+# repeated: a frame already seen isn't decoded again. The least recently used
+# frames are evicted when the cache is full.
+#
+
+import collections
+
+from .database import CompactMessage
+
+
+# Default number of frames kept
+MAXSIZE = 4096
+
+
+class CachingDecoder(object):
+    """Decoder of a database caching the values of the last decoded frames.
+
+    The messages are returned as CompactMessage (see Database.decode()), the
+    frames found in the cache share the tuple of the values and the signals
+    descriptions of the first decoding, only the CompactMessage is new so its
+    timestamp can be set.
+
+    Args:
+        database: Database, the compiled DBC (see compile_dbc())
+        maxsize: int, maximum number of frames kept in the cache
+        exclude_ids: iterable of int, IDs of the messages never cached (counters,
+            timestamps... whose frames never repeat)
+
+    The decode() method has the arguments of Database.decode() so the decoder
+    can be given to logs.iter_decode() or FrameStore.iter_decode().
+    """
+
+    def __init__(self, database, maxsize=MAXSIZE, exclude_ids=()):
+        if maxsize < 1:
+            raise ValueError("The size of the cache must be positive.")
+        self.database = database
+        self.maxsize = maxsize
+        self.exclude_ids = frozenset(exclude_ids)
+        self.clear()
+
+    def clear(self):
+        """Empty the cache and reset its statistics."""
+        # (message ID, frame data) -> (message, entries, values, multiplexing mode)
+        self._cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Frames of the excluded IDs
+        self.bypassed = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
+
+    def stats(self):
+        """Return the statistics of the cache as a dict."""
+        return {
+            'size': len(self._cache),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bypassed': self.bypassed,
+            'hit_ratio': self.hit_ratio,
+        }
+
+    def get_message(self, message_id):
+        return self.database.get_message(message_id)
+
+    def decode(self, message_id, message_data, message_length=None):
+        """Decode a CAN message in a CompactMessage, from the cache when possible.
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+            exceptions.DecodingError: when the frame can't be decoded (not cached)
+        """
+        if message_id in self.exclude_ids:
+            self.bypassed += 1
+            return self.database.decode(message_id, message_data, message_length, compact=True)
+
+        if message_length is not None:
+            message_data = message_data[:message_length]
+        if not isinstance(message_data, bytes):
+            # Memoryview of a frame store or bytearray, the key must not change
+            message_data = bytes(bytearray(message_data))
+
+        key = message_id, message_data
+        cache = self._cache
+        try:
+            message, entries, values, multiplexing_mode = cached = cache.pop(key)
+        except KeyError:
+            pass
+        else:
+            # Most recently used at the end
+            cache[key] = cached
+            self.hits += 1
+            return CompactMessage(message, entries, values, multiplexing_mode, message_data)
+
+        self.misses += 1
+        decoded = self.database.decode(message_id, message_data, compact=True)
+        cache[key] = decoded.message, decoded.entries, decoded.values, decoded.multiplexing_mode
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return decoded
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Decoding of large log files in parallel processes. The file is split in
+# byte ranges aligned on lines, each worker decodes whole chunks with the
+# compiled DBC it received once at startup.
+#
+
+import collections
+import multiprocessing
+import os
+
+from . import logs
+
+
+# Size of the chunks of the file decoded by a worker
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Worker state: compiled DBC and options, set once by _init_worker()
+_worker = {}
+
+
+def _init_worker(db, formatter, base):
+    _worker['db'] = db
+    _worker['formatter'] = formatter
+    _worker['base'] = base
+
+
+def _read_lines(path, start, end):
+    """Read the lines starting in the byte range [start, end) of the file."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            yield line.decode('utf-8', 'replace')
+
+
+def _decode_chunk(chunk):
+    path, start, end, skip_errors = chunk
+    formatter = _worker['formatter']
+    errors = [] if skip_errors else None
+    lines = _read_lines(path, start, end)
+    messages = logs.iter_decode(lines, _worker['db'], base=_worker['base'], errors=errors)
+    if formatter is None:
+        return list(messages), errors
+    return [formatter(message) for message in messages], errors
+
+
+def _chunk_results(pending, errors):
+    results, chunk_errors = pending.get()
+    if chunk_errors:
+        errors.extend(chunk_errors)
+    return results
+
+
+def split_chunks(path, chunk_size=CHUNK_SIZE):
+    """Split a file in byte ranges of about chunk_size bytes starting at the beginning of a line.
+
+    Returns:
+        chunks: list of (start, end) byte offsets.
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as f:
+        while offsets[-1] + chunk_size < size:
+            # Move to the beginning of the next line
+            f.seek(offsets[-1] + chunk_size - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            offsets.append(position)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _asc_base(path):
+    # The 'base' header of an ASC log is only in the first chunk
+    with open(path, 'rb') as f:
+        for line in f.read(64 * 1024).decode('utf-8', 'replace').splitlines():
+            if line.startswith('base '):
+                return 10 if line.split()[1] == 'dec' else 16
+    return 16
+
+
+def parallel_decode(path, db, workers=None, chunk_size=CHUNK_SIZE, formatter=None, errors=None):
+    """Decode a candump or ASC log file in parallel processes.
+
+    The compiled DBC is sent once to each worker process. The number of chunks
+    decoded in advance is bounded so the memory stays bounded too.
+
+    Args:
+        path: str, path of the log file
+        db: Database, the compiled DBC (see compile_dbc())
+        workers: int, number of processes (defaults to the number of CPUs)
+        chunk_size: int, approximative size in bytes of the chunks of the file
+        formatter: callable, applied to the decoded messages in the workers (e.g. to
+            serialize them), it must be picklable (a module level function).
+        errors: list, skip the frames which can't be decoded (see logs.iter_decode()),
+            they're appended to the list as their chunks are yielded.
+
+    Yields:
+        message: decoded message (see logs.iter_decode()) or the result of formatter,
+            in the order of the file.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(db, formatter, _asc_base(path)))
+    try:
+        pending = collections.deque()
+        for start, end in split_chunks(path, chunk_size):
+            pending.append(pool.apply_async(_decode_chunk, ((path, start, end, errors is not None),)))
+            if len(pending) >= 2 * workers:
+                for result in _chunk_results(pending.popleft(), errors):
+                    yield result
+        while pending:
+            for result in _chunk_results(pending.popleft(), errors):
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Binary store of CAN frames in fixed size records, read through a memory map
+# so the frames are decoded directly from the mapped file without copy.
+#
+# File format (little endian):
+#
+#   header, 16 bytes:
+#     magic            8 bytes  b'CANFRAME'
+#     version          uint16   1
+#     payload_size     uint16   size of the data field of the records (8 or 64)
+#     reserved         4 bytes
+#
+#   records, 16 + payload_size bytes each:
+#     timestamp        float64  seconds since the epoch
+#     message_id       uint32
+#     length           uint8    number of useful bytes of data
+#     reserved         3 bytes
+#     data             payload_size bytes, padded with zeros
+#
+
+import mmap
+import struct
+
+from . import compat
+from . import exceptions
+from . import logs
+
+
+MAGIC = b'CANFRAME'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHH4x')
+RECORD_HEADER = struct.Struct('<dIB3x')
+
+
+class FrameWriter(object):
+    """Write frames to a binary store file.
+
+    Args:
+        path: str, path of the file to create (overwritten)
+        payload_size: int, size of the data field of the records (8 for CAN, 64 for CAN FD)
+    """
+
+    def __init__(self, path, payload_size=8):
+        self.payload_size = payload_size
+        self._record = struct.Struct('<dIB3x%ds' % payload_size)
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, payload_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def write(self, timestamp, message_id, data):
+        """Append a frame to the store (timestamp None is stored as 0)."""
+        if len(data) > self.payload_size:
+            raise ValueError("The frame data is too large (%d > %d)" % (len(data), self.payload_size))
+        self._file.write(self._record.pack(timestamp or 0.0, message_id, len(data), bytes(data)))
+
+    def write_frames(self, frames):
+        """Append the frames of an iterable (e.g. logs.iter_frames()) to the store."""
+        for frame in frames:
+            self.write(frame.timestamp, frame.message_id, frame.data)
+
+
+class FrameStore(object):
+    """Read-only access to a binary store file through a memory map.
+
+    The frames data are memoryview slices of the mapped file, so the decoded
+    messages reference the file too (raw_data) and keep it mapped until they
+    are released. On Python 2, where the memory maps don't export buffers to
+    memoryview, the frames data are copied from the map.
+
+    Args:
+        path: str, path of the store file
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._mmap, 'madvise'):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+
+        magic, version, self.payload_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError("'%s' isn't a frame store file of version %d." % (path, VERSION))
+        self.record_size = RECORD_HEADER.size + self.payload_size
+        self._count = (len(self._mmap) - HEADER.size) // self.record_size
+        # Slices of the map itself are copies (str)
+        self._view = self._mmap if compat.IS_PY2 else memoryview(self._mmap)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if not compat.IS_PY2:
+            self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Frames are still referenced, the map is closed when they're garbage collected
+            pass
+
+    def __len__(self):
+        return self._count
+
+    def _frame(self, offset):
+        timestamp, message_id, length = RECORD_HEADER.unpack_from(self._mmap, offset)
+        data_offset = offset + RECORD_HEADER.size
+        return logs.Frame(timestamp, message_id, self._view[data_offset:data_offset + length])
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("frame index out of range")
+        return self._frame(HEADER.size + index * self.record_size)
+
+    def __iter__(self):
+        for offset in range(HEADER.size, HEADER.size + self._count * self.record_size, self.record_size):
+            yield self._frame(offset)
+
+    def iter_decode(self, db, ignore_unknown=True):
+        """Decode the frames of the store in order.
+
+        Args:
+            db: Database, the compiled DBC (see compile_dbc())
+            ignore_unknown: bool, skip the frames whose ID is not in the DBC instead of
+                raising MessageNotFound.
+
+        Yields:
+            message: decoded message (see message_decode()) with its 'timestamp',
+                raw_data is a memoryview of the mapped file (a copy on Python 2).
+        """
+        unpack_from = RECORD_HEADER.unpack_from
+        view = self._view
+        record_header_size = RECORD_HEADER.size
+        for offset in range(HEADER.size, HEADER.size + self._count * self.record_size, self.record_size):
+            timestamp, message_id, length = unpack_from(self._mmap, offset)
+            data_offset = offset + record_header_size
+            try:
+                message = db.decode(message_id, view[data_offset:data_offset + length], length)
+            except exceptions.MessageNotFound:
+                if ignore_unknown:
+                    continue
+                raise
+            message['timestamp'] = timestamp
+            yield message
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Change detection: most of the messages are sent periodically with the same
+# payload, only the signals whose bits changed since the previous frame are
+# decoded and emitted.
+#
+
+from . import compat
+from .database import MessageDict, entry_value, signal_dict
+
+
+class ChangeTracker(object):
+    """Stateful decoder which emits only the signals whose value changed.
+
+    The last payload is remembered by message ID, and by multiplexing mode for
+    multiplexed messages. A frame with the same payload as the previous one is
+    not decoded at all, otherwise the old and new payloads are XORed and only
+    the signals overlapping the changed bits are decoded. The multiplexed signals
+    are compared with the previous frame of the same multiplexing mode.
+
+    Args:
+        db: Database, the compiled DBC (see compile_dbc())
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # message ID -> (message_data, message_length, msb, lsb) of the last frame
+        self._last = {}
+        # (message ID, multiplexing mode key) -> same for the last frame of the mode
+        self._last_by_mode = {}
+        # Layout -> bits of the signals in the frame integer by signal name
+        self._signal_bits = {}
+
+    def reset(self):
+        """Forget the previous frames, the next frame of each message is fully emitted."""
+        self._last.clear()
+        self._last_by_mode.clear()
+
+    def _get_signal_bits(self, layout):
+        try:
+            return self._signal_bits[layout]
+        except KeyError:
+            signal_bits = self._signal_bits[layout] = {
+                entry[0].name: entry[2] << entry[1] for entry in layout.entries}
+            return signal_bits
+
+    def update(self, message_id, message_data, message_length=None):
+        """Decode the signals of the frame which changed since the previous frame.
+
+        Args:
+            message_id: int, message identifier.
+            message_data: bytes, binary data of the message.
+            message_length: int, length of the useful data in message data received
+                (defaults to the length of message data).
+
+        Returns:
+            message: MessageDict with only the changed signals (all the signals for the
+                first frame of a message or multiplexing mode) or None when no signal
+                changed.
+
+        Raises:
+            exceptions.MessageNotFound: when message's ID is not found in the DBC
+        """
+        if message_length is None:
+            message_length = len(message_data)
+        message_data = bytes(message_data[:message_length])
+
+        last = self._last.get(message_id)
+        if last is not None and last[0] == message_data:
+            return None
+
+        message = self.db.get_message(message_id)
+        layout = message.layout(message_length)
+        msb = compat.int_from_bytes(message_data, 'big')
+        lsb = compat.int_from_bytes(message_data, 'little')
+        current = (message_data, message_length, msb, lsb)
+        self._last[message_id] = current
+
+        multiplexing_mode, key, entries = layout.mode_entries(msb, lsb, message_data)
+        if layout.multiplexor is not None:
+            last_of_mode = self._last_by_mode.get((message_id, key))
+            self._last_by_mode[message_id, key] = current
+        else:
+            last_of_mode = None
+
+        signal_bits = self._get_signal_bits(layout)
+        signals = []
+        for entry in entries:
+            signal = entry[0]
+            previous = last if signal.multiplexing is None or layout.multiplexor is None else last_of_mode
+
+            if previous is not None and previous[1] == message_length:
+                if signal.is_little_endian:
+                    changed_bits = previous[3] ^ lsb
+                else:
+                    changed_bits = previous[2] ^ msb
+                if not changed_bits & signal_bits[signal.name]:
+                    continue
+            signals.append(signal_dict(entry, entry_value(entry, msb, lsb, message_data)))
+
+        if not signals:
+            return None
+        return MessageDict(
+            signals=signals, name=message.name, id=message.id,
+            multiplexing_mode=multiplexing_mode, raw_data=message_data)
@@ -14,11 +14,17 @@ setup(
     license="BSD-3-Clause",
     keywords="CAN DBC",
     url="https://github.com/polyconseil/caneton",
-    packages=find_packages(exclude=['tests*']),
+    packages=find_packages(exclude=['tests*', 'benchmarks*']),
     long_description="",
+    extras_require={
+        'batch': ['numpy'],
+        'export': ['numpy', 'pyarrow'],
+    },
     entry_points={
         'console_scripts': [
             'caneton-decode = caneton.cli:main',
+            'caneton-dbc-compile = caneton.cli:compile_main',
+            'caneton-index = caneton.cli:index_main',
         ],
     },
     classifiers=[
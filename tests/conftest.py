@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # caneton.aio and its tests use async generators and asyncio.run()
+    collect_ignore.append('test_aio.py')
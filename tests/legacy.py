@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Reference implementation of message_decode() based on binary strings, as it
+# was before the DBC compilation. Used to check the compiled decoder gives
+# exactly the same results.
+#
+
+from caneton import compat
+from caneton import exceptions
+from caneton.decode import message_get_multiplexor, signal_decode
+
+
+def message_decode(message_id, message_length, message_data, dbc_json):
+    """Decode a CAN message (also called a frame).
+
+    Args:
+        message_id: int, message identifier.
+        message_length: int, length of the useful data in message data received (the length
+            can be different of the CAN data length).
+        message_data: bytes, binary data of the message.
+        dbc_json: dict, deserialized version of a DBC file converted to JSON with libcanardbc.
+
+    Returns:
+        message: decoded message with list of signals.
+
+    Raises:
+        exceptions.InvalidDBC: when used DBC has not messages entry
+        exceptions.MessageNotFound: when message's ID is not found in the DBC
+    """
+    if 'messages' not in dbc_json:
+        raise exceptions.InvalidDBC("Invalid DBC file (no messages entry)")
+
+    # Initialize the returns
+    message = {'signals': []}
+
+    try:
+        message_info = dbc_json['messages'][str(message_id)]
+        message['name'] = message_info['name']
+        message['id'] = message_id
+    except KeyError:
+        raise exceptions.MessageNotFound(
+            "Message ID {id:d} (0x{id:x}) not found in DBC".format(id=message_id))
+
+    # The CAN message data is always 8 bytes so it's required to truncate it to keep only
+    # the useful bytes (nop when already truncated)
+    message_data = message_data[:message_length]
+
+    # Convert length from bytes to bits
+    message_binary_length = message_length * 8
+
+    # Motorola
+    # 0n to fit in n characters width with 0 padding (can't use bin())
+    # [2:] to remove '0b' prefix and zfill constant length with 0 padding
+    message_binary_msb = bin(compat.int_from_bytes(message_data, 'big'))[2:].zfill(
+        message_binary_length)
+
+    # For Intel, identical but swapped
+    message_binary_lsb = bin(compat.int_from_bytes(message_data, 'little'))[2:].zfill(
+        message_binary_length)
+
+    if message_info.get('has_multiplexor', False):
+        multiplexor = message_get_multiplexor(
+            message_info, message_binary_msb, message_binary_lsb,
+            message_binary_length)
+    else:
+        multiplexor = None
+
+    multiplexing_mode = multiplexor['value'] if multiplexor else None
+    message['multiplexing_mode'] = multiplexing_mode
+    message['raw_data'] = message_data
+
+    if 'signals' not in message_info:
+        return message
+
+    signals = sorted(message_info['signals'].items(), key=lambda t: int(t[1]['bit_start']))
+    for signal_name, signal_info in signals:
+        # If the signal contains the multiplexor, we don't want to add it to the list of signals.
+        if signal_info.get('multiplexor', False):
+            continue
+
+        # Decode signal only when :
+        # - no multiplexing mode
+        # - or the signal is associated to the current multiplexing mode
+        if (multiplexing_mode is None or
+                multiplexing_mode == signal_info.get('multiplexing', multiplexing_mode)):
+            if signal_info['bit_start'] >= message_binary_length:
+                # The signal is invalid as the CAN frame is too small to contain it.
+                # However, new signals may be added to an already existing CAN frame,
+                # meaning the same DBC must support old versions with small frames
+                # and newer versions with extended data. To keep retro-compatibility
+                # we don't throw an error.
+                continue
+            signal = signal_decode(
+                signal_name, signal_info, message_binary_msb, message_binary_lsb,
+                message_binary_length)
+            message['signals'].append(signal)
+
+    return message
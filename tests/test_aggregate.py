@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import math
+import random
+
+import caneton
+from caneton import aggregate
+
+
+DBC_JSON = {
+    'messages': {
+        '1': {
+            'name': 'SPEED',
+            'length': 4,
+            'signals': {
+                'Speed': {'bit_start': 0, 'length': 16, 'little_endian': 1, 'factor': 0.5},
+                'Gear': {'bit_start': 16, 'length': 4, 'little_endian': 1, 'signed': 1},
+            },
+        },
+        '2': {
+            'name': 'MULTIPLEXED',
+            'length': 2,
+            'has_multiplexor': True,
+            'signals': {
+                'Mux': {'bit_start': 0, 'length': 1, 'little_endian': 1, 'multiplexor': True},
+                'A': {'bit_start': 1, 'length': 7, 'little_endian': 1, 'multiplexing': 0},
+                'B': {'bit_start': 1, 'length': 7, 'little_endian': 1, 'multiplexing': 1, 'offset': -10},
+                'Always': {'bit_start': 8, 'length': 8, 'little_endian': 1},
+            },
+        },
+    },
+}
+
+
+def random_frames(count, seed=42):
+    rand = random.Random(seed)
+    frames = []
+    timestamp = 100.0
+    for _ in range(count):
+        timestamp += rand.random() * 0.05
+        message_id = rand.choice([1, 2])
+        length = DBC_JSON['messages'][str(message_id)]['length']
+        frames.append(caneton.Frame(
+            timestamp, message_id, bytes(bytearray(rand.getrandbits(8) for _ in range(length)))))
+    return frames
+
+
+def reference(db, frames, window, step):
+    """Summaries computed from the decoded messages of each window."""
+    panes = int(round(window / step))
+    first = int(math.floor(frames[0].timestamp / step))
+    last = int(math.floor(frames[-1].timestamp / step))
+    summaries = []
+    for end_pane in range(first, last + 1):
+        start, end = (end_pane - panes + 1) * step, (end_pane + 1) * step
+        groups = {}
+        for frame in frames:
+            if start <= frame.timestamp < end:
+                message = db.decode(frame.message_id, frame.data)
+                groups.setdefault((frame.message_id, message['multiplexing_mode']), []).append(message)
+        for (message_id, mode), messages in sorted(groups.items(), key=lambda t: (t[0][0], t[0][1] or 0)):
+            signals = {}
+            for name in [signal['name'] for signal in messages[0]['signals']]:
+                values = [message.get_signal(name)['value'] for message in messages]
+                signals[name] = {
+                    'min': min(values), 'max': max(values), 'mean': math.fsum(values) / len(values),
+                    'last': values[-1]}
+            summaries.append({
+                'id': message_id, 'name': messages[0]['name'], 'multiplexing_mode': mode,
+                'start': start, 'end': end, 'count': len(messages), 'signals': signals})
+    return summaries
+
+
+class TestWindowAggregator(TestCase):
+
+    def setUp(self):
+        self.db = caneton.compile_dbc(DBC_JSON)
+
+    def assertSummariesEqual(self, summaries, expected):
+        self.assertEqual(len(summaries), len(expected))
+        for summary, expected_summary in zip(summaries, expected):
+            for key in ('start', 'end'):
+                self.assertAlmostEqual(summary[key], expected_summary[key])
+            for key in ('id', 'name', 'multiplexing_mode', 'count'):
+                self.assertEqual(summary[key], expected_summary[key])
+            self.assertEqual(sorted(summary['signals']), sorted(expected_summary['signals']))
+            for name, stats in summary['signals'].items():
+                for key, value in stats.items():
+                    self.assertAlmostEqual(value, expected_summary['signals'][name][key])
+
+    def test_tumbling(self):
+        frames = random_frames(500)
+        summaries = list(aggregate.aggregate(frames, self.db, window=1.0))
+        self.assertSummariesEqual(summaries, reference(self.db, frames, 1.0, 1.0))
+        self.assertEqual(set(summary['multiplexing_mode'] for summary in summaries), {None, 0, 1})
+
+    def test_sliding(self):
+        frames = random_frames(500)
+        summaries = list(aggregate.aggregate(frames, self.db, window=2.0, step=0.5))
+        self.assertSummariesEqual(summaries, reference(self.db, frames, 2.0, 0.5))
+
+    def test_emitted_incrementally(self):
+        aggregator = aggregate.WindowAggregator(self.db, window=1.0)
+        self.assertEqual(aggregator.add(1, b'\x02\x00\x01\x00', 10.2), [])
+        self.assertEqual(aggregator.add(1, b'\x04\x00\x01\x00', 10.7), [])
+        summaries = aggregator.add(1, b'\x06\x00\x01\x00', 12.5)
+        self.assertEqual(summaries, [{
+            'id': 1, 'name': 'SPEED', 'multiplexing_mode': None, 'start': 10.0, 'end': 11.0, 'count': 2,
+            'signals': {
+                'Speed': {'min': 1.0, 'max': 2.0, 'mean': 1.5, 'last': 2.0},
+                'Gear': {'min': 1.0, 'max': 1.0, 'mean': 1.0, 'last': 1},
+            },
+        }])
+        # Late, unknown and untimed frames are ignored
+        aggregator.add(1, b'\x02\x00\x01\x00', 11.9)
+        aggregator.add(0x42, b'\x00', 12.6)
+        self.assertEqual(aggregator.add(1, b'\x02\x00\x01\x00', None), [])
+        self.assertEqual(
+            (aggregator.frames, aggregator.late, aggregator.unknown, aggregator.untimed, aggregator.errors),
+            (3, 1, 1, 1, 0))
+        self.assertEqual([summary['start'] for summary in aggregator.flush()], [12.0])
+        self.assertEqual(aggregator.flush(), [])
+
+    def test_signals(self):
+        frames = random_frames(100)
+        for summary in aggregate.aggregate(frames, self.db, window=1.0, signals=['Speed', 'A']):
+            self.assertIn(sorted(summary['signals']), [['Speed'], ['A']])
+        # The frames of the mode 1 of MULTIPLEXED have none of the signals
+        summaries = list(aggregate.aggregate(frames, self.db, window=1.0, signals=['A']))
+        self.assertEqual(set(summary['multiplexing_mode'] for summary in summaries), {0})
+
+    def test_frame_lengths(self):
+        # Gear isn't in the frames of 2 bytes, the frames of both lengths are in the same summary
+        aggregator = aggregate.WindowAggregator(self.db, window=1.0)
+        aggregator.add(1, b'\x02\x00', 10.1)
+        aggregator.add(1, b'\x04\x00\x03\x00', 10.2)
+        aggregator.add(1, b'\x06\x00', 10.3)
+        self.assertEqual(aggregator.flush(), [{
+            'id': 1, 'name': 'SPEED', 'multiplexing_mode': None, 'start': 10.0, 'end': 11.0, 'count': 3,
+            'signals': {
+                'Speed': {'min': 1.0, 'max': 3.0, 'mean': 2.0, 'last': 3.0},
+                'Gear': {'min': 3.0, 'max': 3.0, 'mean': 3.0, 'last': 3},
+            },
+        }])
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            aggregate.WindowAggregator(self.db, window=1.0, step=0.3)
+        with self.assertRaises(ValueError):
+            aggregate.WindowAggregator(self.db, window=0)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import asyncio
+import binascii
+import socket
+
+from caneton import aio
+
+from . import utils
+
+
+def can_frame(can_id, data):
+    return aio.CAN_FRAME.pack(can_id, len(data), data)
+
+
+FRAMES = [
+    can_frame(0x701, binascii.unhexlify('01780178010000')),
+    can_frame(0x123, b'\x11\x22'),
+    can_frame(0x701 | aio.CAN_RTR_FLAG, b''),
+    can_frame(0x63f, binascii.unhexlify('0400E803')),
+    can_frame(0x195, binascii.unhexlify('1100F9FB00000000')),
+]
+
+
+class TestDecodeStream(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+
+    def _decode(self, chunks, **kwargs):
+        async def decode():
+            reader = asyncio.StreamReader()
+            for chunk in chunks:
+                reader.feed_data(chunk)
+            reader.feed_eof()
+            return [message async for message in aio.decode_stream(reader, self.db, **kwargs)]
+        return asyncio.run(decode())
+
+    def test_decode_stream(self):
+        stats = aio.StreamStats()
+        # Frames split across the reads
+        data = b''.join(FRAMES)
+        messages = self._decode([data[:20], data[20:]], batch_size=2, stats=stats)
+        self.assertEqual([message['id'] for message in messages], [0x701, 0x63f, 0x195])
+        expected = self.db.decode(0x701, binascii.unhexlify('01780178010000'))
+        self.assertEqual(messages[0]['signals'], expected['signals'])
+        self.assertIsNotNone(messages[0]['timestamp'])
+        self.assertEqual(
+            (stats.frames, stats.decoded, stats.unknown, stats.skipped, stats.errors, stats.dropped),
+            (5, 3, 1, 1, 0, 0))
+
+    def test_canfd(self):
+        frame = aio.CANFD_FRAME.pack(0x195 | aio.CAN_EFF_FLAG, 8, 0, binascii.unhexlify('1100F9FB00000000'))
+        messages = self._decode([frame], fd=True)
+        self.assertEqual(messages[0]['signals'], self.db.decode(0x195, frame[8:16])['signals'])
+
+    def test_backpressure(self):
+        async def decode():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b''.join(FRAMES * 10))
+            reader.feed_eof()
+            stats = aio.StreamStats()
+            stream = aio.decode_stream(reader, self.db, batch_size=1, queue_size=1, stats=stats)
+            first = await stream.__anext__()
+            for _ in range(10):
+                await asyncio.sleep(0)
+            # The reader waits for the consumer
+            self.assertLess(stats.frames, 10)
+            rest = [message async for message in stream]
+            return [first] + rest, stats
+        messages, stats = asyncio.run(decode())
+        self.assertEqual(len(messages), 30)
+        self.assertEqual(stats.dropped, 0)
+
+    def test_drop(self):
+        async def decode():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b''.join(FRAMES * 10))
+            reader.feed_eof()
+            stats = aio.StreamStats()
+            stream = aio.decode_stream(reader, self.db, batch_size=1, queue_size=1, drop=True, stats=stats)
+            first = await stream.__anext__()
+            await asyncio.sleep(0.1)
+            rest = [message async for message in stream]
+            return [first] + rest, stats
+        messages, stats = asyncio.run(decode())
+        self.assertEqual(stats.frames, 50)
+        self.assertGreater(stats.dropped, 0)
+        self.assertEqual(len(messages) + stats.dropped, 30)
+
+    def test_socketcan_reader(self):
+        # A datagram socket keeps the frames separated as a raw CAN socket
+        reader = aio.SocketCANReader.__new__(aio.SocketCANReader)
+        reader.fd = True
+        reader._socket, sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        reader._socket.setblocking(False)
+        self.addCleanup(sender.close)
+        self.addCleanup(reader.close)
+
+        async def read():
+            for frame in FRAMES:
+                sender.send(frame)
+            # The frames received are read at once, up to the size requested
+            return await reader.read(3 * aio.CANFD_MTU), await reader.read()
+        first, second = asyncio.run(read())
+        self.assertEqual((len(first), len(second)), (3 * aio.CANFD_MTU, 2 * aio.CANFD_MTU))
+        frames = [first[i:i + aio.CANFD_MTU] for i in range(0, len(first), aio.CANFD_MTU)]
+        self.assertEqual(frames[0], FRAMES[0] + bytes(aio.CANFD_MTU - aio.CAN_MTU))
+        self.assertEqual(second[aio.CANFD_MTU:aio.CANFD_MTU + aio.CAN_MTU], FRAMES[4])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase, skipIf
+import binascii
+import math
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import caneton
+
+from . import utils
+
+from .test_database import DBC_JSON, NESTED_DBC_JSON
+
+
+@skipIf(numpy is None, "NumPy is not installed")
+class TestDecodeBatch(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+
+    def assertSameAsDecode(self, db, message_id, frames):
+        def is_decodable(frame):
+            try:
+                db.decode(message_id, frame.tobytes())
+            except caneton.DecodingError:
+                return False
+            return True
+
+        frames = frames[[is_decodable(frame) for frame in frames]]
+        columns = db.decode_batch(message_id, frames)
+        for row, frame in enumerate(frames):
+            message = db.decode(message_id, frame.tobytes())
+            if 'multiplexing_mode' in columns:
+                self.assertEqual(columns['multiplexing_mode'][row], message['multiplexing_mode'])
+            decoded = {signal['name']: signal['value'] for signal in message['signals']}
+            for name, values in columns.items():
+                if name == 'multiplexing_mode':
+                    continue
+                if name not in decoded:
+                    self.assertIs(values.mask[row], numpy.True_, name)
+                    continue
+                value = values[row].item()
+                if isinstance(value, float) and math.isnan(value):
+                    self.assertTrue(math.isnan(decoded[name]), name)
+                else:
+                    self.assertEqual(value, decoded[name], name)
+                    self.assertIs(type(value), type(decoded[name]), name)
+
+    def _random_frames(self, message_length, count=200):
+        rand = random.Random(42)
+        return numpy.array(
+            [[rand.getrandbits(8) for _ in range(message_length)] for _ in range(count)],
+            dtype=numpy.uint8)
+
+    def test_decode_batch(self):
+        frames = numpy.frombuffer(binascii.unhexlify('1100E803000000001100F9FB00000000'), dtype=numpy.uint8)
+        columns = self.db.decode_batch(0x195, frames.reshape(2, 8))
+        self.assertEqual(list(columns), ['driving_active', 'operator_present', 'truck_speed'])
+        self.assertEqual(columns['truck_speed'].tolist(), [10.0, -10.31])
+
+    def test_decode_batch_buffer(self):
+        columns = self.db.decode_batch(0x701, binascii.unhexlify('01780178010000') * 3, 7)
+        self.assertEqual(columns['multiplexing_mode'].tolist(), [1, 1, 1])
+        self.assertEqual(columns['Bar2'].tolist(), [188.0] * 3)
+        self.assertEqual(columns['Foo1'].mask.tolist(), [True] * 3)
+
+    def test_same_as_decode(self):
+        frames = self._random_frames(8)
+        for message_id in [1942, 0x701, 0x63f, 0x63e, 0x195]:
+            self.assertSameAsDecode(self.db, message_id, frames)
+
+    def test_same_as_decode_motorola(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        for message_length in [8, 7, 12, 64]:
+            frames = self._random_frames(message_length)
+            for message_id in [256, 257, 258]:
+                self.assertSameAsDecode(db, message_id, frames)
+
+    def test_same_as_decode_nested(self):
+        db = caneton.compile_dbc(NESTED_DBC_JSON)
+        rand = random.Random(42)
+        frames = numpy.array(
+            [[rand.choice([0, 1, 2, 3, 5]) for _ in range(8)] for _ in range(300)], dtype=numpy.uint8)
+        self.assertSameAsDecode(db, 600, frames)
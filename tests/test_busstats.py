@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import math
+import threading
+
+import caneton
+from caneton import busstats
+
+from . import utils
+
+
+class TestBusStatistics(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+
+    def test_cycle_time(self):
+        self.assertEqual(self.db.get_message(0x701).cycle_time, 0.2)
+        self.assertIsNone(caneton.compile_dbc({'messages': {'1': {'name': 'A'}}}).get_message(1).cycle_time)
+
+    def test_message_stats(self):
+        statistics = busstats.BusStatistics(self.db, bitrate=125000)
+        # 0x701 every 200 ms, the frames at 0.8 and 1.0 s are lost
+        timestamps = [0.0, 0.2, 0.41, 0.6, 1.2, 1.4]
+        for timestamp in timestamps:
+            statistics.add(0x701, 8, timestamp)
+        statistics.add(0x42, 2, 0.5)
+        statistics.add(0x42, 2, None)
+
+        snapshot = statistics.snapshot()
+        stats = snapshot['messages'][0x701]
+        self.assertEqual((stats['name'], stats['cycle_time'], stats['frames']), ('CU_MULTI_FOO_BAR', 0.2, 6))
+        self.assertAlmostEqual(stats['frame_rate'], 5 / 1.4)
+        intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        mean = sum(intervals) / len(intervals)
+        self.assertAlmostEqual(stats['interval_mean'], mean)
+        self.assertAlmostEqual(stats['interval_min'], 0.19)
+        self.assertAlmostEqual(stats['interval_max'], 0.6)
+        self.assertAlmostEqual(stats['jitter'], math.sqrt(sum((i - mean) ** 2 for i in intervals) / len(intervals)))
+        self.assertEqual(stats['missing'], 2)
+        bounds = snapshot['histogram_bounds']
+        self.assertEqual(stats['histogram'][bounds.index(0.2)], 3)
+        self.assertEqual(stats['histogram'][bounds.index(0.5)], 1)
+        self.assertEqual(stats['histogram'][bounds.index(1.0)], 1)
+        self.assertEqual(sum(stats['histogram']), 5)
+
+        unknown = snapshot['messages'][0x42]
+        self.assertEqual((unknown['name'], unknown['cycle_time'], unknown['frames']), (None, None, 2))
+        self.assertIsNone(unknown['frame_rate'])
+        self.assertEqual(snapshot['frames'], 8)
+        bits = 6 * (47 + 64) + 2 * (47 + 16)
+        self.assertEqual(snapshot['bits'], bits)
+        self.assertAlmostEqual(snapshot['bus_load'], bits / (125000 * 1.4))
+        # Interval [1, 2) is the current one (with the late frame of 0x42), [0, 1) the last complete
+        self.assertAlmostEqual(snapshot['last_bus_load'], 4 * 111 / 125000.0)
+        self.assertAlmostEqual(snapshot['peak_bus_load'], snapshot['last_bus_load'])
+
+    def test_out_of_order(self):
+        statistics = busstats.BusStatistics(self.db)
+        for timestamp in (1.0, 1.2, 1.1, 1.4):
+            statistics.add(0x701, 8, timestamp)
+        stats = statistics.snapshot()['messages'][0x701]
+        self.assertEqual((stats['frames'], stats['out_of_order'], stats['missing']), (4, 1, 0))
+        self.assertAlmostEqual(stats['interval_mean'], 0.2)
+
+    def test_iter_decode(self):
+        statistics = busstats.BusStatistics(self.db)
+        lines = ['(1.0) can0 701#01780178010000\n', '(1.5) can0 123#00\n', '(2.0) can0 701#01780178010000\n']
+        messages = list(statistics.iter_decode(caneton.iter_frames(lines)))
+        self.assertEqual([message['timestamp'] for message in messages], [1.0, 2.0])
+        snapshot = statistics.snapshot()
+        self.assertEqual(snapshot['frames'], 3)
+        self.assertEqual(snapshot['messages'][0x701]['missing'], 4)
+        self.assertEqual(snapshot['messages'][0x123]['frames'], 1)
+
+    def test_frame_bits(self):
+        self.assertEqual(busstats.frame_bits(0x701, 8), (47 + 64, 0))
+        self.assertEqual(busstats.frame_bits(0x18db33f1, 8), (67 + 64, 0))
+        self.assertEqual(busstats.frame_bits(0x701, 8, extended=True), (67 + 64, 0))
+        self.assertEqual(busstats.frame_bits(0x701, 8, fd=True), (17 + 13, 5 + 64 + 4 + 17))
+        self.assertEqual(busstats.frame_bits(0x701, 64, extended=True), (36 + 13, 5 + 512 + 4 + 21))
+
+    def test_data_bitrate(self):
+        statistics = busstats.BusStatistics(bitrate=500000, data_bitrate=2000000)
+        statistics.add(0x123, 64, 0.0)
+        statistics.add(0x123, 8, 0.5, extended=True)
+        statistics.add(0x123, 8, 1.0)
+        snapshot = statistics.snapshot()
+        self.assertEqual(snapshot['bits'], 30 + 542 + 131 + 111)
+        busy = 30 / 500000.0 + 542 / 2000000.0 + 131 / 500000.0
+        self.assertAlmostEqual(snapshot['last_bus_load'], busy)
+        self.assertAlmostEqual(snapshot['bus_load'], busy + 111 / 500000.0)
+
+    def test_snapshot_while_adding(self):
+        statistics = busstats.BusStatistics(self.db, threadsafe=True)
+
+        def ingest():
+            for index in range(20000):
+                statistics.add(0x701, 8, index * 0.2)
+
+        thread = threading.Thread(target=ingest)
+        thread.start()
+        while thread.is_alive():
+            snapshot = statistics.snapshot()
+            stats = snapshot['messages'].get(0x701)
+            if stats is not None:
+                self.assertEqual(stats['frames'], snapshot['frames'])
+                self.assertEqual(sum(stats['histogram']), stats['frames'] - 1)
+        thread.join()
+        self.assertEqual(statistics.snapshot()['messages'][0x701]['missing'], 0)
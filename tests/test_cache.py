@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+import os
+import pickle
+import shutil
+import tempfile
+
+from caneton import cache
+
+
+class TestCache(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.path = os.path.join(self.directory, 'dbc.json')
+        shutil.copy('./tests/dbc.json', self.path)
+        self.message_data = binascii.unhexlify('01780178010000')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_database(self):
+        db = cache.load_database(self.path, self.cache_dir)
+        self.assertTrue(os.path.exists(cache.cache_path(self.path, self.cache_dir)))
+        expected = db.decode(0x701, self.message_data)
+
+        cached_db = cache.load_database(self.path, self.cache_dir)
+        self.assertIsInstance(cached_db.messages, cache._CachedMessages)
+        self.assertEqual(len(cached_db.messages), len(db.messages))
+        self.assertEqual(cached_db.decode(0x701, self.message_data), expected)
+        self.assertIs(cached_db.get_message(0x701), cached_db.get_message(0x701))
+
+        # Sent to workers as a plain database
+        self.assertEqual(pickle.loads(pickle.dumps(cached_db)).decode(0x701, self.message_data), expected)
+
+    def test_touched_file(self):
+        cache.load_database(self.path, self.cache_dir)
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 10))
+        db = cache.load_database(self.path, self.cache_dir)
+        self.assertIsInstance(db.messages, cache._CachedMessages)
+        self.assertEqual(db.decode(0x701, self.message_data)['name'], 'CU_MULTI_FOO_BAR')
+        # The cache is up to date with the new modification time, the file isn't hashed any more
+        with open(cache.cache_path(self.path, self.cache_dir), 'rb') as f:
+            header, _data_offset = cache._read_header(f)
+        self.assertEqual(header['mtime'], os.stat(self.path).st_mtime)
+
+    def test_compile(self):
+        cache.load_database(self.path, self.cache_dir)
+        db = cache.load_database(self.path, self.cache_dir).compile()
+        # The messages are still unpickled on demand
+        self.assertEqual(db.messages._messages, {})
+        message = db.get_message(0x701)
+        self.assertTrue(message.codegen)
+        self.assertEqual(db.decode(0x701, self.message_data)['signals'][0]['value'], 376)
+        self.assertIsNotNone(message.layout(len(self.message_data)).decode_values)
+
+    def test_modified_file(self):
+        cache.load_database(self.path, self.cache_dir)
+        with open(self.path) as f:
+            content = f.read()
+        with open(self.path, 'w') as f:
+            f.write(content.replace('CU_MULTI_FOO_BAR', 'CU_MULTI_FOO_BAZ'))
+
+        self.assertIsNone(cache.read_cache(self.path, self.cache_dir))
+        db = cache.load_database(self.path, self.cache_dir)
+        self.assertEqual(db.decode(0x701, self.message_data)['name'], 'CU_MULTI_FOO_BAZ')
+        db = cache.load_database(self.path, self.cache_dir)
+        self.assertIsInstance(db.messages, cache._CachedMessages)
+        self.assertEqual(db.decode(0x701, self.message_data)['name'], 'CU_MULTI_FOO_BAZ')
+
+    def test_without_cache(self):
+        db = cache.load_database(self.path, self.cache_dir, use_cache=False)
+        self.assertEqual(db.decode(0x701, self.message_data)['name'], 'CU_MULTI_FOO_BAR')
+        self.assertFalse(os.path.exists(self.cache_dir))
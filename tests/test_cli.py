@@ -4,9 +4,20 @@
 #
 
 from unittest import TestCase
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
 
 import caneton
 from caneton import cli
+from caneton import compat
+
+
+# Output of the CLI, written with native strings
+NativeStringIO = io.StringIO if compat.IS_PY3 else io.BytesIO
 
 
 class TestCLI(TestCase):
@@ -31,3 +42,105 @@ class TestCLI(TestCase):
             self.assertEqual(signal['name'], expected_signal['name'])
             self.assertEqual(signal['value'], expected_signal['value'], signal['name'])
             self.assertIsInstance(signal['value'], type(expected_signal['value']), signal['name'])
+
+    def test_canfd_length(self):
+        args = self.parser.parse_args(['./tests/dbc.json', '0x701', '0x' + '01' * 12])
+        args.dbcfile.close()
+        self.assertEqual(cli.parse_message(args), (0x701, b'\x01' * 12, 12))
+        for length in (10, 65):
+            args = self.parser.parse_args(['./tests/dbc.json', '0x701', '0x' + '01' * length])
+            args.dbcfile.close()
+            with self.assertRaises(ValueError):
+                cli.parse_message(args)
+
+    def test_log_json(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log_file:
+            log_file.write('(1.0) can0 701#01780178010000\n(2.0) can0 123#00\n(3.0) can0 63F#041D000000000000\n')
+            log_file.flush()
+            args = self.parser.parse_args(['./tests/dbc.json', '--input', log_file.name, '--output', 'json'])
+            db = caneton.compile_dbc(cli.load_dbc(args.dbcfile))
+            args.dbcfile.close()
+            stdout, sys.stdout = sys.stdout, NativeStringIO()
+            try:
+                with args.input:
+                    cli.log_output(args.input, db, is_json_output=True)
+                output = sys.stdout.getvalue()
+            finally:
+                sys.stdout = stdout
+
+        messages = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([message['name'] for message in messages], [
+            'CU_MULTI_FOO_BAR', 'SPCU_TX_TO_SUPERVISEUR_INFO'])
+        self.assertEqual(messages[0]['raw_data'], '01780178010000')
+        self.assertEqual(messages[1]['timestamp'], 3.0)
+
+    def test_log_query(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'candump.log')
+        with open(path, 'w') as log_file:
+            log_file.write(
+                '(1.0) can0 701#01780178010000\n(2.0) can0 63F#041D000000000000\n'
+                '(3.0) can0 701#01780178010000\n(4.0) can0 701#01780178010000\n')
+        args = self.parser.parse_args([
+            './tests/dbc.json', '--input', path, '--output', 'json', '--from', '2', '--to', '4', '--id', '0x701'])
+        db = caneton.compile_dbc(cli.load_dbc(args.dbcfile))
+        args.dbcfile.close()
+        stdout, sys.stdout = sys.stdout, NativeStringIO()
+        try:
+            with args.input:
+                cli.log_output(args.input, db, is_json_output=True, messages=cli.log_messages(args.input, db, args))
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        messages = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([(message['id'], message['timestamp']) for message in messages], [(0x701, 3.0)])
+        # The log is indexed by the first query
+        self.assertTrue(os.path.exists(path + '.idx'))
+
+    def test_log_errors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.log') as log_file:
+            log_file.write(
+                '(1.0) can0 701#01780178010000\n(2.0) can0 701#\n(3.0) can0 63F#041D000000000000\n')
+            log_file.flush()
+            argv, stdout, stderr = sys.argv, sys.stdout, sys.stderr
+            sys.argv = ['caneton-decode', '--no-cache', './tests/dbc.json', '--input', log_file.name]
+            sys.stdout, sys.stderr = NativeStringIO(), NativeStringIO()
+            try:
+                cli.main()
+                output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+            finally:
+                sys.argv, sys.stdout, sys.stderr = argv, stdout, stderr
+
+        self.assertEqual(output.count('Message '), 2)
+        self.assertEqual(errors.splitlines(), [
+            'Frame 0x701 at 2.0: Bit start 0 of signal Mode is too high', '1 frames skipped'])
+
+    def test_batch_with_data(self):
+        argv, stderr = sys.argv, sys.stderr
+        sys.argv = ['caneton-decode', './tests/dbc.json', '-', '0x01780178010000']
+        sys.stderr = NativeStringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                cli.main()
+            self.assertIn("can't be given with '-'", sys.stderr.getvalue())
+        finally:
+            sys.argv, sys.stderr = argv, stderr
+
+    def test_batch(self):
+        args = self.parser.parse_args(['./tests/dbc.json', '-'])
+        db = caneton.compile_dbc(cli.load_dbc(args.dbcfile))
+        args.dbcfile.close()
+        lines = io.StringIO(
+            u'701#01780178010000\n\n0x63F 0x041D000000000000\n1599 041D000000000000\n'
+            u'701#0178017801000\n123#00\n701 01 78\n')
+        output, stats_output = NativeStringIO(), NativeStringIO()
+        self.assertEqual(cli.batch_output(lines, db, True, output, stats_output), (3, 3))
+
+        messages = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([message['id'] for message in messages], [0x701, 0x63f, 0x63f])
+        self.assertEqual(messages[1]['raw_data'], '041d000000000000')
+        stats = stats_output.getvalue().splitlines()
+        self.assertEqual([line.split(':')[0] for line in stats[:3]], ['Line 5', 'Line 6', 'Line 7'])
+        self.assertTrue(stats[3].startswith('3 frames decoded in '))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+import linecache
+import pickle
+import random
+
+import caneton
+from caneton import codegen
+
+from . import legacy
+from . import utils
+from .test_database import DBC_JSON, FD_DBC_JSON, FLOAT_DBC_JSON
+
+
+class TestCodegen(TestCase):
+
+    def setUp(self):
+        self.dbc_json = utils.load_dbc_json()
+        self.db = caneton.compile_dbc(self.dbc_json).compile(codegen=True)
+
+    def _check_same_as_legacy(self, dbc_json, message_lengths):
+        db = caneton.compile_dbc(dbc_json).compile(codegen=True)
+        rand = random.Random(42)
+        for message_id in dbc_json['messages']:
+            for message_length in message_lengths:
+                for _ in range(50):
+                    message_data = bytes(bytearray(rand.getrandbits(8) for _ in range(message_length)))
+                    try:
+                        expected = legacy.message_decode(
+                            int(message_id), message_length, message_data, dbc_json)
+                    except caneton.CanetonError as e:
+                        with self.assertRaises(type(e)):
+                            db.decode(int(message_id), message_data, message_length)
+                        continue
+                    message = db.decode(int(message_id), message_data, message_length)
+                    self.assertEqual(utils.typed(message), utils.typed(expected))
+                    self.assertIsNotNone(db.get_message(int(message_id)).layout(message_length).decode_values)
+
+    def test_same_as_legacy(self):
+        self._check_same_as_legacy(self.dbc_json, [8])
+        self._check_same_as_legacy(DBC_JSON, [8, 7, 4, 2, 1])
+        self._check_same_as_legacy(FLOAT_DBC_JSON, [8, 7, 4])
+        self._check_same_as_legacy(FD_DBC_JSON, [64, 12])
+
+    def test_source(self):
+        layout = self.db.get_message(0x701).layout(7)
+        self.assertIn('def decode_values(message_data):', layout.source)
+        self.assertIn('multiplexing_mode == MODE_0', layout.source)
+        filename = layout.decode_values.__code__.co_filename
+        self.assertEqual(''.join(linecache.getlines(filename)), layout.source)
+
+    def test_code_cache_size(self):
+        filename = self.db.get_message(0x701).layout(7).decode_values.__code__.co_filename
+        code_cache_size = codegen.CODE_CACHE_SIZE
+        codegen.CODE_CACHE_SIZE = 1
+        try:
+            db = caneton.compile_dbc({'messages': {'1': {'name': 'A', 'signals': {'0': {
+                'name': 'S', 'bit_start': 0, 'length': 8, 'factor': 3, 'offset': 0,
+                'little_endian': True, 'value_type': 'unsigned'}}}}})
+            db.compile()
+            self.assertEqual(db.decode(1, b'\x02')['signals'][0]['value'], 6)
+        finally:
+            codegen.CODE_CACHE_SIZE = code_cache_size
+        self.assertEqual(len(codegen._code_cache), 1)
+        self.assertNotIn(filename, [entry[1] for entry in codegen._code_cache.values()])
+        self.assertEqual(linecache.getlines(filename), [])
+
+    def test_decoder_and_compact(self):
+        message_data = binascii.unhexlify('01780178010000')
+        message = self.db.decoder(signals=['Bar2']).decode(0x701, message_data)
+        self.assertEqual([signal['name'] for signal in message['signals']], ['Bar2'])
+        message = self.db.decode(0x701, message_data, compact=True)
+        self.assertEqual(message.values, (376, 188.0))
+        self.assertEqual(message.to_dict(), caneton.compile_dbc(self.dbc_json).decode(0x701, message_data))
+
+    def test_pickle(self):
+        message_data = binascii.unhexlify('01780178010000')
+        expected = self.db.decode(0x701, message_data)
+        db = pickle.loads(pickle.dumps(self.db))
+        self.assertEqual(db.decode(0x701, message_data), expected)
+        self.assertIsNotNone(db.get_message(0x701).layout(7).decode_values)
+
+    def test_disable(self):
+        self.db.compile(codegen=False)
+        self.assertIsNone(self.db.get_message(0x701).layout(7).decode_values)
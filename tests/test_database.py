@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+import random
+
+import caneton
+
+from . import legacy
+from . import utils
+
+
+# Motorola, signed, float and multiplexed signals not covered by tests/dbc.json
+DBC_JSON = {
+    'messages': {
+        '256': {
+            'name': 'MOTOROLA',
+            'length': 8,
+            'signals': {
+                'Speed': {'bit_start': 7, 'length': 16, 'little_endian': 0, 'factor': 0.1, 'offset': 0},
+                'Torque': {
+                    'bit_start': 21, 'length': 12, 'little_endian': 0, 'signed': 1, 'factor': 1,
+                    'offset': -5, 'unit': 'Nm'},
+                'Flag': {'bit_start': 26, 'length': 1, 'little_endian': 0},
+                'Ratio': {'bit_start': 39, 'length': 32, 'little_endian': 0, 'value_type': 'float'},
+            },
+        },
+        '257': {
+            'name': 'INTEL',
+            'length': 8,
+            'signals': {
+                'Counter': {'bit_start': 0, 'length': 4, 'little_endian': 1},
+                'Current': {'bit_start': 4, 'length': 13, 'little_endian': 1, 'signed': 1, 'factor': 0.5},
+                'Voltage': {'bit_start': 17, 'length': 32, 'little_endian': 1, 'value_type': 'float'},
+                'Last': {'bit_start': 60, 'length': 4, 'little_endian': 1, 'signed': 1},
+            },
+        },
+        '258': {
+            'name': 'MULTIPLEXED',
+            'length': 8,
+            'has_multiplexor': True,
+            'signals': {
+                'Mux': {'bit_start': 7, 'length': 2, 'little_endian': 0, 'multiplexor': True},
+                'Always': {'bit_start': 56, 'length': 8, 'little_endian': 1},
+                'A': {'bit_start': 8, 'length': 16, 'little_endian': 1, 'multiplexing': 0},
+                'B': {'bit_start': 15, 'length': 16, 'little_endian': 0, 'signed': 1, 'multiplexing': 1},
+                'C': {'bit_start': 8, 'length': 64, 'little_endian': 1, 'multiplexing': 2},
+            },
+        },
+    },
+}
+
+# Floating point signals aligned on bytes (read directly from the frame) or not
+FLOAT_DBC_JSON = {
+    'messages': {
+        '512': {
+            'name': 'FLOATS',
+            'length': 8,
+            'signals': {
+                'IntelAligned': {'bit_start': 32, 'length': 32, 'little_endian': 1, 'value_type': 'float'},
+                'MotorolaAligned': {
+                    'bit_start': 7, 'length': 32, 'little_endian': 0, 'value_type': 'float',
+                    'factor': 0.5, 'offset': 10},
+            },
+        },
+        '513': {
+            'name': 'UNALIGNED_FLOATS',
+            'length': 8,
+            'signals': {
+                'IntelUnaligned': {'bit_start': 3, 'length': 32, 'little_endian': 1, 'value_type': 'float'},
+                'MotorolaUnaligned': {
+                    'bit_start': 44, 'length': 32, 'little_endian': 0, 'value_type': 'float'},
+            },
+        },
+        '514': {
+            'name': 'INTEL_DOUBLE',
+            'length': 8,
+            'signals': {
+                'Double': {'bit_start': 0, 'length': 64, 'little_endian': 1, 'value_type': 'double'},
+            },
+        },
+        '515': {
+            'name': 'MOTOROLA_DOUBLE',
+            'length': 8,
+            'signals': {
+                'Double': {
+                    'bit_start': 7, 'length': 64, 'little_endian': 0, 'value_type': 'double', 'factor': 2},
+            },
+        },
+    },
+}
+
+# CAN FD message of 64 bytes, signals all along the frame
+FD_DBC_JSON = {
+    'messages': {
+        '768': {
+            'name': 'CANFD',
+            'length': 64,
+            'signals': dict(
+                [('Intel%d' % bit_start, {
+                    'bit_start': bit_start, 'length': 12, 'little_endian': 1, 'signed': bit_start % 2})
+                 for bit_start in range(0, 320, 29)] +
+                [('Motorola%d' % bit_start, {
+                    'bit_start': bit_start, 'length': 10, 'little_endian': 0, 'factor': 0.25})
+                 for bit_start in range(327, 448, 23)] +
+                [('Float', {'bit_start': 448, 'length': 32, 'little_endian': 1, 'value_type': 'float'}),
+                 ('Last', {'bit_start': 487, 'length': 24, 'little_endian': 0, 'signed': 1})]
+            ),
+        },
+    },
+}
+
+# Extended multiplexing: SubMux is multiplexed by Mux and multiplexes B, C and SubSub
+NESTED_DBC_JSON = {
+    'messages': {
+        '600': {
+            'name': 'NESTED',
+            'length': 8,
+            'has_multiplexor': True,
+            'signals': {
+                'Mux': {'bit_start': 0, 'length': 4, 'little_endian': 1, 'multiplexor': True},
+                'Always': {'bit_start': 56, 'length': 8, 'little_endian': 1},
+                'A': {'bit_start': 8, 'length': 8, 'little_endian': 1, 'multiplexing': 0},
+                'SubMux': {
+                    'bit_start': 8, 'length': 4, 'little_endian': 1, 'multiplexor': True,
+                    'multiplexing': 1, 'multiplexor_signal': 'Mux'},
+                'B': {
+                    'bit_start': 16, 'length': 16, 'little_endian': 1, 'multiplexing': 0,
+                    'multiplexor_signal': 'SubMux'},
+                'C': {
+                    'bit_start': 16, 'length': 8, 'little_endian': 1, 'multiplexing': 1,
+                    'multiplexor_signal': 'SubMux'},
+                'SubSub': {
+                    'bit_start': 24, 'length': 2, 'little_endian': 1, 'multiplexor': True,
+                    'multiplexing': 1, 'multiplexor_signal': 'SubMux'},
+                'D': {
+                    'bit_start': 32, 'length': 8, 'little_endian': 1, 'multiplexing': 3,
+                    'multiplexor_signal': 'SubSub'},
+                'E': {'bit_start': 40, 'length': 8, 'little_endian': 1, 'multiplexing': 2},
+            },
+        },
+    },
+}
+
+
+def nested_reference(message_data):
+    """Decode NESTED_DBC_JSON without the multiplexing tables, by walking the multiplexors."""
+    message_info = NESTED_DBC_JSON['messages']['600']
+    flat_signals = {}
+    for name, signal_info in message_info['signals'].items():
+        flat_signals[name] = dict(
+            (key, value) for key, value in signal_info.items()
+            if key not in ('multiplexor', 'multiplexing', 'multiplexor_signal'))
+    flat = caneton.compile_dbc({'messages': {'600': {'name': 'NESTED', 'signals': flat_signals}}})
+    signals = flat.decode(600, message_data)['signals']
+    values = {signal['name']: signal for signal in signals}
+
+    def is_present(name):
+        signal_info = message_info['signals'][name]
+        if 'multiplexing' not in signal_info:
+            return True
+        parent = signal_info.get('multiplexor_signal', 'Mux')
+        return is_present(parent) and values[parent]['value'] == signal_info['multiplexing']
+
+    return values['Mux']['value'], [
+        signal for signal in signals if signal['name'] != 'Mux' and is_present(signal['name'])]
+
+
+class TestDatabase(TestCase):
+
+    def setUp(self):
+        self.dbc_json = utils.load_dbc_json()
+        self.db = caneton.compile_dbc(self.dbc_json)
+
+    def test_invalid_dbc(self):
+        with self.assertRaises(caneton.InvalidDBC):
+            caneton.compile_dbc({})
+
+    def test_message_not_found(self):
+        with self.assertRaises(caneton.MessageNotFound):
+            self.db.decode(0x42, b'\x00' * 8)
+
+    def test_decode(self):
+        message_data = binascii.unhexlify('01780178010000')
+        message = self.db.decode(0x701, message_data)
+        self.assertEqual(message['name'], 'CU_MULTI_FOO_BAR')
+        self.assertEqual(message['multiplexing_mode'], 1)
+        self.assertEqual([signal['name'] for signal in message['signals']], ['Bar1', 'Bar2'])
+        self.assertEqual(caneton.message_get_signal(message, 'Bar2')['value'], 188.0)
+
+    def test_message_info_compiled_once(self):
+        message_info = self.dbc_json['messages'][str(0x701)]
+        message = caneton.database.message_info_message(0x701, message_info)
+        self.assertIs(caneton.database.message_info_message(0x701, message_info), message)
+        self.assertIsNot(caneton.database.message_info_message(0x701, dict(message_info)), message)
+
+    def test_message_info_modified(self):
+        message_data = binascii.unhexlify('01780178010000')
+        message = caneton.message_decode(0x701, len(message_data), message_data, self.dbc_json)
+        self.assertEqual(caneton.message_get_signal(message, 'Bar2')['value'], 188.0)
+        self.dbc_json['messages'][str(0x701)]['signals']['Bar2']['factor'] = 1
+        message = caneton.message_decode(0x701, len(message_data), message_data, self.dbc_json)
+        self.assertEqual(caneton.message_get_signal(message, 'Bar2')['value'], 376)
+        expected = legacy.message_decode(0x701, len(message_data), message_data, self.dbc_json)
+        self.assertEqual(utils.typed(message), utils.typed(expected))
+
+    def test_decode_truncated_length(self):
+        message_data = binascii.unhexlify('0400E80300000000')
+        message = self.db.decode(0x63f, message_data, 3)
+        self.assertEqual(message['raw_data'], b'\x04\x00\xe8')
+        self.assertEqual(caneton.message_get_signal(message, 'TempsChargeRestant')['value'], -6144)
+        # TempsChargeRestant starts in the frame but doesn't fit in it
+        with self.assertRaises(caneton.DecodingError):
+            self.db.decode(0x63f, message_data, 2)
+
+    def _check_same_as_legacy(self, dbc_json, message_lengths, data_shortage=0, codegen=False):
+        db = caneton.compile_dbc(dbc_json).compile(codegen=codegen)
+        rand = random.Random(42)
+        for message_id in dbc_json['messages']:
+            for message_length in message_lengths:
+                for _ in range(50):
+                    message_data = bytes(bytearray(
+                        rand.getrandbits(8) for _ in range(max(message_length - data_shortage, 0))))
+                    try:
+                        expected = legacy.message_decode(
+                            int(message_id), message_length, message_data, dbc_json)
+                    except caneton.CanetonError as e:
+                        with self.assertRaises(type(e)):
+                            db.decode(int(message_id), message_data, message_length)
+                        continue
+                    message = db.decode(int(message_id), message_data, message_length)
+                    # Compare representations to check the keys order and NaN values too
+                    self.assertEqual(utils.typed(message), utils.typed(expected))
+
+    def test_same_as_legacy(self):
+        self._check_same_as_legacy(self.dbc_json, [8])
+        self._check_same_as_legacy(DBC_JSON, [8, 7, 4, 2, 1])
+
+    def test_canfd_same_as_legacy(self):
+        self._check_same_as_legacy(FD_DBC_JSON, [64, 48, 32, 12, 8])
+
+    def test_nested_multiplexing(self):
+        db = caneton.compile_dbc(NESTED_DBC_JSON)
+
+        def names(message_data):
+            return [signal['name'] for signal in db.decode(600, binascii.unhexlify(message_data))['signals']]
+
+        self.assertEqual(names('0000000000000000'), ['A', 'Always'])
+        self.assertEqual(names('0100000000000000'), ['SubMux', 'B', 'Always'])
+        self.assertEqual(names('0101000100000000'), ['SubMux', 'C', 'SubSub', 'Always'])
+        self.assertEqual(names('0101000303000000'), ['SubMux', 'C', 'SubSub', 'D', 'Always'])
+        self.assertEqual(names('0105000000000000'), ['SubMux', 'Always'])
+        self.assertEqual(names('0200000000000000'), ['E', 'Always'])
+
+        rand = random.Random(42)
+        decoder = db.decoder(signals=['D', 'E'])
+        for _ in range(500):
+            message_data = bytes(bytearray(rand.choice([0, 1, 2, 3, 5]) for _ in range(8)))
+            multiplexing_mode, expected = nested_reference(message_data)
+            message = db.decode(600, message_data)
+            self.assertEqual(message['multiplexing_mode'], multiplexing_mode)
+            self.assertEqual(message['signals'], expected)
+            self.assertEqual(db.decode(600, message_data, compact=True).to_dict(), message)
+            self.assertEqual(db.decode_lazy(600, message_data).to_dict(), message)
+            self.assertEqual(decoder.decode(600, message_data)['signals'], [
+                signal for signal in expected if signal['name'] in ('D', 'E')])
+
+    def test_mode_tables(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        layout = db.get_message(258).layout(8)
+        self.assertEqual(sorted(layout.modes), [0, 1, 2])
+        self.assertEqual([entry[0].name for entry in layout.modes[1]], ['B', 'Always'])
+        self.assertEqual([entry[0].name for entry in layout.common], ['Always'])
+        # The entries of the mode are shared by the decoded messages
+        message = db.decode(258, b'\x40' + b'\x00' * 7, compact=True)
+        self.assertIs(message.entries, layout.modes[1])
+
+    def test_floats_same_as_legacy(self):
+        self._check_same_as_legacy(FLOAT_DBC_JSON, [8, 7, 5, 4])
+
+    def test_data_shorter_than_length(self):
+        # The data is left padded to the message length
+        for codegen in (False, True):
+            self._check_same_as_legacy(FLOAT_DBC_JSON, [8, 7, 4], data_shortage=1, codegen=codegen)
+            self._check_same_as_legacy(FLOAT_DBC_JSON, [8], data_shortage=3, codegen=codegen)
+            self._check_same_as_legacy(DBC_JSON, [8, 4], data_shortage=2, codegen=codegen)
+            self._check_same_as_legacy(FD_DBC_JSON, [64, 12], data_shortage=4, codegen=codegen)
+
+    def test_aligned_floats(self):
+        db = caneton.compile_dbc(FLOAT_DBC_JSON)
+        layout = db.get_message(512).layout(8)
+        self.assertEqual([entry[5][1] for entry in layout.entries], [0, 4])
+        # Neither the big endian nor the little endian integer of the frame is needed
+        self.assertFalse(layout.uses_msb or layout.uses_lsb)
+        self.assertEqual([entry[5] for entry in db.get_message(513).layout(8).entries], [None, None])
+
+        message = db.decode(512, binascii.unhexlify('3fc00000') + b'\x00\x00\x20\x40')
+        self.assertEqual([signal['value'] for signal in message['signals']], [10.75, 2.5])
+        message = db.decode(515, binascii.unhexlify('3ff8000000000000'))
+        self.assertEqual(message['signals'][0]['value'], 3.0)
+
+    def test_decoder(self):
+        decoder = self.db.decoder(signals=['Bar2', 'TempsChargeRestant', 'truck_speed'])
+        message = decoder.decode(0x701, binascii.unhexlify('01780178010000'))
+        self.assertEqual(message['multiplexing_mode'], 1)
+        self.assertEqual([signal['name'] for signal in message['signals']], ['Bar2'])
+        self.assertEqual(message.get_signal('Bar2')['value'], 188.0)
+        self.assertIsNone(message.get_signal('Bar1'))
+
+        message = decoder.decode(0x701, binascii.unhexlify('00780178010000'))
+        self.assertEqual(message['signals'], [])
+
+        # The multiplexor isn't needed
+        message = decoder.decode(0x195, binascii.unhexlify('1100F9FB00000000'))
+        self.assertEqual(message['signals'], [
+            self.db.decode(0x195, binascii.unhexlify('1100F9FB00000000')).get_signal('truck_speed')])
+
+        with self.assertRaises(caneton.MessageNotFound):
+            decoder.decode(0x42, b'\x00' * 8)
+
+    def test_decoder_without_multiplexor(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        decoder = db.decoder(signals=['Always'])
+        message = decoder.decode(258, b'\xff' * 8)
+        self.assertIsNone(message['multiplexing_mode'])
+        self.assertEqual(message['signals'], [db.decode(258, b'\xff' * 8).get_signal('Always')])
+
+    def test_get_signal(self):
+        message = self.db.decode(0x701, binascii.unhexlify('01780178010000'))
+        self.assertIs(caneton.message_get_signal(message, 'Bar1'), message['signals'][0])
+        # Plain dicts are still supported
+        self.assertEqual(caneton.message_get_signal(dict(message), 'Bar1'), message['signals'][0])
+
+    def test_entry_value(self):
+        message_data = binascii.unhexlify('01780178010000')
+        layout = self.db.get_message(0x701).layout(len(message_data))
+        msb = int(binascii.hexlify(message_data), 16)
+        lsb = int(binascii.hexlify(message_data[::-1]), 16)
+        entry = layout.entries_by_name(layout.mode_entries(msb, lsb, message_data)[2])['Bar2']
+        value = caneton.database.entry_value(entry, msb, lsb, message_data)
+        self.assertEqual(value, 188.0)
+        expected = self.db.decode(0x701, message_data).get_signal('Bar2')
+        self.assertEqual(caneton.database.signal_dict(entry, value), expected)
+
+    def test_compact(self):
+        message_data = binascii.unhexlify('01780178010000')
+        message = self.db.decode(0x701, message_data, compact=True)
+        self.assertIsInstance(message, caneton.database.CompactMessage)
+        self.assertEqual(message.values, (376, 188.0))
+        self.assertEqual(message.signal_names, ('Bar1', 'Bar2'))
+        self.assertEqual(message.get_value('Bar2'), 188.0)
+        self.assertEqual(message['name'], 'CU_MULTI_FOO_BAR')
+        self.assertEqual(message['multiplexing_mode'], 1)
+        self.assertEqual(caneton.message_get_signal(message, 'Bar2')['value'], 188.0)
+
+        expected = self.db.decode(0x701, message_data)
+        self.assertEqual(message, expected)
+        self.assertEqual(repr(message.to_dict()), repr(expected))
+        self.assertEqual(dict(message), expected)
+        with self.assertRaises(TypeError):
+            message['name'] = 'Foo'
+
+    def test_compact_shares_descriptors(self):
+        first = self.db.decode(0x195, binascii.unhexlify('1100E80300000000'), compact=True)
+        second = self.db.decode(0x195, binascii.unhexlify('1100F9FB00000000'), compact=True)
+        self.assertEqual(first.values, (1, 1, 10.0))
+        self.assertEqual(second.values, (1, 1, -10.31))
+        for first_entry, second_entry in zip(first.entries, second.entries):
+            self.assertIs(first_entry, second_entry)
+
+    def test_compact_decoder(self):
+        decoder = self.db.decoder(signals=['Bar2'], compact=True)
+        message = decoder.decode(0x701, binascii.unhexlify('01780178010000'))
+        self.assertEqual(message.values, (188.0,))
+        messages = list(caneton.iter_decode(['(1.5) can0 701#01780178010000'], decoder))
+        self.assertEqual(messages[0]['timestamp'], 1.5)
+        self.assertEqual(messages[0].to_dict()['timestamp'], 1.5)
+
+    def test_lazy(self):
+        message_data = binascii.unhexlify('01780178010000')
+        message = self.db.decode_lazy(0x701, message_data)
+        self.assertIsInstance(message, caneton.database.DecodedMessage)
+        self.assertEqual(message.name, 'CU_MULTI_FOO_BAR')
+        self.assertEqual(message.raw_data, message_data)
+        # Nothing is decoded before the first access
+        self.assertEqual(message._values, {})
+        self.assertEqual(message['Bar2'], 188.0)
+        self.assertEqual(message._values, {'Bar2': 188.0})
+        self.assertEqual(message.multiplexing_mode, 1)
+        self.assertEqual(list(message), ['Bar1', 'Bar2'])
+        self.assertEqual(list(message.values()), [376, 188.0])
+        self.assertNotIn('Foo1', message)
+        with self.assertRaises(KeyError):
+            message['Foo1']
+        self.assertIsNone(message.get_signal('Foo1'))
+        with self.assertRaises(KeyError):
+            message['timestamp']
+
+        expected = self.db.decode(0x701, message_data)
+        self.assertEqual(message.get_signal('Bar1'), expected.get_signal('Bar1'))
+        self.assertEqual(repr(message.to_dict()), repr(expected))
+        with self.assertRaises(TypeError):
+            message['Bar1'] = 0
+
+    def test_lazy_decoder(self):
+        decoder = self.db.decoder(signals=['Bar2'], lazy=True)
+        messages = list(caneton.iter_decode(['(1.5) can0 701#01780178010000'], decoder))
+        self.assertEqual(dict(messages[0]), {'Bar2': 188.0})
+        self.assertEqual(messages[0].timestamp, 1.5)
+        self.assertEqual(messages[0]['timestamp'], 1.5)
+        self.assertEqual(messages[0].to_dict()['timestamp'], 1.5)
+
+        # The signals which can't be decoded raise when accessed
+        message = self.db.decode_lazy(0x63f, binascii.unhexlify('0400'))
+        with self.assertRaises(caneton.DecodingError):
+            message['TempsChargeRestant']
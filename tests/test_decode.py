@@ -175,3 +175,12 @@ class TestDecode(TestCase):
         signal = caneton.message_get_signal(message, 'Bar2')
         self.assertEqual(signal['value'], 65535.5)
         self.assertIs(type(signal['value']), float)
+
+    def test_dlc(self):
+        self.assertEqual([caneton.dlc_to_length(dlc) for dlc in range(16)], list(caneton.CANFD_LENGTHS))
+        self.assertEqual(caneton.length_to_dlc(8), 8)
+        self.assertEqual(caneton.length_to_dlc(64), 15)
+        with self.assertRaises(ValueError):
+            caneton.length_to_dlc(9)
+        with self.assertRaises(ValueError):
+            caneton.dlc_to_length(16)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+import copy
+import random
+
+import caneton
+
+from . import utils
+
+from .test_database import DBC_JSON, FD_DBC_JSON, FLOAT_DBC_JSON, NESTED_DBC_JSON
+
+
+def decoded_values(db, message):
+    """Return the values of a decoded message to encode it again (with its multiplexor)."""
+    values = {signal['name']: signal['value'] for signal in message['signals']}
+    multiplexor = db.get_message(message['id']).multiplexor
+    if multiplexor is not None:
+        values[multiplexor.name] = message['multiplexing_mode']
+    return values
+
+
+class TestEncode(TestCase):
+
+    def setUp(self):
+        self.dbc_json = utils.load_dbc_json()
+        self.db = caneton.compile_dbc(self.dbc_json)
+
+    def test_message_encode(self):
+        message_data = caneton.message_encode(0x701, {'Bar1': 376, 'Bar2': 188.0}, self.dbc_json)
+        self.assertEqual(message_data, binascii.unhexlify('0178017801000000'))
+        self.assertEqual(self.db.encode(0x701, {'Bar1': 376, 'Bar2': 188.0}, 7), message_data[:7])
+        # The message and its packer are compiled once
+        message = caneton.database.message_info_message(0x701, self.dbc_json['messages'][str(0x701)])
+        self.assertEqual(list(message._packers), [8])
+        with self.assertRaises(caneton.MessageNotFound):
+            caneton.message_encode(0x42, {}, self.dbc_json)
+        with self.assertRaises(caneton.InvalidDBC):
+            caneton.message_encode(0x701, {}, {})
+
+    def _check_round_trip(self, dbc_json, message_lengths):
+        # The values in the range of the signals are decoded again identically
+        dbc_json = copy.deepcopy(dbc_json)
+        for message_info in dbc_json['messages'].values():
+            for signal_info in message_info.get('signals', {}).values():
+                signal_info.pop('min', None)
+                signal_info.pop('max', None)
+        db = caneton.compile_dbc(dbc_json)
+
+        rand = random.Random(42)
+        for message_id in dbc_json['messages']:
+            message_id = int(message_id)
+            for message_length in message_lengths:
+                for _ in range(50):
+                    message_data = bytes(bytearray(rand.getrandbits(8) for _ in range(message_length)))
+                    try:
+                        message = db.decode(message_id, message_data)
+                    except caneton.CanetonError:
+                        continue
+                    values = decoded_values(db, message)
+                    encoded = db.encode(message_id, values, message_length)
+                    self.assertEqual(len(encoded), message_length)
+                    self.assertEqual(
+                        utils.typed(db.decode(message_id, encoded)), utils.typed(dict(message, raw_data=encoded)))
+
+    def test_round_trip(self):
+        self._check_round_trip(self.dbc_json, [8])
+        self._check_round_trip(DBC_JSON, [8, 4])
+        self._check_round_trip(FLOAT_DBC_JSON, [8])
+        self._check_round_trip(FD_DBC_JSON, [64, 12])
+        self._check_round_trip(NESTED_DBC_JSON, [8])
+
+    def test_scaling_and_clamping(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        # Speed: 16 bits, factor 0.1, Torque: 12 bits signed, offset -5
+        message = db.decode(256, db.encode(256, {'Speed': 12.34, 'Torque': -100}))
+        self.assertEqual(message.get_signal('Speed')['value'], 123 * 0.1)
+        self.assertEqual(message.get_signal('Torque')['value'], -100)
+        message = db.decode(256, db.encode(256, {'Speed': 1e9, 'Torque': -1e9}))
+        self.assertEqual(message.get_signal('Speed')['value'], 0xffff * 0.1)
+        self.assertEqual(message.get_signal('Torque')['value'], -2048 - 5)
+        self.assertEqual(db.decode(256, db.encode(256, {'Flag': 3})).get_signal('Flag')['value'], 1)
+
+        dbc_json = copy.deepcopy(DBC_JSON)
+        dbc_json['messages']['257']['signals']['Counter'].update({'min': 2, 'max': 10})
+        db = caneton.compile_dbc(dbc_json)
+        for value, expected in [(0, 2), (5, 5), (15, 10)]:
+            message = db.decode(257, db.encode(257, {'Counter': value}))
+            self.assertEqual(message.get_signal('Counter')['value'], expected)
+
+    def test_multiplexing(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        # The multiplexing mode is selected by the multiplexed signal
+        message = db.decode(258, db.encode(258, {'B': -2, 'Always': 7}))
+        self.assertEqual(message['multiplexing_mode'], 1)
+        self.assertEqual(message.get_signal('B')['value'], -2)
+        self.assertEqual(message.get_signal('Always')['value'], 7)
+        self.assertEqual(db.decode(258, db.encode(258, {'Mux': 0}))['multiplexing_mode'], 0)
+        with self.assertRaises(caneton.EncodingError):
+            db.encode(258, {'A': 1, 'B': 2})
+        with self.assertRaises(caneton.EncodingError):
+            db.encode(258, {'Mux': 0, 'B': 2})
+
+        db = caneton.compile_dbc(NESTED_DBC_JSON)
+        message = db.decode(600, db.encode(600, {'D': 5}))
+        self.assertEqual(message['multiplexing_mode'], 1)
+        self.assertEqual([(signal['name'], signal['value']) for signal in message['signals']], [
+            ('SubMux', 1), ('C', 0), ('SubSub', 3), ('D', 5), ('Always', 0)])
+
+    def test_errors(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        with self.assertRaises(caneton.EncodingError):
+            db.encode(257, {'Unknown': 1})
+        with self.assertRaises(caneton.EncodingError):
+            db.encode(257, {'Counter': 'one'})
+        with self.assertRaises(caneton.EncodingError):
+            db.encode(257, {'Voltage': None})
+        # Last doesn't fit in a frame of 2 bytes
+        with self.assertRaises(caneton.EncodingError):
+            db.encode(257, {'Last': 1}, 2)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase, skipIf
+import os
+import shutil
+import tempfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import caneton
+from caneton import export
+
+from .test_database import DBC_JSON
+
+
+LOG = [
+    '(1.0) can0 100#0123456789ABCDEF\n',
+    '(2.0) can0 102#0011223344556677\n',
+    '(3.0) can0 100#FEDCBA9876543210\n',
+    '(4.0) can0 102#4011223344556677\n',
+    '(5.0) can0 100#0000000000000000\n',
+]
+
+
+class TestMessageColumns(TestCase):
+
+    def test_append(self):
+        db = caneton.compile_dbc(DBC_JSON)
+        messages = [message for message in caneton.iter_decode(LOG, db) if message['id'] == 0x100]
+        buffer = export.MessageColumns(db.get_message(0x100))
+        for message in messages:
+            buffer.append(message)
+        self.assertEqual(buffer.rows, 3)
+        self.assertEqual(list(buffer.timestamp.values), [1.0, 3.0, 5.0])
+        columns = {column.name: column for column in buffer.columns}
+        self.assertEqual(columns['Torque'].values.typecode, export.INT64_TYPECODE)
+        self.assertEqual(columns['Speed'].values.typecode, 'd')
+        for signal_name in ('Speed', 'Torque', 'Flag', 'Ratio'):
+            expected = [message.get_signal(signal_name)['value'] for message in messages]
+            self.assertEqual(list(columns[signal_name].values), expected)
+            self.assertEqual(list(columns[signal_name].valid), [1, 1, 1])
+
+
+@skipIf(numpy is None, "NumPy is not installed")
+class TestColumnarSink(TestCase):
+
+    def setUp(self):
+        self.db = caneton.compile_dbc(DBC_JSON)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _export(self, messages, row_group_size):
+        with export.ColumnarSink(self.directory, self.db, row_group_size, format='npz') as sink:
+            sink.add_all(messages)
+        return sink
+
+    def _load(self, sink, name, message_id):
+        prefix = os.path.join(self.directory, '%s_%x.' % (name, message_id))
+        return export.load_npz([path for path in sink.paths if path.startswith(prefix)])
+
+    def test_npz(self):
+        messages = list(caneton.iter_decode(LOG, self.db))
+        sink = self._export(messages, row_group_size=2)
+        # 3 frames of 0x100 in 2 row groups and 2 frames of 0x102 in one
+        self.assertEqual(len(sink.paths), 3)
+
+        columns, metadata = self._load(sink, 'MOTOROLA', 0x100)
+        self.assertEqual(metadata['message_id'], 0x100)
+        self.assertEqual(metadata['message_name'], 'MOTOROLA')
+        self.assertIn(['Torque', 'Nm'], metadata['columns'])
+        self.assertEqual(columns['timestamp'].tolist(), [1.0, 3.0, 5.0])
+        self.assertEqual(columns['Torque'].dtype, numpy.int64)
+        self.assertEqual(columns['Speed'].dtype, numpy.float64)
+        motorola = [message for message in messages if message['id'] == 0x100]
+        for signal_name in ('Speed', 'Torque', 'Flag', 'Ratio'):
+            expected = [message.get_signal(signal_name)['value'] for message in motorola]
+            numpy.testing.assert_equal(columns[signal_name].tolist(), expected)
+
+    def test_multiplexed(self):
+        sink = self._export(caneton.iter_decode(LOG, self.db.decoder(compact=True)), row_group_size=10)
+        columns, _metadata = self._load(sink, 'MULTIPLEXED', 0x102)
+        self.assertNotIn('Mux', columns)
+        self.assertEqual(columns['multiplexing_mode'].tolist(), [0, 1])
+        # The signals of the other multiplexing modes are missing
+        self.assertEqual(columns['A'].tolist(), [0x2211, None])
+        self.assertEqual(columns['B'].tolist(), [None, 0x1122])
+        self.assertEqual(columns['C'].tolist(), [None, None])
+        self.assertEqual(columns['Always'].tolist(), [0x77, 0x77])
+
+    def test_format(self):
+        with self.assertRaises(ValueError):
+            export.ColumnarSink(self.directory, self.db, format='csv')
+        if export.pyarrow is None:
+            self.assertEqual(export.default_format(), 'npz')
+            with self.assertRaises(ImportError):
+                export.ColumnarSink(self.directory, self.db, format='parquet')
+
+
+@skipIf(export.pyarrow is None, "pyarrow is not installed")
+class TestParquet(TestCase):
+
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        db = caneton.compile_dbc(DBC_JSON)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with export.ColumnarSink(directory, db, row_group_size=2, format='parquet') as sink:
+            sink.add_all(caneton.iter_decode(LOG, db))
+        parquet_file = pyarrow.parquet.ParquetFile(os.path.join(directory, 'MOTOROLA_100.parquet'))
+        self.assertEqual(parquet_file.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(table.column('timestamp').to_pylist(), [1.0, 3.0, 5.0])
+        self.assertEqual(table.schema.field('Torque').metadata, {b'unit': b'Nm'})
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import errno
+import os
+import random
+import shutil
+import tempfile
+
+import caneton
+from caneton import index
+from caneton import store
+
+from . import utils
+
+
+def random_frames(count, seed=42):
+    rand = random.Random(seed)
+    frames = []
+    timestamp = 1000.0
+    for _ in range(count):
+        timestamp += rand.random() * 0.01
+        message_id = rand.choice([0x701, 0x63f, 0x195, 0x123])
+        frames.append(caneton.Frame(
+            round(timestamp, 6), message_id, bytes(bytearray(rand.getrandbits(8) for _ in range(8)))))
+    return frames
+
+
+class TestCaptureIndex(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.frames = random_frames(500)
+
+    def _write_candump(self):
+        path = os.path.join(self.directory, 'candump.log')
+        with open(path, 'w') as f:
+            for frame in self.frames:
+                f.write('(%.6f) can0 %03X#%s\n' % (
+                    frame.timestamp, frame.message_id, ''.join('%02X' % byte for byte in bytearray(frame.data))))
+        return path
+
+    def _write_asc(self):
+        path = os.path.join(self.directory, 'capture.asc')
+        with open(path, 'w') as f:
+            f.write('date Mon Jul 10 10:00:00 2015\nbase dec  timestamps absolute\n')
+            for frame in self.frames:
+                f.write('%.6f 1  %d  Rx   d 8 %s\n' % (
+                    frame.timestamp, frame.message_id, ' '.join(str(byte) for byte in bytearray(frame.data))))
+        return path
+
+    def _write_store(self):
+        path = os.path.join(self.directory, 'frames.bin')
+        with store.FrameWriter(path) as writer:
+            writer.write_frames(self.frames)
+        return path
+
+    def assertQueries(self, path):
+        index.build_index(path, checkpoint_interval=16)
+        capture = index.CaptureIndex(path)
+        self.assertEqual(capture.frame_count, len(self.frames))
+        self.assertEqual(capture.message_ids, [0x123, 0x195, 0x63f, 0x701])
+        queries = [
+            (None, None, None), (1001.0, 1001.5, None), (1001.0, None, [0x701]),
+            (None, 1000.5, [0x63f, 0x123]), (1001.2, 1001.8, [0x195, 0x42]), (2000.0, None, None),
+        ]
+        for start, end, message_ids in queries:
+            expected = list(index.filter_frames(self.frames, start, end, message_ids))
+            frames = [
+                (frame.timestamp, frame.message_id, bytes(frame.data))
+                for frame in capture.iter_frames(start, end, message_ids)]
+            self.assertEqual(frames, [tuple(frame) for frame in expected])
+
+    def test_candump(self):
+        self.assertQueries(self._write_candump())
+
+    def test_asc(self):
+        self.assertQueries(self._write_asc())
+
+    def test_store(self):
+        self.assertQueries(self._write_store())
+
+    def test_iter_decode(self):
+        db = utils.compile_test_dbc()
+        path = self._write_candump()
+        messages = list(index.open_index(path).iter_decode(db, 1001.0, 1002.0, [0x701, 0x123]))
+        self.assertTrue(messages)
+        for message in messages:
+            self.assertEqual(message['id'], 0x701)
+            self.assertTrue(1001.0 <= message['timestamp'] < 1002.0)
+
+    def test_outdated(self):
+        path = self._write_candump()
+        index.build_index(path)
+        with open(path, 'a') as f:
+            f.write('(2000.000000) can0 701#01780178010000\n')
+        with self.assertRaises(ValueError):
+            index.CaptureIndex(path)
+        # Rebuilt when needed
+        self.assertEqual(index.open_index(path).frame_count, len(self.frames) + 1)
+
+    def test_spill(self):
+        path = self._write_candump()
+        with open(index.build_index(path, checkpoint_interval=16), 'rb') as f:
+            expected = f.read()
+        # The positions written by runs of 7 frames are gathered in the same index
+        with open(index.build_index(path, checkpoint_interval=16, spill_frames=7), 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_read_only(self):
+        path = self._write_candump()
+
+        def build_index(path, *args, **kwargs):
+            raise OSError(errno.EACCES, "Permission denied", index.index_path(path))
+
+        self.addCleanup(setattr, index, 'build_index', index.build_index)
+        index.build_index = build_index
+        # The capture is read without index
+        capture = index.open_index(path)
+        self.assertIsInstance(capture, index.CaptureScan)
+        frames = list(capture.iter_frames(1001.0, 1001.5, [0x701]))
+        self.assertEqual(frames, list(index.filter_frames(self.frames, 1001.0, 1001.5, [0x701])))
+        with self.assertRaises(OSError):
+            index.open_index(os.path.join(self.directory, 'missing.log'))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+
+import caneton
+from caneton import instrumentation
+
+from . import utils
+
+
+LOG = [
+    '(1.0) can0 701#01780178010000\n',
+    '(2.0) can0 701#01780178010000\n',
+    '(3.0) can0 123#00\n',
+    '(4.0) can0 63F#04\n',
+]
+
+
+class TestInstrumentation(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+
+    def _decode_log(self, stats):
+        decoder = stats.decoder(self.db)
+        messages = list(caneton.iter_decode(LOG, decoder))
+        with self.assertRaises(caneton.DecodingError):
+            decoder.decode(0x63f, b'\x04\x00')
+        return messages
+
+    def test_counters(self):
+        stats = instrumentation.Instrumentation()
+        messages = self._decode_log(stats)
+        self.assertEqual([message['id'] for message in messages], [0x701, 0x701, 0x63f])
+        self.assertEqual(
+            messages[0]['signals'], self.db.decode(0x701, binascii.unhexlify('01780178010000'))['signals'])
+
+        counters = stats.as_dict()
+        self.assertEqual(counters['messages'][0x701]['frames'], 2)
+        self.assertEqual(counters['messages'][0x701]['name'], 'CU_MULTI_FOO_BAR')
+        self.assertGreater(counters['messages'][0x701]['seconds'], 0)
+        self.assertEqual(counters['signals'][0x701], {'Bar1': {'count': 2, 'seconds': 0.0}, 'Bar2': {
+            'count': 2, 'seconds': 0.0}})
+        self.assertEqual(counters['unknown_ids'], {0x123: 1})
+        # Signals of the multiplexing mode starting after the byte of the frame
+        self.assertEqual(counters['skipped_signals'], {0x63f: {'TempsChargeRestant': 1}})
+        self.assertEqual(counters['errors'], {0x63f: {'DecodingError': 1}})
+
+    def test_signal_timing(self):
+        stats = instrumentation.Instrumentation(signal_timing=True)
+        messages = self._decode_log(stats)
+        self.assertEqual(
+            messages[0]['signals'], self.db.decode(0x701, binascii.unhexlify('01780178010000'))['signals'])
+        message = stats.decoder(self.db).decode(0x701, binascii.unhexlify('01780178010000'), compact=True)
+        self.assertEqual(message.values, (376, 188.0))
+        self.assertEqual(stats.signals[0x701, 'Bar1'][0], 3)
+        self.assertGreater(stats.signals[0x701, 'Bar1'][1], 0)
+
+    def test_prometheus(self):
+        stats = instrumentation.Instrumentation()
+        self._decode_log(stats)
+        text = stats.prometheus()
+        self.assertIn('# TYPE caneton_frames_total counter\n', text)
+        self.assertIn('caneton_frames_total{message_id="0x701",message="CU_MULTI_FOO_BAR"} 2\n', text)
+        self.assertIn('caneton_unknown_frames_total{message_id="0x123"} 1\n', text)
+        self.assertIn('caneton_decoding_errors_total{message_id="0x63f",', text)
+        self.assertNotIn('signal_seconds_total', text)
+
+    def test_disabled(self):
+        stats = instrumentation.Instrumentation(enabled=False)
+        messages = list(caneton.iter_decode(LOG, stats.decoder(self.db)))
+        self.assertEqual(len(messages), 3)
+        self.assertEqual(stats.as_dict()['messages'], {})
+
+    def test_compiled(self):
+        stats = instrumentation.Instrumentation()
+        self.db.compile()
+        messages = self._decode_log(stats)
+        self.assertEqual(
+            messages[0]['signals'], self.db.decode(0x701, binascii.unhexlify('01780178010000'))['signals'])
+        # The generated function of the layout is still used
+        self.assertIsNotNone(self.db.get_message(0x701).layout(7).decode_values)
+        self.assertEqual(stats.signals[0x701, 'Bar1'][0], 2)
+        self.assertEqual(stats.as_dict()['skipped_signals'], {0x63f: {'TempsChargeRestant': 1}})
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+
+import caneton
+from caneton import logs
+
+from . import utils
+
+
+CANDUMP_LOG = """\
+(1436509052.249713) can0 701#01780178010000
+(1436509052.250000) can0 123#1122
+(1436509052.260000) can0 63F#041D000000000000
+(1436509052.270000) can0 195#R
+(1436509052.280000) can0 20000004#0004000000000000
+"""
+
+# The data of the frame at .260 is too short for the signals of 0x701
+INVALID_CANDUMP_LOG = """\
+(1436509052.249713) can0 701#01780178010000
+(1436509052.260000) can0 701#
+(1436509052.270000) can0 63F#041D000000000000
+"""
+
+ASC_LOG = """\
+date Fri Jul 10 08:17:32 am 2015
+base hex  timestamps absolute
+Begin Triggerblock Fri Jul 10 08:17:32 am 2015
+   0.000000 Start of measurement
+   0.012345 1  701             Rx   d 7 01 78 01 78 01 00 00
+   0.022345 1  195             Rx   r
+   0.032345 CANFD 1 Rx 63f SPCU_INFO 1 0 8 8 04 1d 00 00 00 00 00 00 130000 130 1000 0 0 0 0 0
+End TriggerBlock
+"""
+
+
+class TestLogs(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+
+    def test_parse_candump_line(self):
+        self.assertEqual(
+            logs.parse_candump_line('(1436509052.249713) can0 701#0178'),
+            logs.Frame(1436509052.249713, 0x701, b'\x01\x78'))
+        self.assertEqual(
+            logs.parse_candump_line('  can0  701   [2]  01 78'),
+            logs.Frame(None, 0x701, b'\x01\x78'))
+        self.assertEqual(
+            logs.parse_candump_line('(0.1) can1 12345678##10178'),
+            logs.Frame(0.1, 0x12345678, b'\x01\x78'))
+        self.assertIsNone(logs.parse_candump_line('can0  701   [2]  remote request'))
+        with self.assertRaises(ValueError):
+            logs.parse_candump_line('0.012345 1  701 Rx d 2 01 78')
+
+    def test_parse_asc_line(self):
+        self.assertEqual(
+            logs.parse_asc_line('0.012345 1  18FF0001x  Rx   d 2 01 78'),
+            logs.Frame(0.012345, 0x18FF0001, b'\x01\x78'))
+        self.assertEqual(
+            logs.parse_asc_line('0.012345 1  1793  Rx   d 2 1 120', base=10),
+            logs.Frame(0.012345, 0x701, b'\x01\x78'))
+        self.assertIsNone(logs.parse_asc_line('0.000000 Start of measurement'))
+
+    def test_iter_decode_candump(self):
+        messages = list(logs.iter_decode(CANDUMP_LOG.splitlines(), self.db))
+        self.assertEqual([message['id'] for message in messages], [0x701, 0x63f])
+        self.assertEqual(messages[0]['timestamp'], 1436509052.249713)
+        self.assertEqual(caneton.message_get_signal(messages[1], 'TempsChargeRestant')['value'], 29)
+
+    def test_iter_decode_asc(self):
+        messages = list(logs.iter_decode(ASC_LOG.splitlines(), self.db))
+        self.assertEqual([message['id'] for message in messages], [0x701, 0x63f])
+        self.assertEqual(messages[1]['timestamp'], 0.032345)
+        self.assertEqual(caneton.message_get_signal(messages[0], 'Bar2')['value'], 188.0)
+
+    def test_iter_decode_unknown(self):
+        with self.assertRaises(caneton.MessageNotFound):
+            list(logs.iter_decode(CANDUMP_LOG.splitlines(), self.db, ignore_unknown=False))
+
+    def test_iter_decode_errors(self):
+        with self.assertRaises(caneton.InvalidBitStart):
+            list(logs.iter_decode(INVALID_CANDUMP_LOG.splitlines(), self.db))
+        errors = []
+        messages = list(logs.iter_decode(INVALID_CANDUMP_LOG.splitlines(), self.db, errors=errors))
+        self.assertEqual([message['id'] for message in messages], [0x701, 0x63f])
+        self.assertEqual([frame for frame, _ in errors], [logs.Frame(1436509052.26, 0x701, b'')])
+        self.assertIsInstance(errors[0][1], caneton.InvalidBitStart)
+
+    def test_iter_decode_is_lazy(self):
+        def lines():
+            yield '(1.0) can0 701#01780178010000'
+            raise AssertionError("Read too far")
+
+        message = next(logs.iter_decode(lines(), self.db))
+        self.assertEqual(message['name'], 'CU_MULTI_FOO_BAR')
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+
+import caneton
+from caneton import lru
+
+from . import utils
+
+
+class TestCachingDecoder(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+
+    def test_hits(self):
+        decoder = lru.CachingDecoder(self.db)
+        message_data = binascii.unhexlify('01780178010000')
+        first = decoder.decode(0x701, message_data)
+        second = decoder.decode(0x701, bytearray(message_data))
+        self.assertEqual(decoder.stats()['hits'], 1)
+        self.assertEqual(decoder.stats()['misses'], 1)
+        self.assertEqual(second, self.db.decode(0x701, message_data))
+        # The values are shared, not the messages (each has its timestamp)
+        self.assertIsNot(first, second)
+        self.assertIs(first.values, second.values)
+
+        messages = list(caneton.iter_decode(['(1.0) can0 701#01780178010000\n'], decoder))
+        self.assertEqual(messages[0]['timestamp'], 1.0)
+        self.assertIsNone(first.timestamp)
+        self.assertEqual(decoder.hit_ratio, 2 / 3.0)
+
+    def test_length(self):
+        decoder = lru.CachingDecoder(self.db)
+        message_data = binascii.unhexlify('0400E80300000000')
+        self.assertEqual(decoder.decode(0x63f, message_data, 3).raw_data, b'\x04\x00\xe8')
+        self.assertEqual(decoder.decode(0x63f, message_data), self.db.decode(0x63f, message_data))
+        self.assertEqual(decoder.misses, 2)
+        with self.assertRaises(caneton.DecodingError):
+            decoder.decode(0x63f, message_data, 2)
+        self.assertEqual(len(decoder), 2)
+
+    def test_eviction(self):
+        decoder = lru.CachingDecoder(self.db, maxsize=2)
+        for message_data in (b'\x01', b'\x02', b'\x01', b'\x03', b'\x01', b'\x02'):
+            decoder.decode(0x63f, message_data)
+        # b'\x02' is evicted by b'\x03' as b'\x01' was used more recently
+        self.assertEqual(decoder.stats(), {
+            'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 4, 'evictions': 2, 'bypassed': 0,
+            'hit_ratio': 2 / 6.0})
+
+        decoder.clear()
+        self.assertEqual((len(decoder), decoder.hits, decoder.misses), (0, 0, 0))
+
+    def test_exclude_ids(self):
+        decoder = lru.CachingDecoder(self.db, exclude_ids=[0x701])
+        message_data = binascii.unhexlify('01780178010000')
+        for _ in range(2):
+            message = decoder.decode(0x701, message_data)
+        self.assertEqual(message, self.db.decode(0x701, message_data))
+        self.assertEqual((len(decoder), decoder.hits, decoder.misses, decoder.bypassed), (0, 0, 0, 2))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import json
+import os
+import shutil
+import tempfile
+
+import caneton
+from caneton import cli
+from caneton import parallel
+
+from . import utils
+
+
+LINES = [
+    '(%d.0) can0 701#01780178010000\n',
+    '(%d.1) can0 123#1122\n',
+    '(%d.2) can0 63F#041D000000000000\n',
+    '(%d.3) can0 195#1100F9FB00000000\n',
+]
+
+
+class TestParallel(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'candump.log')
+        with open(self.path, 'w') as f:
+            for second in range(250):
+                for line in LINES:
+                    f.write(line % second)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_split_chunks(self):
+        chunks = parallel.split_chunks(self.path, chunk_size=1000)
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], os.path.getsize(self.path))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(data[next_start - 1:next_start], b'\n')
+
+    def test_parallel_decode(self):
+        with open(self.path) as f:
+            expected = list(caneton.iter_decode(f, self.db))
+        messages = list(parallel.parallel_decode(self.path, self.db, workers=2, chunk_size=1000))
+        self.assertEqual(len(messages), 750)
+        self.assertEqual(messages, expected)
+
+    def test_parallel_decode_errors(self):
+        with open(self.path, 'a') as f:
+            f.write('(250.0) can0 701#\n(250.1) can0 701#01780178010000\n')
+        errors = []
+        messages = list(parallel.parallel_decode(
+            self.path, self.db, workers=2, chunk_size=1000, errors=errors))
+        self.assertEqual(len(messages), 751)
+        self.assertEqual(
+            [(frame.timestamp, type(error)) for frame, error in errors], [(250.0, caneton.InvalidBitStart)])
+
+    def test_parallel_decode_formatter(self):
+        outputs = list(parallel.parallel_decode(
+            self.path, self.db, workers=2, chunk_size=1000, formatter=cli.message_json))
+        self.assertEqual(json.loads(outputs[-1])['timestamp'], 249.3)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import binascii
+import os
+import shutil
+import tempfile
+
+import caneton
+from caneton import compat
+from caneton import store
+
+from . import utils
+
+
+# The memory maps of Python 2 don't support memoryview, their frames data are copies
+DATA_TYPE = str if compat.IS_PY2 else memoryview
+
+
+FRAMES = [
+    caneton.Frame(1.0, 0x701, binascii.unhexlify('01780178010000')),
+    caneton.Frame(2.0, 0x123, b'\x11\x22'),
+    caneton.Frame(3.0, 0x63f, binascii.unhexlify('041D000000000000')),
+    caneton.Frame(4.0, 0x195, binascii.unhexlify('1100F9FB00000000')),
+]
+
+
+class TestStore(TestCase):
+
+    def setUp(self):
+        self.db = utils.compile_test_dbc()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'frames.bin')
+        with store.FrameWriter(self.path) as writer:
+            writer.write_frames(FRAMES)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_file_size(self):
+        self.assertEqual(os.path.getsize(self.path), 16 + 24 * len(FRAMES))
+
+    def test_frames(self):
+        with store.FrameStore(self.path) as frames:
+            self.assertEqual(len(frames), len(FRAMES))
+            self.assertIsInstance(frames[0].data, DATA_TYPE)
+            self.assertEqual([tuple(frame) for frame in frames], FRAMES)
+            self.assertEqual(frames[-1], FRAMES[-1])
+            with self.assertRaises(IndexError):
+                frames[len(FRAMES)]
+
+    def test_iter_decode(self):
+        with store.FrameStore(self.path) as frames:
+            messages = list(frames.iter_decode(self.db))
+            expected = [self.db.decode(frame.message_id, frame.data) for frame in FRAMES if frame.message_id != 0x123]
+            self.assertEqual([message['id'] for message in messages], [0x701, 0x63f, 0x195])
+            for message, expected_message in zip(messages, expected):
+                self.assertIsInstance(message['raw_data'], DATA_TYPE)
+                self.assertEqual(message['timestamp'], FRAMES[[f.message_id for f in FRAMES].index(message['id'])].timestamp)
+                del message['timestamp']
+                self.assertEqual(message, expected_message)
+            del messages
+
+    def test_can_fd_payload(self):
+        path = os.path.join(self.directory, 'fd.bin')
+        with store.FrameWriter(path, payload_size=64) as writer:
+            writer.write(1.0, 0x701, b'\x01' * 64)
+            with self.assertRaises(ValueError):
+                writer.write(1.0, 0x701, b'\x01' * 65)
+        with store.FrameStore(path) as frames:
+            self.assertEqual(frames.payload_size, 64)
+            self.assertEqual(bytes(frames[0].data), b'\x01' * 64)
+
+    def test_invalid_file(self):
+        with open(self.path, 'r+b') as f:
+            f.write(b'NOTFRAME')
+        with self.assertRaises(ValueError):
+            store.FrameStore(self.path)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+
+from unittest import TestCase
+import random
+
+import caneton
+from caneton import tracking
+
+from .test_database import DBC_JSON
+
+
+def _signal_names(message):
+    return [signal['name'] for signal in message['signals']]
+
+
+class TestChangeTracker(TestCase):
+
+    def setUp(self):
+        self.db = caneton.compile_dbc(DBC_JSON)
+        self.tracker = tracking.ChangeTracker(self.db)
+
+    def test_unchanged(self):
+        message = self.tracker.update(257, b'\x00' * 8)
+        self.assertEqual(_signal_names(message), ['Counter', 'Current', 'Voltage', 'Last'])
+        self.assertIsNone(self.tracker.update(257, b'\x00' * 8))
+
+    def test_changed_signals(self):
+        self.tracker.update(256, b'\x00' * 8)
+        # Bits of Speed (Motorola) and Last (Intel)
+        message = self.tracker.update(256, b'\x01' + b'\x00' * 7)
+        self.assertEqual(_signal_names(message), ['Speed'])
+        self.assertEqual(message['signals'], [self.db.decode(256, b'\x01' + b'\x00' * 7).get_signal('Speed')])
+
+        self.tracker.update(257, b'\x00' * 8)
+        message = self.tracker.update(257, b'\x00' * 7 + b'\x10')
+        self.assertEqual(_signal_names(message), ['Last'])
+        self.assertEqual(message.get_signal('Last')['value'], 1)
+
+    def test_unused_bits(self):
+        self.tracker.update(256, b'\x00' * 8)
+        # Bit 24 isn't used by a signal of the message
+        self.assertIsNone(self.tracker.update(256, b'\x00\x00\x00\x01' + b'\x00' * 4))
+
+    def test_multiplexing(self):
+        message = self.tracker.update(258, b'\x00\x01\x00' + b'\x00' * 5)
+        self.assertEqual(_signal_names(message), ['A', 'Always'])
+        message = self.tracker.update(258, b'\x40\x01\x00' + b'\x00' * 5)
+        self.assertEqual(message['multiplexing_mode'], 1)
+        self.assertEqual(_signal_names(message), ['B'])
+        # Back to the mode 0, A is compared with the last frame of the mode 0
+        message = self.tracker.update(258, b'\x00\x01\x00' + b'\x00' * 4 + b'\x05')
+        self.assertEqual(_signal_names(message), ['Always'])
+
+    def test_length_changed(self):
+        self.tracker.update(257, b'\x00' * 8)
+        message = self.tracker.update(257, b'\x00' * 7)
+        self.assertEqual(_signal_names(message), ['Counter', 'Current', 'Voltage'])
+
+    def test_reset(self):
+        self.tracker.update(257, b'\x00' * 8)
+        self.tracker.reset()
+        self.assertEqual(len(self.tracker.update(257, b'\x00' * 8)['signals']), 4)
+
+    def test_same_values_as_decode(self):
+        rand = random.Random(42)
+        for _ in range(200):
+            message_data = bytes(bytearray(rand.choice([0, 1, 0x80]) for _ in range(8)))
+            try:
+                expected = self.db.decode(258, message_data)
+            except caneton.DecodingError:
+                continue
+            message = self.tracker.update(258, message_data)
+            if message is None:
+                continue
+            self.assertEqual(message['multiplexing_mode'], expected['multiplexing_mode'])
+            for signal in message['signals']:
+                self.assertEqual(signal, expected.get_signal(signal['name']))
+
+    def test_message_not_found(self):
+        with self.assertRaises(caneton.MessageNotFound):
+            self.tracker.update(0x42, b'\x00' * 8)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Copyright © 2015 Polyconseil SAS
+# SPDX-License-Identifier: BSD-3-Clause
+#
+# Shared fixtures of the tests: the DBC of tests/dbc.json.
+#
+
+import json
+
+import caneton
+from caneton import compat
+
+
+DBC_PATH = './tests/dbc.json'
+
+
+def load_dbc_json():
+    """Return the DBC of tests/dbc.json (a new dict on each call, the tests may modify it)."""
+    with open(DBC_PATH, 'r') as f:
+        return json.loads(f.read())
+
+
+def compile_test_dbc(dbc_json=None):
+    """Return the Database of tests/dbc.json, or of dbc_json."""
+    return caneton.compile_dbc(dbc_json if dbc_json is not None else load_dbc_json())
+
+
+def typed(value):
+    """Return a comparable form of a decoded message, by the repr of its values.
+
+    The repr of the values tells their types apart (1 == 1.0) and matches the NaN.
+    On Python 3, the repr of the whole message checks the order of the keys too,
+    it depends on the hashes of the keys on Python 2 so the items are sorted.
+    """
+    if compat.IS_PY3:
+        return repr(value)
+    if isinstance(value, dict):
+        return sorted((key, typed(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [typed(item) for item in value]
+    return repr(value)